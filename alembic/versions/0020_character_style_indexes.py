@@ -0,0 +1,45 @@
+"""Add character style lookup indexes
+
+Revision ID: 0020_character_style_indexes
+Revises: 0019_global_quest_activated_at
+Create Date: 2026-10-16
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0020_character_style_indexes"
+down_revision = "0019_global_quest_activated_at"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Point lookups (owns_style, append/remove, custom profile upsert/delete) filter on
+    # (user_id, style_id). The models declare these unique indexes; create them here for
+    # databases whose tables predate them.
+    op.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_owned_unique
+        ON character_owned_styles (user_id, style_id);
+        """
+    )
+    op.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_custom_unique
+        ON character_custom_styles (user_id, style_id);
+        """
+    )
+    # list_custom_style_profiles: user_id ORDER BY created_at DESC LIMIT N
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_custom_user_created
+        ON character_custom_styles (user_id, created_at DESC);
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_custom_user_created")
@@ -752,6 +752,11 @@ async def main():
         if not bot.is_closed():
             logger.info("Closing bot connection...")
             await bot.close()
+        try:
+            from utils.cost_tracker import flush_cost_buffer
+            await flush_cost_buffer()
+        except Exception:
+            pass
         try:
             from utils.db import get_engine
             engine = get_engine()
@@ -759,6 +764,11 @@ async def main():
             logger.info("Database engine disposed")
         except Exception:
             pass
+        try:
+            from utils.media_assets import aclose_media_client
+            await aclose_media_client()
+        except Exception:
+            pass
         logger.info("Shutdown complete")
 
 
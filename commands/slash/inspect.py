@@ -259,9 +259,8 @@ class CharacterInspectSelect(discord.ui.Select):
 
         # Streak info
         try:
-            from utils.character_streak import get_character_streak, is_character_streak_alive
-            streak = await get_character_streak(user_id=self.target_id, style_id=sid)
-            alive = await is_character_streak_alive(user_id=self.target_id, style_id=sid)
+            from utils.character_streak import get_character_streak_with_status
+            streak, _last_talk, alive = await get_character_streak_with_status(user_id=self.target_id, style_id=sid)
             if streak > 0:
                 status = "\u2705 Active" if alive else "\u274c Broken"
                 embed.add_field(name="Talk streak", value=f"**{streak}** day{'s' if streak != 1 else ''} ({status})", inline=True)
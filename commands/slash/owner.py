@@ -33,7 +33,12 @@ from utils.packs_store import (
 from utils.packs_builtin import get_builtin_pack
 from utils.media_assets import save_attachment_image
 from utils.pack_security import hash_pack_password
-from utils.character_store import give_style_to_user, nuke_style_globally, remove_style_from_inventory
+from utils.character_store import (
+    give_style_to_user,
+    invalidate_state_cache,
+    nuke_style_globally,
+    remove_style_from_inventory,
+)
 from utils.character_registry import merge_pack_payload, get_style, get_shop_item_defs
 from utils.packs_store import is_pack_official
 from utils.badges import create_badge_definition, grant_defined_badge_to_user
@@ -2165,6 +2170,7 @@ class SlashOwner(commands.Cog):
                     await session.execute(delete(CharacterUserState))
 
                 await session.commit()
+                invalidate_state_cache()
         except Exception:
             logger.exception("data_clear_global DB delete failed")
             await _ephemeral(interaction, "⚠️ Failed to clear DB tables. Check logs.")
@@ -2211,6 +2217,7 @@ class SlashOwner(commands.Cog):
                 await session.execute(delete(BondState))
                 await session.execute(delete(VoiceSound))
                 await session.commit()
+            invalidate_state_cache()
         except Exception:
             logger.exception("data_clear_all DB delete failed")
             await _ephemeral(interaction, "⚠️ Failed to clear DB tables. Check logs.")
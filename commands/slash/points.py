@@ -40,6 +40,7 @@ from utils.character_store import (
 )
 from utils.character_store import (
     add_style_to_inventory,
+    append_owned_styles_bulk,
     load_state,
     compute_limits,
     replace_style_in_inventory,
@@ -328,15 +329,18 @@ class PullResultView(discord.ui.View):
                 )
                 return
 
-            # Add all selected to inventory
-            added = 0
-            for sid in selected:
-                if not sid:
-                    continue
-                ok, _ = await add_style_to_inventory(user_id=uid, style_id=sid, is_pro=is_pro, guild_id=self.guild_id)
-                if ok:
-                    added += 1
+            # Add all selected to inventory; slots are re-checked in the insert transaction
+            # in case another pull filled the collection since the check above.
+            added = len(await append_owned_styles_bulk(uid, selected, guild_id=self.guild_id, slots=slots))
             msg = f"✅ Added **{added}** character(s) to your collection."
+            if added < len(selected):
+                # Only blame capacity when the collection actually filled up; otherwise the
+                # style was unknown or another pull granted it first.
+                after = await load_state(user_id=uid)
+                if len([s for s in after.owned_custom if s and s.lower() not in base]) >= max_slots:
+                    msg += f" **{len(selected) - added}** could not fit (collection full)."
+                else:
+                    msg += f" **{len(selected) - added}** could not be added."
             await interaction.followup.send(msg, ephemeral=True)
             try:
                 from utils.analytics import track_funnel_event, METRIC_PULL_5, METRIC_PULL_10
@@ -60,8 +60,7 @@ from utils.bonds_prompt import build_bond_prompt_context, bond_system_lines
 from utils.character_registry import BASE_STYLE_IDS
 from utils.character_store import owns_style
 from utils.reporting import send_report
-from utils.character_streak import record_character_talk
-from utils.character_streak import get_last_talk_day
+from utils.character_streak import record_character_talk_result
 from utils.leaderboard import update_all_periods, CATEGORY_TALK, CATEGORY_BOND, GLOBAL_GUILD_ID
 from utils.analytics import track_ai_call
 from core.kai_mascot import (
@@ -1334,12 +1333,12 @@ class SlashTalk(commands.Cog):
                 try:
                     # Reward logic needs to know whether this was the first talk today and whether
                     # the streak was continued from yesterday (not just "talked today again").
-                    prev_last_talk = await get_last_talk_day(user_id=user_id, style_id=effective_style)
-                    streak, continued = await record_character_talk(
+                    talk_res = await record_character_talk_result(
                         user_id=user_id,
                         style_id=effective_style,
                         guild_id=guild_id,
                     )
+                    streak, continued, prev_last_talk = talk_res.streak, talk_res.continued, talk_res.prev_last_talk
                     # Award +35 points for continuing the SELECTED character streak (once per UTC day).
                     try:
                         from utils.backpressure import get_redis_or_none
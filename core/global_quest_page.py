@@ -442,9 +442,8 @@ async def handle_admin_gq_upload_image(request: web.Request) -> web.Response:
             return web.json_response({"error": "image file required"}, status=400)
 
         from utils.media_assets import (
-            asset_abspath,
             asset_storage_mode,
-            ensure_assets_dirs,
+            write_asset_bytes,
         )
         from utils.object_store import upload_bytes
 
@@ -482,17 +481,13 @@ async def handle_admin_gq_upload_image(request: web.Request) -> web.Response:
             )
             return web.json_response({"ok": True, "url": ref.url})
 
-        ensure_assets_dirs()
         public_base = (os.getenv("ASSET_PUBLIC_BASE_URL") or "").strip().rstrip("/")
         if not public_base:
             return web.json_response(
                 {"error": "ASSET_PUBLIC_BASE_URL is not set; configure s3 asset mode for web-visible uploads"},
                 status=400,
             )
-        out_abs = asset_abspath(rel)
-        os.makedirs(os.path.dirname(out_abs), exist_ok=True)
-        with open(out_abs, "wb") as f:
-            f.write(data)
+        await write_asset_bytes(rel, data)
         return web.json_response({"ok": True, "url": f"{public_base}/{rel.lstrip('/')}"})
     except Exception as e:
         log.exception("global quest upload failed")
@@ -39,3 +39,260 @@ def test_roll_window_seconds_env():
     val = _roll_window_seconds()
     assert val >= 0
     assert val in (0, 18000) or True  # may be overridden by env in CI
+
+
+# ---------------------------------------------------------------------------
+# DB-backed tests (in-memory SQLite)
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+async def char_db():
+    """Point utils.db at an in-memory SQLite engine and reset the state cache."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    import utils.db as db_mod
+    from utils.character_store import invalidate_state_cache
+    from utils.models import Base
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", echo=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    db_mod._engine = engine
+    db_mod._sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    invalidate_state_cache()
+    yield engine
+    invalidate_state_cache()
+    await engine.dispose()
+
+
+async def test_load_state_cached_and_invalidated_on_save(char_db):
+    from utils.character_store import _save_state, load_state
+
+    st = await load_state(42)
+    assert st.points == 0
+
+    # Mutating the returned state must not leak into the cache.
+    st.points = 99
+    again = await load_state(42)
+    assert again.points == 0
+
+    await _save_state(st)
+    fresh = await load_state(42)
+    assert fresh.points == 99
+
+
+async def test_append_owned_style_reports_inventory_count(char_db):
+    from unittest.mock import AsyncMock, MagicMock, patch
+
+    from utils.character_store import append_owned_style, upsert_custom_style_profile
+
+    await upsert_custom_style_profile(user_id=7, style_id="my_oc", name="OC", prompt="hi")
+    update = AsyncMock()
+    with patch("utils.character_store.get_style", return_value=MagicMock()), \
+            patch("utils.leaderboard.update_all_periods", update):
+        await append_owned_style(7, "knight", guild_id=123)
+
+    # fun + my_oc + knight, written to the global and the guild boards.
+    assert update.await_count == 2
+    assert {c.kwargs["guild_id"] for c in update.await_args_list} == {0, 123}
+    assert all(c.kwargs["value"] == 3.0 for c in update.await_args_list)
+
+
+async def test_owns_style_checks_owned_and_custom(char_db):
+    from unittest.mock import AsyncMock, MagicMock, patch
+
+    from utils.character_store import append_owned_style, owns_style, upsert_custom_style_profile
+
+    assert await owns_style(5, "fun") is True
+    assert await owns_style(5, "knight") is False
+
+    with patch("utils.character_store.get_style", return_value=MagicMock()), \
+            patch("utils.leaderboard.update_all_periods", AsyncMock()):
+        await append_owned_style(5, "knight")
+    await upsert_custom_style_profile(user_id=5, style_id="my_oc", name="OC", prompt="")
+
+    assert await owns_style(5, "Knight") is True
+    assert await owns_style(5, "my_oc") is True
+    assert await owns_style(6, "knight") is False
+
+
+async def test_remove_style_from_inventory_clears_active(char_db):
+    from unittest.mock import AsyncMock, MagicMock, patch
+
+    from utils.character_store import (
+        append_owned_style,
+        load_state,
+        remove_style_from_inventory,
+        set_active_style,
+    )
+
+    with patch("utils.character_store.get_style", return_value=MagicMock()), \
+            patch("utils.leaderboard.update_all_periods", AsyncMock()):
+        await append_owned_style(8, "knight")
+    ok, _ = await set_active_style(8, "knight")
+    assert ok
+
+    with patch("utils.character_streak.delete_character_streak", AsyncMock(return_value=4)):
+        ok, _msg, old_streak = await remove_style_from_inventory(user_id=8, style_id="knight")
+    assert ok is True and old_streak == 4
+
+    st = await load_state(8)
+    assert st.active_style_id == ""
+    assert "knight" not in st.owned_custom
+
+    ok, msg, _ = await remove_style_from_inventory(user_id=8, style_id="knight")
+    assert ok is False and "don’t have" in msg
+
+
+async def test_custom_style_profiles_roundtrip(char_db):
+    from utils.character_store import (
+        get_custom_style_profile,
+        list_custom_style_profiles,
+        upsert_custom_style_profile,
+    )
+
+    await upsert_custom_style_profile(user_id=9, style_id="First", name="One", prompt="p1")
+    await upsert_custom_style_profile(user_id=9, style_id="second", name="Two", prompt="p2")
+
+    prof = await get_custom_style_profile(user_id=9, style_id="first")
+    assert prof is not None and prof.name == "One" and prof.prompt == "p1"
+    assert await get_custom_style_profile(user_id=9, style_id="missing") is None
+
+    listed = await list_custom_style_profiles(user_id=9)
+    assert {p.style_id for p in listed} == {"first", "second"}
+    assert all(p.created_at > 0 for p in listed)
+
+
+async def test_append_owned_styles_bulk_inserts_new_only(char_db):
+    from unittest.mock import AsyncMock, MagicMock, patch
+
+    from utils.character_store import append_owned_style, append_owned_styles_bulk, load_state
+
+    update = AsyncMock()
+    with patch("utils.character_store.get_style", return_value=MagicMock()), \
+            patch("utils.leaderboard.update_all_periods", update):
+        await append_owned_style(11, "knight")
+        update.reset_mock()
+        inserted = await append_owned_styles_bulk(11, ["Knight", "wizard", "fun", "rogue", "wizard", ""])
+
+    assert sorted(inserted) == ["rogue", "wizard"]
+    assert update.await_count == 1
+    assert update.await_args.kwargs["value"] == 4.0  # fun + knight + rogue + wizard
+    st = await load_state(11)
+    assert {"knight", "rogue", "wizard"} <= set(st.owned_custom)
+
+
+async def test_append_owned_styles_bulk_caps_at_free_slots(char_db):
+    from unittest.mock import AsyncMock, MagicMock, patch
+
+    from utils.character_store import append_owned_styles_bulk, load_state
+
+    with patch("utils.character_store.get_style", return_value=MagicMock()), \
+            patch("utils.leaderboard.update_all_periods", AsyncMock()):
+        first = await append_owned_styles_bulk(13, ["knight", "wizard"], slots=3)
+        # knight is already owned, so only one of the new styles fits
+        second = await append_owned_styles_bulk(13, ["knight", "rogue", "bard"], slots=3)
+        third = await append_owned_styles_bulk(13, ["cleric"], slots=3)
+
+    assert first == ["knight", "wizard"]
+    assert second == ["rogue"]
+    assert third == []
+    st = await load_state(13)
+    assert set(st.owned_custom) - {"fun"} == {"knight", "wizard", "rogue"}
+
+
+async def test_calendar_day_rolls_count_and_reset(char_db, monkeypatch):
+    import utils.character_store as cs
+
+    monkeypatch.setenv("ROLL_WINDOW_SECONDS", "0")
+
+    allowed, remaining, per_day = await cs.can_roll(user_id=12, tier="pro")
+    assert allowed and remaining == per_day == cs.ROLLS_PER_DAY_PRO
+
+    await cs.consume_roll(user_id=12)
+    await cs.consume_roll(user_id=12)
+    _, remaining, _ = await cs.can_roll(user_id=12, tier="pro")
+    assert remaining == cs.ROLLS_PER_DAY_PRO - 2
+
+    # Yesterday's usage does not count; the next consume starts a fresh day.
+    st = await cs.load_state(12)
+    st.roll_day = "20000101"
+    await cs._save_state(st)
+    _, remaining, _ = await cs.can_roll(user_id=12, tier="pro")
+    assert remaining == cs.ROLLS_PER_DAY_PRO
+    await cs.consume_roll(user_id=12)
+    st = await cs.load_state(12)
+    assert st.roll_day == cs._utc_day() and st.roll_used == 1
+
+
+async def test_get_all_owned_style_ids_unions_tables(char_db):
+    from unittest.mock import AsyncMock, MagicMock, patch
+
+    from utils.character_store import append_owned_style, get_all_owned_style_ids, upsert_custom_style_profile
+
+    with patch("utils.character_store.get_style", return_value=MagicMock()), \
+            patch("utils.leaderboard.update_all_periods", AsyncMock()):
+        await append_owned_style(13, "knight")
+    await upsert_custom_style_profile(user_id=13, style_id="knight", name="Dup", prompt="")
+    await upsert_custom_style_profile(user_id=13, style_id="my_oc", name="OC", prompt="")
+
+    assert await get_all_owned_style_ids(13) == {"fun", "knight", "my_oc"}
+    assert await get_all_owned_style_ids(14) == {"fun"}
+
+
+async def test_set_active_style_base_and_owned(char_db):
+    from unittest.mock import AsyncMock, patch
+
+    from utils.character_store import clear_active_style, load_state, set_active_style
+
+    # Base styles skip the ownership query entirely.
+    with patch("utils.character_store.owns_style", new_callable=AsyncMock) as owns:
+        ok, _ = await set_active_style(15, "Serious")
+        assert ok and not owns.await_count
+    assert (await load_state(15)).active_style_id == "serious"
+
+    ok, msg = await set_active_style(15, "knight")
+    assert ok is False and "don't own" in msg
+
+    await clear_active_style(15)
+    assert (await load_state(15)).active_style_id == ""
+
+
+async def test_inventory_upgrades_scalar_and_cached(char_db):
+    from utils.character_store import get_inventory_upgrades, increment_inventory_upgrades, load_state
+
+    assert await get_inventory_upgrades(16) == 0
+    assert await increment_inventory_upgrades(16) == 1
+    assert await increment_inventory_upgrades(16, delta=2) == 3
+
+    st = await load_state(16)
+    assert st.inventory_upgrades == 3
+    assert st.nonbase_count == 0
+    assert await get_inventory_upgrades(16) == 3
+
+    # The increment invalidates the cached state rather than serving a stale count.
+    await increment_inventory_upgrades(16)
+    assert await get_inventory_upgrades(16) == 4
+
+
+async def test_replace_style_in_inventory_single_transaction(char_db):
+    from unittest.mock import AsyncMock, MagicMock, patch
+
+    from utils.character_store import append_owned_style, load_state, replace_style_in_inventory, set_active_style
+
+    with patch("utils.character_store.get_style", return_value=MagicMock()), \
+            patch("utils.leaderboard.update_all_periods", AsyncMock()):
+        await append_owned_style(17, "knight")
+        ok, _ = await set_active_style(17, "knight")
+        assert ok
+        with patch("utils.character_streak.delete_character_streak", AsyncMock(return_value=0)):
+            ok, _ = await replace_style_in_inventory(user_id=17, old_style_id="knight", new_style_id="wizard")
+    assert ok
+    st = await load_state(17)
+    assert "knight" not in st.owned_custom and "wizard" in st.owned_custom
+    assert st.active_style_id == ""
+
+    # An unknown replacement leaves the inventory untouched.
+    with patch("utils.character_store.get_style", return_value=None):
+        ok, msg = await replace_style_in_inventory(user_id=17, old_style_id="wizard", new_style_id="ghost")
+    assert ok is False and "Unknown" in msg
+    assert "wizard" in (await load_state(17)).owned_custom
@@ -0,0 +1,43 @@
+"""Tests for the static copyright blocklist (utils/copyright_filter.py)."""
+from __future__ import annotations
+
+
+def _check(name="", cid="", desc="", prompt=""):
+    from utils.copyright_filter import check_copyright_blocklist
+
+    return check_copyright_blocklist(name, cid, desc, prompt)
+
+
+class TestCheckCopyrightBlocklist:
+
+    def test_original_character_passes(self):
+        assert _check("Marigold Vance", "marigold_vance", "A lighthouse keeper.", "Speak softly.") is None
+
+    def test_whole_word_name(self):
+        reason = _check("Son Goku")
+        assert reason is not None
+        assert "The name **goku** is associated" in reason
+
+    def test_exact_multi_word_name(self):
+        reason = _check("Light Yagami")
+        assert reason is not None
+        assert "**light yagami** is associated" in reason
+
+    def test_substring_name_longer_than_three(self):
+        reason = _check("", "xgokux")
+        assert reason is not None
+        assert "The name contains **goku**" in reason
+
+    def test_short_name_only_matches_whole_word(self):
+        assert _check("Gonzalo") is None
+        assert _check("Gon") is not None
+
+    def test_franchise_in_description(self):
+        reason = _check("Marigold", "marigold", "Trained at Hogwarts.", "")
+        assert reason is not None
+        assert "References to **hogwarts**" in reason
+
+    def test_franchise_with_punctuation(self):
+        reason = _check("Marigold", "marigold", "", "A hero from the X-Men.")
+        assert reason is not None
+        assert "**x-men**" in reason
@@ -1,4 +1,4 @@
-"""Spending dashboard helpers (no DB)."""
+"""Dashboard query helpers (no DB)."""
 from __future__ import annotations
 
 from utils.dashboard_queries import _day_list_last_n_days
@@ -9,3 +9,18 @@ def test_day_list_last_n_days_unique_and_length():
     days = _day_list_last_n_days(now_ts=ts, n=14)
     assert len(days) == 14
     assert len(set(days)) == 14
+
+
+async def test_cached_query_does_not_cache_fallback_on_error():
+    from unittest.mock import AsyncMock, patch
+
+    from utils.dashboard_queries import AICostStats, get_ai_cost_stats
+
+    kv_set = AsyncMock()
+    with patch("utils.dashboard_queries.kv_get_json", AsyncMock(return_value=None)), \
+            patch("utils.dashboard_queries.kv_set_json", kv_set), \
+            patch("utils.dashboard_queries.get_sessionmaker", side_effect=RuntimeError("db down")):
+        stats = await get_ai_cost_stats(days=3)
+
+    assert stats == AICostStats([], {}, 0, 0.0)
+    kv_set.assert_not_awaited()
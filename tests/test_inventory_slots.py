@@ -171,3 +171,20 @@ class TestAddStyleToInventory:
                             # Pro at 3 non-base -> still has room
                             ok_pro, _ = await add_style_to_inventory(user_id=1, style_id="new_char", is_pro=True)
                             assert ok_pro is True
+
+    @pytest.mark.asyncio
+    async def test_precomputed_nonbase_count_used(self):
+        """load_state's nonbase_count is trusted over re-counting owned_custom."""
+        from utils.character_store import add_style_to_inventory
+
+        fake_style = MagicMock()
+        state = _make_state(owned=["fun"])
+        state.nonbase_count = 3
+
+        with patch("utils.character_store.get_style", return_value=fake_style):
+            with patch("utils.character_store.owns_style", new_callable=AsyncMock, return_value=False):
+                with patch("utils.character_store.load_state", new_callable=AsyncMock, return_value=state):
+                    with patch("utils.character_store.get_inventory_upgrades", new_callable=AsyncMock, return_value=0):
+                        ok, msg = await add_style_to_inventory(user_id=1, style_id="new_char", is_pro=False)
+                        assert ok is False
+                        assert "full" in msg.lower()
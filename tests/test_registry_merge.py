@@ -116,6 +116,23 @@ class TestMergePackPayload:
 
         STYLE_DEFS.pop("test_merge_default_pack", None)
 
+    def test_merge_bumps_style_revision(self):
+        from utils.character_registry import merge_pack_payload, style_revision, STYLE_DEFS
+
+        before = style_revision()
+        merge_pack_payload({"type": "pack", "characters": "not a list"})
+        assert style_revision() == before
+
+        merge_pack_payload({
+            "type": "pack",
+            "characters": [
+                {"id": "test_merge_rev", "display_name": "R", "rarity": "common", "prompt": "r"},
+            ],
+        })
+        assert style_revision() == before + 1
+
+        STYLE_DEFS.pop("test_merge_rev", None)
+
 
 # ---------------------------------------------------------------------------
 # load_external_characters
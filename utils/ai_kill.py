@@ -68,9 +68,9 @@ async def disable(*, reason: str, ttl_s: int = 3600) -> None:
 
     # Incident record (for DMs + future dashboard)
     try:
-        from utils.incidents import record_incident
+        from utils.incidents import record_incident_nowait
 
-        await record_incident(
+        record_incident_nowait(
             kind="ai_disabled",
             reason=str(meta.get("reason") or "")[:400],
             fields={"ttl_s": int(meta.get("ttl_s") or 0)},
@@ -39,9 +39,9 @@ async def trip(seconds: int) -> None:
     # Best-effort incident signal if this is a "new" open or a substantial extension.
     try:
         if _until > prev + 1:
-            from utils.incidents import record_incident
+            from utils.incidents import record_incident_nowait
 
-            await record_incident(
+            record_incident_nowait(
                 kind="circuit_breaker_open",
                 reason=f"Circuit breaker tripped for ~{seconds}s",
                 fields={"seconds": int(seconds)},
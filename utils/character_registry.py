@@ -182,6 +182,14 @@ STYLE_DEFS: dict[str, StyleDef] = {
 # Snapshot of style ids defined in-code (before external JSON merges).
 _BUILTIN_STYLE_IDS = set(STYLE_DEFS.keys())
 
+# Bumped whenever STYLE_DEFS changes at runtime, so callers can memoize
+# values derived from a StyleDef and drop them when the registry moves.
+_STYLE_REV = 0
+
+
+def style_revision() -> int:
+    return _STYLE_REV
+
 
 def _load_disabled_style_ids() -> set[str]:
     try:
@@ -415,6 +423,7 @@ def merge_pack_payload(payload: dict) -> int:
     This is used by /packs to make newly-created custom packs available
     immediately without a restart.
     """
+    global _STYLE_REV
     try:
         if not isinstance(payload, dict):
             return 0
@@ -434,6 +443,8 @@ def merge_pack_payload(payload: dict) -> int:
             s = _styledef_from_dict(cc)
             STYLE_DEFS[s.style_id] = s  # allow override for dynamic packs
             added += 1
+        if added:
+            _STYLE_REV += 1
         return added
     except Exception:
         return 0
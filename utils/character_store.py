@@ -9,25 +9,34 @@ Fast migration goal:
 We keep the same public function signatures so commands do not break.
 """
 
-from dataclasses import dataclass, field
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Optional
 
+import asyncio
 import json
 import time
 
+from sqlalchemy import case, delete, exists, func, or_, select, union, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
 from utils.backpressure import get_redis_or_none
 from utils.character_registry import BASE_STYLE_IDS, disable_style, get_style, merge_pack_payload
-from utils.packs_store import list_custom_packs, normalize_style_id
-from utils.db import get_sessionmaker
+from utils.packs_store import (
+    find_pack_with_style,
+    index_pack_characters,
+    is_char_index_built,
+    list_custom_packs,
+    normalize_style_id,
+)
+from utils.db import get_engine, get_sessionmaker
 from utils.models import CharacterCustomStyle, CharacterOwnedStyle, CharacterRollHistory, CharacterUserState
 
-try:
-    from sqlalchemy import delete, select  # type: ignore
-except Exception:  # pragma: no cover
-    delete = None  # type: ignore
-    select = None  # type: ignore
 
+# Base characters are implicitly owned by everyone and never stored in the owned table.
+_BASE_STYLE_SET = frozenset(str(s).strip().lower() for s in (BASE_STYLE_IDS or []))
 
 ROLLS_PER_DAY_FREE = 1
 ROLLS_PER_DAY_PRO = 3
@@ -50,6 +59,49 @@ def _roll_window_key(user_id: int) -> str:
     return f"{_ROLL_WINDOW_PREFIX}:{int(user_id)}"
 
 
+# The window is a HASH {s: window start ts, u: rolls used}. Keys written by older
+# builds are JSON strings; reads fall back to them and the consume script
+# converts them in place.
+_LUA_ROLL_WINDOW_CONSUME = """
+local k = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+local s = 0
+if redis.call('TYPE', k).ok == 'string' then
+  local ok, d = pcall(cjson.decode, redis.call('GET', k))
+  redis.call('DEL', k)
+  if ok and type(d) == 'table' and (now - (tonumber(d['s']) or 0)) < window then
+    redis.call('HSET', k, 's', tonumber(d['s']) or now, 'u', tonumber(d['u']) or 0)
+    redis.call('EXPIRE', k, ttl)
+  end
+end
+s = tonumber(redis.call('HGET', k, 's') or '0')
+if s == 0 or now - s >= window then
+  redis.call('HSET', k, 's', now, 'u', 1)
+  redis.call('EXPIRE', k, ttl)
+  return 1
+end
+return redis.call('HINCRBY', k, 'u', 1)
+"""
+
+
+async def _read_roll_window(r: Any, key: str) -> tuple[int, int] | None:
+    """Return (start_ts, used) for the roll window, or None if there is none."""
+    try:
+        start_raw, used_raw = await r.hmget(key, "s", "u")
+    except Exception:
+        # Legacy JSON string value (WRONGTYPE for HMGET).
+        raw = await r.get(key)
+        if not raw:
+            return None
+        data = json.loads(raw)  # accepts str or bytes
+        return int(data.get("s") or 0), int(data.get("u") or 0)
+    if start_raw is None and used_raw is None:
+        return None
+    return int(start_raw or 0), int(used_raw or 0)
+
+
 def roll_window_seconds() -> int:
     """Public: roll window in seconds (0 = calendar day). Used for UI (e.g. 'per 5h')."""
     return _roll_window_seconds()
@@ -113,6 +165,10 @@ class CharacterState:
     pity_mythic: int = 0
     pity_legendary: int = 0
     owned_custom: list[str] = field(default_factory=list)
+    inventory_upgrades: int = 0
+    # Slot-counted (non-base) inventory size; filled once by load_state so
+    # repeated slot checks on a cached state skip the recount.
+    nonbase_count: int | None = None
 
 
 @dataclass
@@ -124,10 +180,70 @@ class CustomStyleProfile:
     created_at: float
 
 
-async def _get_or_create_user_state_row(user_id: int) -> CharacterUserState:
-    if select is None:
-        raise RuntimeError("sqlalchemy not available")
+# Short-lived per-process cache for load_state. A single command often loads the
+# same user's state several times (can_roll -> consume_roll -> increment_roll_used),
+# so a few seconds is enough to collapse those into one set of queries. Every
+# write path in this module invalidates the user's entry after committing.
+_STATE_CACHE_TTL_S = 3.0
+_STATE_CACHE_MAX = 2048
+_STATE_CACHE: "OrderedDict[int, tuple[float, CharacterState]]" = OrderedDict()
+# Invalidation generations. load_state snapshots (epoch, user gen) before querying and
+# skips the cache put if either moved, so a write that commits mid-load can't have
+# its invalidation overwritten by the stale row. Evicting a gen entry bumps the epoch.
+_STATE_CACHE_EPOCH = 0
+_STATE_GEN_MAX = 8192
+_STATE_CACHE_GEN: "OrderedDict[int, int]" = OrderedDict()
+
+
+def _copy_state(st: CharacterState) -> CharacterState:
+    return replace(st, owned_custom=list(st.owned_custom))
+
+
+def _state_cache_get(user_id: int) -> CharacterState | None:
+    hit = _STATE_CACHE.get(int(user_id))
+    if hit is None:
+        return None
+    ts, st = hit
+    if time.monotonic() - ts >= _STATE_CACHE_TTL_S:
+        _STATE_CACHE.pop(int(user_id), None)
+        return None
+    _STATE_CACHE.move_to_end(int(user_id))
+    return _copy_state(st)
+
+
+def _state_cache_gen(user_id: int) -> tuple[int, int]:
+    return _STATE_CACHE_EPOCH, _STATE_CACHE_GEN.get(int(user_id), 0)
+
+
+def _state_cache_put(st: CharacterState, gen: tuple[int, int]) -> None:
+    if _state_cache_gen(st.user_id) != gen:
+        return
+    _STATE_CACHE[int(st.user_id)] = (time.monotonic(), _copy_state(st))
+    _STATE_CACHE.move_to_end(int(st.user_id))
+    while len(_STATE_CACHE) > _STATE_CACHE_MAX:
+        _STATE_CACHE.popitem(last=False)
+
+
+def invalidate_state_cache(user_id: int | None = None) -> None:
+    """Drop cached load_state results (one user, or everyone when user_id is None).
+
+    Call this after writing character tables outside this module (privacy delete, owner wipes).
+    """
+    global _STATE_CACHE_EPOCH
+    if user_id is None:
+        _STATE_CACHE.clear()
+        _STATE_CACHE_EPOCH += 1
+        return
+    uid = int(user_id)
+    _STATE_CACHE.pop(uid, None)
+    _STATE_CACHE_GEN[uid] = _STATE_CACHE_GEN.get(uid, 0) + 1
+    _STATE_CACHE_GEN.move_to_end(uid)
+    if len(_STATE_CACHE_GEN) > _STATE_GEN_MAX:
+        _STATE_CACHE_GEN.popitem(last=False)
+        _STATE_CACHE_EPOCH += 1
 
+
+async def _get_or_create_user_state_row(user_id: int) -> CharacterUserState:
     Session = get_sessionmaker()
     async with Session() as session:
         row = await session.get(CharacterUserState, int(user_id))
@@ -149,11 +265,11 @@ async def _get_or_create_user_state_row(user_id: int) -> CharacterUserState:
 
 async def load_state(user_id: int) -> CharacterState:
     """Load durable character state from Postgres."""
-    if select is None:
-        # Shouldn't happen in this migration (requirements include SQLAlchemy),
-        # but keep a clear failure mode.
-        raise RuntimeError("sqlalchemy not available")
+    cached = _state_cache_get(user_id)
+    if cached is not None:
+        return cached
 
+    gen = _state_cache_gen(user_id)
     Session = get_sessionmaker()
     async with Session() as session:
         row = await session.get(CharacterUserState, int(user_id))
@@ -162,24 +278,9 @@ async def load_state(user_id: int) -> CharacterState:
             row = CharacterUserState(user_id=int(user_id))
 
         # inventory = owned registry styles + custom styles
-        owned_rows = await session.execute(
-            select(CharacterOwnedStyle.style_id).where(CharacterOwnedStyle.user_id == int(user_id))
-        )
-        custom_rows = await session.execute(
-            select(CharacterCustomStyle.style_id).where(CharacterCustomStyle.user_id == int(user_id))
-        )
+        styles = await _inventory_style_ids(session, user_id)
 
-        styles: set[str] = {"fun"}
-        for sid in owned_rows.scalars().all() or []:
-            s = _norm(str(sid))
-            if s:
-                styles.add(s)
-        for sid in custom_rows.scalars().all() or []:
-            s = _norm(str(sid))
-            if s:
-                styles.add(s)
-
-        return CharacterState(
+        st = CharacterState(
             user_id=int(user_id),
             active_style_id=_norm(getattr(row, "active_style_id", "") or ""),
             points=int(getattr(row, "points", 0) or 0),
@@ -188,14 +289,15 @@ async def load_state(user_id: int) -> CharacterState:
             pity_mythic=int(getattr(row, "pity_mythic", 0) or 0),
             pity_legendary=int(getattr(row, "pity_legendary", 0) or 0),
             owned_custom=sorted(styles),
+            inventory_upgrades=int(getattr(row, "inventory_upgrades", 0) or 0),
+            nonbase_count=_count_inventory_nonbase(styles),
         )
+    _state_cache_put(st, gen)
+    return st
 
 
 async def _save_state(st: CharacterState) -> None:
     """Upsert user state row."""
-    if select is None:
-        raise RuntimeError("sqlalchemy not available")
-
     Session = get_sessionmaker()
     async with Session() as session:
         row = await session.get(CharacterUserState, int(st.user_id))
@@ -212,33 +314,32 @@ async def _save_state(st: CharacterState) -> None:
         row.updated_at = _now_utc()
 
         await session.commit()
+    invalidate_state_cache(st.user_id)
 
 
 # ----------------------------
 # Inventory helpers
 # ----------------------------
 
+async def _inventory_style_ids(session: Any, user_id: int) -> set[str]:
+    """Owned + custom style ids (normalized and deduped by the database) plus "fun"."""
+    owned_ids = select(func.lower(func.trim(CharacterOwnedStyle.style_id))).where(
+        CharacterOwnedStyle.user_id == int(user_id)
+    )
+    custom_ids = select(func.lower(func.trim(CharacterCustomStyle.style_id))).where(
+        CharacterCustomStyle.user_id == int(user_id)
+    )
+    res = await session.execute(union(owned_ids, custom_ids))
+    out = {"fun", *res.scalars().all()}
+    out.discard("")
+    out.discard(None)
+    return out
+
+
 async def get_all_owned_style_ids(user_id: int) -> set[str]:
-    if select is None:
-        raise RuntimeError("sqlalchemy not available")
     Session = get_sessionmaker()
     async with Session() as session:
-        owned_rows = await session.execute(
-            select(CharacterOwnedStyle.style_id).where(CharacterOwnedStyle.user_id == int(user_id))
-        )
-        custom_rows = await session.execute(
-            select(CharacterCustomStyle.style_id).where(CharacterCustomStyle.user_id == int(user_id))
-        )
-        out: set[str] = {"fun"}
-        for sid in owned_rows.scalars().all() or []:
-            s = _norm(str(sid))
-            if s:
-                out.add(s)
-        for sid in custom_rows.scalars().all() or []:
-            s = _norm(str(sid))
-            if s:
-                out.add(s)
-        return out
+        return await _inventory_style_ids(session, user_id)
 
 
 async def owns_style(user_id: int, style_id: str) -> bool:
@@ -246,41 +347,64 @@ async def owns_style(user_id: int, style_id: str) -> bool:
     style_id = _norm(style_id)
     if not style_id:
         return False
-    if style_id == "fun":
+    if style_id in _BASE_STYLE_SET:
         return True
 
-    if select is None:
-        raise RuntimeError("sqlalchemy not available")
-
     Session = get_sessionmaker()
     async with Session() as session:
-        # Registry-owned (including shop pack_roll/character_grant) are in CharacterOwnedStyle.
-        res_owned = await session.execute(
-            select(CharacterOwnedStyle.id)
-            .where(CharacterOwnedStyle.user_id == int(user_id))
-            .where(CharacterOwnedStyle.style_id == style_id)
-            .limit(1)
+        # Registry-owned (including shop pack_roll/character_grant) are in CharacterOwnedStyle;
+        # custom profiles are in CharacterCustomStyle. One round-trip checks both.
+        owned = exists().where(
+            CharacterOwnedStyle.user_id == int(user_id),
+            CharacterOwnedStyle.style_id == style_id,
         )
-        if res_owned.scalar_one_or_none() is not None:
-            return True
-        # Custom profiles are in CharacterCustomStyle.
-        res_custom = await session.execute(
-            select(CharacterCustomStyle.id)
-            .where(CharacterCustomStyle.user_id == int(user_id))
-            .where(CharacterCustomStyle.style_id == style_id)
-            .limit(1)
+        custom = exists().where(
+            CharacterCustomStyle.user_id == int(user_id),
+            CharacterCustomStyle.style_id == style_id,
         )
-        return res_custom.scalar_one_or_none() is not None
+        res = await session.execute(select(or_(owned, custom)))
+        return bool(res.scalar())
+
+
+async def _count_inventory(session: Any, user_id: int) -> int:
+    """Inventory size as shown on the leaderboard: owned + custom (deduped) plus the implicit "fun"."""
+    owned_ids = select(CharacterOwnedStyle.style_id).where(CharacterOwnedStyle.user_id == int(user_id))
+    custom_ids = select(CharacterCustomStyle.style_id).where(CharacterCustomStyle.user_id == int(user_id))
+    res = await session.execute(select(func.count()).select_from(union(owned_ids, custom_ids).subquery()))
+    return int(res.scalar() or 0) + 1
+
+
+async def _update_characters_leaderboard(*, user_id: int, count: int, guild_id: int | None) -> None:
+    """Write the character count to the global board (and the server board when guild_id is given)."""
+    try:
+        from utils.leaderboard import update_all_periods, CATEGORY_CHARACTERS, GLOBAL_GUILD_ID
+        updates = [
+            update_all_periods(
+                category=CATEGORY_CHARACTERS,
+                guild_id=GLOBAL_GUILD_ID,
+                user_id=user_id,
+                value=float(count),
+            )
+        ]
+        if guild_id is not None and int(guild_id) != GLOBAL_GUILD_ID:
+            updates.append(
+                update_all_periods(
+                    category=CATEGORY_CHARACTERS,
+                    guild_id=int(guild_id),
+                    user_id=user_id,
+                    value=float(count),
+                )
+            )
+        await asyncio.gather(*updates)
+    except Exception:
+        pass
 
 
 async def append_owned_style(user_id: int, style_id: str, *, guild_id: int | None = None) -> None:
     style_id = _norm(style_id)
-    if not style_id or style_id == "fun":
+    if not style_id or style_id in _BASE_STYLE_SET:
         return
 
-    if select is None:
-        raise RuntimeError("sqlalchemy not available")
-
     # Only registry styles go in the owned table.
     if not get_style(style_id):
         return
@@ -293,30 +417,80 @@ async def append_owned_style(user_id: int, style_id: str, *, guild_id: int | Non
             .where(CharacterOwnedStyle.style_id == style_id)
             .limit(1)
         )
-        if res.scalar_one_or_none() is None:
-            session.add(CharacterOwnedStyle(user_id=int(user_id), style_id=style_id))
-            await session.commit()
-            
-            # Update leaderboard for character count (global + server when guild_id provided)
-            try:
-                from utils.leaderboard import update_all_periods, CATEGORY_CHARACTERS, GLOBAL_GUILD_ID
-                owned_set = await get_all_owned_style_ids(user_id)
-                count = float(len(owned_set))
-                await update_all_periods(
-                    category=CATEGORY_CHARACTERS,
-                    guild_id=GLOBAL_GUILD_ID,
-                    user_id=user_id,
-                    value=count,
-                )
-                if guild_id is not None and int(guild_id) != GLOBAL_GUILD_ID:
-                    await update_all_periods(
-                        category=CATEGORY_CHARACTERS,
-                        guild_id=int(guild_id),
-                        user_id=user_id,
-                        value=count,
-                    )
-            except Exception:
-                pass
+        if res.scalar_one_or_none() is not None:
+            return
+        session.add(CharacterOwnedStyle(user_id=int(user_id), style_id=style_id))
+        await session.commit()
+        invalidate_state_cache(user_id)
+
+        try:
+            count = await _count_inventory(session, user_id)
+        except Exception:
+            return
+
+    await _update_characters_leaderboard(user_id=user_id, count=count, guild_id=guild_id)
+
+
+def _dialect_insert():
+    # Use engine dialect so we pick the right INSERT (session.get_bind() can be unreliable with async).
+    try:
+        dialect_name = str(getattr(get_engine().dialect, "name", "") or "").lower()
+    except Exception:
+        dialect_name = ""
+    return sqlite_insert if "sqlite" in dialect_name else pg_insert
+
+
+async def append_owned_styles_bulk(
+    user_id: int, style_ids: Iterable[str], *, guild_id: int | None = None, slots: int | None = None
+) -> list[str]:
+    """Grant several registry styles with one multi-row INSERT ... ON CONFLICT DO NOTHING.
+
+    Pack/shop styles not yet merged into the registry are loaded first.
+    With slots (the tier's base slot count), the user's state row is locked and the
+    non-base inventory and paid upgrades are re-read in the insert transaction, and
+    the grant is capped at the remaining space, so concurrent grants can't overshoot.
+    Without it there is no slot enforcement.
+    Returns the style ids that were newly inserted.
+    """
+    wanted: list[str] = []
+    for sid in style_ids or []:
+        sid = _norm(sid)
+        if sid and sid not in _BASE_STYLE_SET and sid not in wanted and await _ensure_style_loaded(sid):
+            wanted.append(sid)
+    if not wanted:
+        return []
+
+    Session = get_sessionmaker()
+    async with Session() as session:
+        if slots is not None:
+            row = await session.get(CharacterUserState, int(user_id), with_for_update=True)
+            upgrades = int(getattr(row, "inventory_upgrades", 0) or 0) if row is not None else 0
+            owned = await _inventory_style_ids(session, user_id)
+            free = max(0, int(slots) + upgrades * 5 - _count_inventory_nonbase(owned))
+            wanted = [sid for sid in wanted if sid not in owned][:free]
+            if not wanted:
+                await session.rollback()
+                return []
+        stmt = (
+            _dialect_insert()(CharacterOwnedStyle)
+            .values([{"user_id": int(user_id), "style_id": sid, "created_at": _now_utc()} for sid in wanted])
+            .on_conflict_do_nothing(index_elements=["user_id", "style_id"])
+            .returning(CharacterOwnedStyle.style_id)
+        )
+        res = await session.execute(stmt)
+        inserted = [str(sid) for sid in res.scalars().all()]
+        await session.commit()
+        invalidate_state_cache(user_id)
+        if not inserted:
+            return []
+
+        try:
+            count = await _count_inventory(session, user_id)
+        except Exception:
+            return inserted
+
+    await _update_characters_leaderboard(user_id=user_id, count=count, guild_id=guild_id)
+    return inserted
 
 
 async def remove_owned_style(user_id: int, style_id: str) -> None:
@@ -324,9 +498,6 @@ async def remove_owned_style(user_id: int, style_id: str) -> None:
     if not style_id:
         return
 
-    if delete is None:
-        raise RuntimeError("sqlalchemy not available")
-
     Session = get_sessionmaker()
     async with Session() as session:
         await session.execute(
@@ -335,35 +506,47 @@ async def remove_owned_style(user_id: int, style_id: str) -> None:
             .where(CharacterOwnedStyle.style_id == style_id)
         )
         await session.commit()
+    invalidate_state_cache(user_id)
 
 
 # ----------------------------
 # Active selection
 # ----------------------------
 
+async def _write_active_style_id(user_id: int, style_id: str) -> None:
+    """Set active_style_id with one UPDATE (inserting the row only if it doesn't exist yet)."""
+    now = _now_utc()
+    Session = get_sessionmaker()
+    async with Session() as session:
+        res = await session.execute(
+            update(CharacterUserState)
+            .where(CharacterUserState.user_id == int(user_id))
+            .values(active_style_id=style_id, updated_at=now)
+        )
+        if not (getattr(res, "rowcount", 0) or 0):
+            session.add(CharacterUserState(user_id=int(user_id), active_style_id=style_id, updated_at=now))
+        await session.commit()
+    invalidate_state_cache(user_id)
+
+
 async def set_active_style(user_id: int, style_id: str | None) -> tuple[bool, str]:
     style_id_norm = _norm(style_id)
 
     # Clear selection
     if not style_id_norm:
-        st = await load_state(user_id)
-        st.active_style_id = ""
-        await _save_state(st)
+        await _write_active_style_id(user_id, "")
         return True, "Cleared selection."
 
-    if not await owns_style(user_id, style_id_norm):
+    # Base styles are owned by everyone; skip the ownership query.
+    if style_id_norm not in _BASE_STYLE_SET and not await owns_style(user_id, style_id_norm):
         return False, "You don't own that style."
 
-    st = await load_state(user_id)
-    st.active_style_id = style_id_norm
-    await _save_state(st)
+    await _write_active_style_id(user_id, style_id_norm)
     return True, ""
 
 
 async def clear_active_style(user_id: int) -> None:
-    st = await load_state(user_id)
-    st.active_style_id = ""
-    await _save_state(st)
+    await _write_active_style_id(user_id, "")
 
 
 # ----------------------------
@@ -419,13 +602,10 @@ async def can_roll(*, user_id: int, tier: str) -> tuple[bool, int, int]:
         max_rolls = per_day
         key = _roll_window_key(user_id)
         try:
-            raw = await r.get(key)
-            if raw:
-                data = json.loads(raw) if isinstance(raw, str) else json.loads(raw.decode("utf-8"))
-                start_ts = int(data.get("s") or 0)
-                used = int(data.get("u") or 0)
+            window = await _read_roll_window(r, key)
+            if window is not None:
+                start_ts, used = window
                 if now - start_ts >= window_s:
-                    start_ts = now
                     used = 0
                 remaining_window = max(0, max_rolls - used)
             else:
@@ -434,15 +614,12 @@ async def can_roll(*, user_id: int, tier: str) -> tuple[bool, int, int]:
             remaining_window = max_rolls
         remaining_total = remaining_window + max(0, int(bonus or 0))
         return (remaining_total > 0), remaining_total, per_day
-    # Calendar-day logic
+    # Calendar-day logic. A stale roll_day means nothing used today; no need to
+    # write the reset here, increment_roll_used resets and increments atomically.
     st = await load_state(user_id)
-    today = _utc_day()
-    if st.roll_day != today:
-        st.roll_day = today
-        st.roll_used = 0
-        await _save_state(st)
+    used_today = int(st.roll_used or 0) if st.roll_day == _utc_day() else 0
 
-    remaining = max(0, per_day - int(st.roll_used or 0))
+    remaining = max(0, per_day - used_today)
     remaining_total = remaining + max(0, int(bonus or 0))
     return (remaining_total > 0), remaining_total, per_day
 
@@ -468,9 +645,11 @@ async def grant_bonus_rolls(*, user_id: int, amount: int = 1, ttl_days: int = 7)
         return 0
     key = _bonus_key(user_id)
     try:
-        val = int(await r.incrby(key, amount))
-        await r.expire(key, ttl_s)
-        return val
+        pipe = r.pipeline(transaction=False)
+        pipe.incrby(key, amount)
+        pipe.expire(key, ttl_s)
+        val, _ = await pipe.execute()
+        return int(val)
     except Exception:
         return 0
 
@@ -497,19 +676,28 @@ async def consume_bonus_roll(*, user_id: int) -> bool:
         return False
 
 
+# Set the onboarded flag (SET NX) and bump the bonus counter in one atomic step.
+_LUA_GRANT_ONBOARDING = """
+if not redis.call('SET', KEYS[1], '1', 'NX', 'EX', tonumber(ARGV[1])) then
+  return 0
+end
+redis.call('INCRBY', KEYS[2], 1)
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[2]))
+return 1
+"""
+
+
 async def grant_onboarding_roll(*, user_id: int) -> bool:
     """One-time onboarding: grant +1 bonus roll. Returns True if granted."""
     r = await get_redis_or_none()
     if r is None:
         return False
-    ok_key = _onboarded_key(user_id)
     try:
-        # SETNX so it only grants once. Keep a long TTL so Redis size is bounded.
-        created = await r.set(ok_key, "1", nx=True, ex=86400 * 365)
-        if not created:
-            return False
-        await grant_bonus_rolls(user_id=user_id, amount=1, ttl_days=30)
-        return True
+        # Flag keeps a long TTL so Redis size is bounded; the bonus roll lasts 30 days.
+        granted = await r.eval(
+            _LUA_GRANT_ONBOARDING, 2, _onboarded_key(user_id), _bonus_key(user_id), 86400 * 365, 30 * 86400
+        )
+        return bool(int(granted or 0))
     except Exception:
         return False
 
@@ -525,19 +713,7 @@ async def consume_roll(*, user_id: int) -> None:
             try:
                 now = int(time.time())
                 key = _roll_window_key(user_id)
-                raw = await r.get(key)
-                if raw:
-                    data = json.loads(raw) if isinstance(raw, str) else json.loads(raw.decode("utf-8"))
-                    start_ts = int(data.get("s") or 0)
-                    used = int(data.get("u") or 0)
-                    if now - start_ts >= window_s:
-                        start_ts = now
-                        used = 0
-                else:
-                    start_ts = now
-                    used = 0
-                used += 1
-                await r.set(key, json.dumps({"s": start_ts, "u": used}), ex=window_s + 86400)
+                await r.eval(_LUA_ROLL_WINDOW_CONSUME, 1, key, now, window_s, window_s + 86400)
             except Exception:
                 pass
         return
@@ -559,12 +735,10 @@ async def get_roll_retry_after_seconds(*, user_id: int, tier: str) -> int:
     now = int(time.time())
     key = _roll_window_key(user_id)
     try:
-        raw = await r.get(key)
-        if not raw:
+        window = await _read_roll_window(r, key)
+        if window is None:
             return 0
-        data = json.loads(raw) if isinstance(raw, str) else json.loads(raw.decode("utf-8"))
-        start_ts = int(data.get("s") or 0)
-        used = int(data.get("u") or 0)
+        start_ts, used = window
         max_rolls = ROLLS_PER_DAY_PRO if (tier or "").strip().lower() == "pro" else ROLLS_PER_DAY_FREE
         if used < max_rolls:
             return 0
@@ -576,13 +750,27 @@ async def get_roll_retry_after_seconds(*, user_id: int, tier: str) -> int:
 
 
 async def increment_roll_used(*, user_id: int) -> None:
-    st = await load_state(user_id)
+    """Count one calendar-day roll: a single UPDATE that resets roll_used on a new day."""
     today = _utc_day()
-    if st.roll_day != today:
-        st.roll_day = today
-        st.roll_used = 0
-    st.roll_used = int(st.roll_used or 0) + 1
-    await _save_state(st)
+    now = _now_utc()
+    Session = get_sessionmaker()
+    async with Session() as session:
+        res = await session.execute(
+            update(CharacterUserState)
+            .where(CharacterUserState.user_id == int(user_id))
+            .values(
+                roll_used=case(
+                    (CharacterUserState.roll_day == today, CharacterUserState.roll_used + 1),
+                    else_=1,
+                ),
+                roll_day=today,
+                updated_at=now,
+            )
+        )
+        if not (getattr(res, "rowcount", 0) or 0):
+            session.add(CharacterUserState(user_id=int(user_id), roll_day=today, roll_used=1, updated_at=now))
+        await session.commit()
+    invalidate_state_cache(user_id)
 
 
 async def get_pity(*, user_id: int) -> tuple[int, int]:
@@ -606,9 +794,6 @@ async def upsert_custom_style_profile(*, user_id: int, style_id: str, name: str,
     if not style_id:
         raise ValueError("style_id required")
 
-    if select is None:
-        raise RuntimeError("sqlalchemy not available")
-
     Session = get_sessionmaker()
     async with Session() as session:
         res = await session.execute(
@@ -634,6 +819,7 @@ async def upsert_custom_style_profile(*, user_id: int, style_id: str, name: str,
             row.prompt = (prompt or "")[:1500]
             row.updated_at = now
         await session.commit()
+    invalidate_state_cache(user_id)
 
 
 async def get_custom_style_profile(*, user_id: int, style_id: str) -> CustomStyleProfile | None:
@@ -641,67 +827,64 @@ async def get_custom_style_profile(*, user_id: int, style_id: str) -> CustomStyl
     if not style_id:
         return None
 
-    if select is None:
-        raise RuntimeError("sqlalchemy not available")
-
     Session = get_sessionmaker()
     async with Session() as session:
         res = await session.execute(
-            select(CharacterCustomStyle).where(
+            select(
+                CharacterCustomStyle.name,
+                CharacterCustomStyle.prompt,
+                CharacterCustomStyle.created_at,
+            ).where(
                 CharacterCustomStyle.user_id == int(user_id),
                 CharacterCustomStyle.style_id == style_id,
             )
         )
-        row = res.scalar_one_or_none()
+        row = res.one_or_none()
         if row is None:
             return None
-        created = getattr(row, "created_at", None) or _now_utc()
+        name, prompt, created = row
         return CustomStyleProfile(
             user_id=int(user_id),
             style_id=style_id,
-            name=(getattr(row, "name", "") or style_id),
-            prompt=(getattr(row, "prompt", "") or ""),
-            created_at=float(created.timestamp()),
+            name=(name or style_id),
+            prompt=(prompt or ""),
+            created_at=float((created or _now_utc()).timestamp()),
         )
 
 
 async def list_custom_style_profiles(*, user_id: int, limit: int = 25) -> list[CustomStyleProfile]:
     limit = max(1, min(int(limit or 25), 50))
-    if select is None:
-        raise RuntimeError("sqlalchemy not available")
-
     Session = get_sessionmaker()
     async with Session() as session:
         res = await session.execute(
-            select(CharacterCustomStyle)
+            select(
+                CharacterCustomStyle.style_id,
+                CharacterCustomStyle.name,
+                CharacterCustomStyle.prompt,
+                CharacterCustomStyle.created_at,
+            )
             .where(CharacterCustomStyle.user_id == int(user_id))
             .order_by(CharacterCustomStyle.created_at.desc())
             .limit(limit)
         )
-        rows = res.scalars().all() or []
-        out: list[CustomStyleProfile] = []
-        for row in rows:
-            created = getattr(row, "created_at", None) or _now_utc()
-            out.append(
-                CustomStyleProfile(
-                    user_id=int(user_id),
-                    style_id=_norm(getattr(row, "style_id", "")),
-                    name=(getattr(row, "name", "") or ""),
-                    prompt=(getattr(row, "prompt", "") or ""),
-                    created_at=float(created.timestamp()),
-                )
+        return [
+            CustomStyleProfile(
+                user_id=int(user_id),
+                style_id=_norm(sid),
+                name=(name or ""),
+                prompt=(prompt or ""),
+                created_at=float((created or _now_utc()).timestamp()),
             )
-        return out
+            for sid, name, prompt, created in res.all()
+        ]
 
 
 async def delete_custom_style_profile(*, user_id: int, style_id: str) -> bool:
     style_id = _norm(style_id)
     if not style_id:
         return False
-    if style_id in {str(s).strip().lower() for s in (BASE_STYLE_IDS or [])}:
+    if style_id in _BASE_STYLE_SET:
         return False
-    if delete is None:
-        raise RuntimeError("sqlalchemy not available")
 
     Session = get_sessionmaker()
     async with Session() as session:
@@ -711,47 +894,45 @@ async def delete_custom_style_profile(*, user_id: int, style_id: str) -> bool:
             .where(CharacterCustomStyle.style_id == style_id)
         )
         await session.commit()
-        return bool(res.rowcount and int(res.rowcount) > 0)
+    invalidate_state_cache(user_id)
+    return bool(res.rowcount and int(res.rowcount) > 0)
 
 
 # ---------------------------------------------------------------------------
 # Compatibility shim: apply_pity_after_roll (kept in Redis, OK to lose)
 # ---------------------------------------------------------------------------
 
-async def _redis_get_json_best_effort(key: str) -> Dict[str, Any]:
-    try:
-        r = await get_redis_or_none()
-        if r is None:
-            return {}
-        raw = await r.get(key)
-        if not raw:
-            return {}
-        if isinstance(raw, (bytes, bytearray)):
-            s = raw.decode("utf-8", errors="ignore").strip()
-        else:
-            s = str(raw).strip()
-        if not s:
-            return {}
-        obj = json.loads(s)
-        return obj if isinstance(obj, dict) else {}
-    except Exception:
-        return {}
-
-
-async def _redis_set_json_best_effort(key: str, value: Dict[str, Any], ttl_seconds: int) -> None:
-    try:
-        r = await get_redis_or_none()
-        if r is None:
-            return
-        data = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
-        if hasattr(r, "setex"):
-            await r.setex(key, ttl_seconds, data)
-        else:
-            await r.set(key, data)
-            if hasattr(r, "expire"):
-                await r.expire(key, ttl_seconds)
-    except Exception:
-        return
+_HIGH_RARITIES = frozenset({"5", "5star", "5★", "legendary", "mythic", "ssr", "ur"})
+_PITY_GUARANTEE_AT = 60
+
+# Pity is a HASH {pity, guaranteed_next, last_roll_ts} updated in one atomic step.
+# Keys written by older builds are JSON strings; the script converts them in place.
+_LUA_APPLY_PITY = """
+local k = KEYS[1]
+local pity, g = 0, 0
+if redis.call('TYPE', k).ok == 'string' then
+  local ok, d = pcall(cjson.decode, redis.call('GET', k))
+  redis.call('DEL', k)
+  if ok and type(d) == 'table' then
+    pity = tonumber(d['pity']) or 0
+    if d['guaranteed_next'] == true then g = 1 end
+  end
+else
+  local cur = redis.call('HMGET', k, 'pity', 'guaranteed_next')
+  pity = tonumber(cur[1]) or 0
+  g = tonumber(cur[2]) or 0
+end
+if ARGV[1] == '1' then
+  pity = 0
+  if ARGV[2] == '0' then g = 1 else g = 0 end
+else
+  pity = pity + 1
+  if pity >= tonumber(ARGV[5]) then g = 1 end
+end
+redis.call('HSET', k, 'pity', pity, 'guaranteed_next', g, 'last_roll_ts', ARGV[3])
+redis.call('EXPIRE', k, tonumber(ARGV[4]))
+return {pity, g}
+"""
 
 
 async def apply_pity_after_roll(
@@ -761,34 +942,31 @@ async def apply_pity_after_roll(
     rolled_rarity: str,
     won_featured: Optional[bool] = None,
 ) -> Dict[str, Any]:
-    key = _pity_key(guild_id, user_id)
-    state = await _redis_get_json_best_effort(key)
-
-    pity = int(state.get("pity", 0) or 0)
-    guaranteed_next = bool(state.get("guaranteed_next", False))
-
-    high_rarities = {"5", "5star", "5★", "legendary", "mythic", "ssr", "ur"}
-    is_high = str(rolled_rarity or "").strip().lower() in high_rarities
-
+    is_high = str(rolled_rarity or "").strip().lower() in _HIGH_RARITIES
     now = int(time.time())
-    state["last_roll_ts"] = now
 
-    if is_high:
-        state["pity"] = 0
-        if won_featured is False:
-            state["guaranteed_next"] = True
-        else:
-            state["guaranteed_next"] = False
-    else:
-        pity += 1
-        state["pity"] = pity
-        if pity >= 60:
-            state["guaranteed_next"] = True
-        else:
-            state["guaranteed_next"] = guaranteed_next
+    # Without Redis (or on error) this behaves like a fresh pity state.
+    pity = 0 if is_high else 1
+    guaranteed_next = (won_featured is False) if is_high else (pity >= _PITY_GUARANTEE_AT)
+    try:
+        r = await get_redis_or_none()
+        if r is not None:
+            won = "" if won_featured is None else ("1" if won_featured else "0")
+            res = await r.eval(
+                _LUA_APPLY_PITY,
+                1,
+                _pity_key(guild_id, user_id),
+                "1" if is_high else "0",
+                won,
+                now,
+                _PITY_TTL_SECONDS,
+                _PITY_GUARANTEE_AT,
+            )
+            pity, guaranteed_next = int(res[0]), bool(int(res[1]))
+    except Exception:
+        pass
 
-    await _redis_set_json_best_effort(key, state, _PITY_TTL_SECONDS)
-    return state
+    return {"pity": pity, "guaranteed_next": guaranteed_next, "last_roll_ts": now}
 
 
 # ---------------------------------------------------------------------------
@@ -813,8 +991,7 @@ def compute_limits(*, is_pro: bool) -> tuple[int, int]:
 
 
 def _count_inventory_nonbase(style_ids: set[str] | list[str]) -> int:
-    base = {str(s).strip().lower() for s in (BASE_STYLE_IDS or [])}
-    return len({str(s).strip().lower() for s in (style_ids or []) if str(s).strip().lower() and str(s).strip().lower() not in base})
+    return len({str(s).strip().lower() for s in (style_ids or []) if str(s).strip().lower() and str(s).strip().lower() not in _BASE_STYLE_SET})
 
 
 async def remove_style_from_inventory(*, user_id: int, style_id: str) -> tuple[bool, str, int]:
@@ -828,18 +1005,13 @@ async def remove_style_from_inventory(*, user_id: int, style_id: str) -> tuple[b
     that was deleted (0 if none existed).
     """
     style_id = _norm(style_id)
-    base = {str(s).strip().lower() for s in (BASE_STYLE_IDS or [])}
     if not style_id:
         return False, "Pick a character.", 0
-    if style_id in base:
+    if style_id in _BASE_STYLE_SET:
         return False, "That base character can’t be removed.", 0
 
-    if not await owns_style(user_id, style_id):
-        return False, "You don’t have that character.", 0
-
-    if delete is None:
-        raise RuntimeError("sqlalchemy not available")
-
+    # One transaction: the DELETE row counts double as the ownership check, and
+    # the active selection is cleared only if it pointed at the removed style.
     removed_any = False
     Session = get_sessionmaker()
     async with Session() as session:
@@ -856,27 +1028,65 @@ async def remove_style_from_inventory(*, user_id: int, style_id: str) -> tuple[b
             .where(CharacterCustomStyle.user_id == int(user_id))
             .where(CharacterCustomStyle.style_id == style_id)
         )
-        await session.commit()
 
         if (getattr(res1, "rowcount", 0) or 0) > 0 or (getattr(res2, "rowcount", 0) or 0) > 0:
             removed_any = True
+            await session.execute(
+                update(CharacterUserState)
+                .where(CharacterUserState.user_id == int(user_id))
+                .where(CharacterUserState.active_style_id == style_id)
+                .values(active_style_id="", updated_at=_now_utc())
+            )
+        await session.commit()
+    invalidate_state_cache(user_id)
 
-    # Clear active selection if it pointed at the removed style
-    st = await load_state(user_id=user_id)
-    if _norm(getattr(st, "active_style_id", "")) == style_id:
-        await clear_active_style(user_id)
+    if not removed_any:
+        return False, "You don’t have that character.", 0
 
     # Clean up character streak data so the reminder loop doesn’t keep
     # sending "streak ended" DMs for a character the user no longer owns.
     old_streak = 0
-    if removed_any:
-        try:
-            from utils.character_streak import delete_character_streak
-            old_streak = await delete_character_streak(user_id=user_id, style_id=style_id)
-        except Exception:
-            pass  # best-effort
+    try:
+        from utils.character_streak import delete_character_streak
+        old_streak = await delete_character_streak(user_id=user_id, style_id=style_id)
+    except Exception:
+        pass  # best-effort
 
-    return (True, "Removed from your collection.", old_streak) if removed_any else (False, "Nothing was removed.", 0)
+    return True, "Removed from your collection.", old_streak
+
+
+async def _ensure_style_loaded(style_id: str) -> bool:
+    """True if style_id is in the registry, merging its pack in first if needed."""
+    if get_style(style_id):
+        return True
+    # Lazy-load custom/shop characters after restart.
+    # Shop "packless" singles live in a hidden internal pack and may not be merged
+    # into the in-memory registry at startup.
+    try:
+        target = normalize_style_id(style_id)
+        pack = await find_pack_with_style(target)
+        if pack is None and not await is_char_index_built():
+            # Index cold (packs stored before pack:by_char existed): scan every pack
+            # once, building {style_id: pack} in one pass, and backfill the index.
+            packs = [p for p in (await list_custom_packs(limit=600, include_internal=True, include_shop_only=True) or []) if isinstance(p, dict)]
+            by_style: dict[str, dict] = {}
+            for p in packs:
+                chars = p.get("characters") or []
+                if not isinstance(chars, list):
+                    continue
+                for c in chars:
+                    if isinstance(c, dict):
+                        by_style.setdefault(normalize_style_id(str(c.get("id") or c.get("style_id") or "")), p)
+            pack = by_style.get(target)
+            await index_pack_characters(packs, complete=True)
+        if pack is not None:
+            try:
+                merge_pack_payload(pack)
+            except Exception:
+                pass
+    except Exception:
+        pass
+    return bool(get_style(style_id))
 
 
 async def add_style_to_inventory(
@@ -886,39 +1096,8 @@ async def add_style_to_inventory(
     if not style_id or style_id == "fun":
         return False, "Invalid character."
 
-    is_registry = bool(get_style(style_id))
-    if not is_registry:
-        # Lazy-load custom/shop characters after restart.
-        # Shop "packless" singles live in a hidden internal pack and may not be merged
-        # into the in-memory registry at startup.
-        try:
-            target = normalize_style_id(style_id)
-            packs = await list_custom_packs(limit=600, include_internal=True, include_shop_only=True)
-            for p in packs or []:
-                if not isinstance(p, dict):
-                    continue
-                chars = p.get("characters") or []
-                if not isinstance(chars, list):
-                    continue
-                found = False
-                for c in chars:
-                    if not isinstance(c, dict):
-                        continue
-                    sid = normalize_style_id(str(c.get("id") or c.get("style_id") or ""))
-                    if sid == target:
-                        found = True
-                        break
-                if found:
-                    try:
-                        merge_pack_payload(p)
-                    except Exception:
-                        pass
-                    break
-        except Exception:
-            pass
-
-        if not get_style(style_id):
-            return False, "Unknown character."
+    if not await _ensure_style_loaded(style_id):
+        return False, "Unknown character."
 
     if await owns_style(user_id, style_id):
         return False, "You already own this character."
@@ -926,7 +1105,9 @@ async def add_style_to_inventory(
     # Slot enforcement: base characters do NOT count.
     # If tier is unknown, default to FREE to stay conservative.
     st = await load_state(user_id)
-    owned_now = set([_norm(x) for x in (st.owned_custom or [])])
+    nonbase = st.nonbase_count
+    if nonbase is None:
+        nonbase = _count_inventory_nonbase(st.owned_custom or [])
     _rolls_cfg, slots = compute_limits(is_pro=bool(is_pro))
     # Apply paid inventory upgrades (+5 slots each).
     try:
@@ -934,7 +1115,7 @@ async def add_style_to_inventory(
     except Exception:
         upgrades = 0
     slots = int(slots) + (upgrades * 5)
-    if _count_inventory_nonbase(owned_now) >= int(slots):
+    if int(nonbase) >= int(slots):
         return False, "Your collection is full."
 
     await append_owned_style(user_id, style_id, guild_id=guild_id)
@@ -950,8 +1131,6 @@ async def has_rolled_style_before(*, user_id: int, style_id: str) -> bool:
     sid = _norm(style_id)
     if not sid:
         return False
-    if select is None:
-        return False
     Session = get_sessionmaker()
     async with Session() as session:
         try:
@@ -971,8 +1150,6 @@ async def mark_style_rolled(*, user_id: int, style_id: str) -> None:
     sid = _norm(style_id)
     if not sid:
         return
-    if select is None:
-        return
     Session = get_sessionmaker()
     async with Session() as session:
         try:
@@ -1015,34 +1192,49 @@ async def replace_style_in_inventory(*, user_id: int, old_style_id: str, new_sty
     if not await owns_style(user_id, old_style_id):
         return False, "You don’t own that character."
 
-    # Remove old from owned/custom
+    if new_style_id not in _BASE_STYLE_SET and not get_style(new_style_id):
+        # cannot replace with non-registry in this fast migration
+        return False, "Unknown new character."
+
+    # One transaction: drop the old style from both tables, grant the new one,
+    # and clear the active selection if it pointed at the old style.
+    count = None
     Session = get_sessionmaker()
     async with Session() as session:
-        if delete is None:
-            raise RuntimeError("sqlalchemy not available")
         await session.execute(
             delete(CharacterOwnedStyle)
             .where(CharacterOwnedStyle.user_id == int(user_id))
             .where(CharacterOwnedStyle.style_id == old_style_id)
+            .execution_options(synchronize_session=False)
         )
         await session.execute(
             delete(CharacterCustomStyle)
             .where(CharacterCustomStyle.user_id == int(user_id))
             .where(CharacterCustomStyle.style_id == old_style_id)
+            .execution_options(synchronize_session=False)
+        )
+        if new_style_id not in _BASE_STYLE_SET:
+            await session.execute(
+                _dialect_insert()(CharacterOwnedStyle)
+                .values(user_id=int(user_id), style_id=new_style_id, created_at=_now_utc())
+                .on_conflict_do_nothing(index_elements=["user_id", "style_id"])
+            )
+        await session.execute(
+            update(CharacterUserState)
+            .where(CharacterUserState.user_id == int(user_id))
+            .where(CharacterUserState.active_style_id == old_style_id)
+            .values(active_style_id="", updated_at=_now_utc())
         )
         await session.commit()
+        invalidate_state_cache(user_id)
 
-    # Add new
-    if get_style(new_style_id):
-        await append_owned_style(user_id, new_style_id)
-    else:
-        # cannot replace with non-registry in this fast migration
-        return False, "Unknown new character."
+        try:
+            count = await _count_inventory(session, user_id)
+        except Exception:
+            pass
 
-    # Clear active if needed
-    st = await load_state(user_id=user_id)
-    if _norm(getattr(st, "active_style_id", "")) == old_style_id:
-        await clear_active_style(user_id)
+    if count is not None:
+        await _update_characters_leaderboard(user_id=user_id, count=count, guild_id=None)
 
     # Clean up character streak for the old character
     try:
@@ -1110,6 +1302,7 @@ async def nuke_style_globally(style_id: str) -> tuple[bool, str]:
         from utils import packs_store  # local import to avoid circular deps
 
         packs = await packs_store.list_custom_packs()
+        upserts = []
         for pack in packs or []:
             if not isinstance(pack, dict):
                 continue
@@ -1128,9 +1321,9 @@ async def nuke_style_globally(style_id: str) -> tuple[bool, str]:
                 new_chars.append(c)
             if changed:
                 pack["characters"] = new_chars
-                ok = await packs_store.upsert_custom_pack(pack)
-                if ok:
-                    removed_from += 1
+                upserts.append(packs_store.upsert_custom_pack(pack))
+        results = await asyncio.gather(*upserts, return_exceptions=True)
+        removed_from = sum(1 for ok in results if ok is True)
     except Exception:
         # best-effort: if Redis is down, we still removed file/registry
         pass
@@ -1139,12 +1332,16 @@ async def nuke_style_globally(style_id: str) -> tuple[bool, str]:
 
 async def get_inventory_upgrades(user_id: int) -> int:
     """Number of permanent inventory upgrades purchased (each is +5 slots)."""
+    # Slot checks call load_state first; reuse its row instead of another query.
+    cached = _state_cache_get(user_id)
+    if cached is not None:
+        return int(cached.inventory_upgrades)
     Session = get_sessionmaker()
     async with Session() as session:
-        st = await session.get(CharacterUserState, int(user_id))
-        if not st:
-            return 0
-        return int(getattr(st, "inventory_upgrades", 0) or 0)
+        res = await session.execute(
+            select(CharacterUserState.inventory_upgrades).where(CharacterUserState.user_id == int(user_id))
+        )
+        return int(res.scalar_one_or_none() or 0)
 
 
 async def increment_inventory_upgrades(user_id: int, *, delta: int = 1) -> int:
@@ -1161,6 +1358,7 @@ async def increment_inventory_upgrades(user_id: int, *, delta: int = 1) -> int:
         cur = max(0, cur + int(delta))
         st.inventory_upgrades = cur
         await session.commit()
-        return cur
+    invalidate_state_cache(user_id)
+    return cur
 
 
@@ -6,18 +6,29 @@ A user maintains a streak with a character by talking to them at least once per
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import time
-from datetime import datetime, timezone, timedelta
+from dataclasses import dataclass
+from datetime import date, timezone, timedelta
+from functools import lru_cache
 
 from utils.backpressure import get_redis_or_none
 from utils.analytics import utc_day_str
 
 log = logging.getLogger("bot.character_streak")
 
-# Redis keys
+# Redis keys (the shared client uses decode_responses=True, so values come back as str)
+# One hash per user: fields "<style_id>:s" (streak) and "<style_id>:d" (last talk day).
 STREAK_KEY_PREFIX = "char_streak"
+# Legacy per-style layout: read per style on demand, or folded in by a full SCAN
+# the first time all of a user's streaks are listed.
 LAST_TALK_KEY_PREFIX = "char_streak:last_talk"
+INDEX_KEY_PREFIX = "char_streak:index"
+# Hash field marking that the user's legacy keys have been migrated.
+_VERSION_FIELD = "_v"
+
+STREAK_TTL_S = 86400 * 90  # 90 day TTL
 
 
 def _now() -> int:
@@ -28,26 +39,222 @@ def _utc_day() -> str:
     return utc_day_str()
 
 
+def _user_key(user_id: int) -> str:
+    """Redis hash holding all of a user's character streaks."""
+    return f"{STREAK_KEY_PREFIX}:{int(user_id)}"
+
+
+def _streak_field(style_id: str) -> str:
+    return f"{str(style_id).lower()}:s"
+
+
+def _last_talk_field(style_id: str) -> str:
+    return f"{str(style_id).lower()}:d"
+
+
+@lru_cache(maxsize=64)
+def _parse_day(day: str) -> date:
+    """YYYYMMDD -> date without strptime (raises ValueError on bad input)."""
+    if len(day) != 8:
+        raise ValueError(f"bad day: {day!r}")
+    return date(int(day[:4]), int(day[4:6]), int(day[6:8]))
+
+
+def _days_between(last_day: str, today: str) -> int:
+    return (_parse_day(today) - _parse_day(last_day)).days
+
+
+@lru_cache(maxsize=8)
+def _expiry_cutoff(today: str) -> str:
+    """Oldest last-talk day (YYYYMMDD) whose streak is still stored.
+
+    Any talk refreshes the whole hash's TTL, so per-character expiry is applied on read.
+    """
+    try:
+        d = _parse_day(today) - timedelta(seconds=STREAK_TTL_S)
+        return d.strftime("%Y%m%d")
+    except Exception:
+        return ""
+
+
 def _streak_key(user_id: int, style_id: str) -> str:
-    """Redis key for character streak."""
+    """Legacy Redis key for character streak."""
     return f"{STREAK_KEY_PREFIX}:{int(user_id)}:{str(style_id).lower()}"
 
 
 def _last_talk_key(user_id: int, style_id: str) -> str:
-    """Redis key for last talk date."""
+    """Legacy Redis key for last talk date."""
     return f"{LAST_TALK_KEY_PREFIX}:{int(user_id)}:{str(style_id).lower()}"
 
 
+def _index_key(user_id: int) -> str:
+    """Legacy Redis set of style_ids the user has a streak with."""
+    return f"{INDEX_KEY_PREFIX}:{int(user_id)}"
+
+
+async def _legacy_style_ids(r, user_id: int) -> list[str]:
+    """Style ids the user has legacy per-style streak keys for.
+
+    Walks the full SCAN cursor (no iteration cap) so the result is complete; any
+    Redis error propagates, and callers must then not mark the user as migrated.
+    The legacy index set is not trusted: keys written before it existed aren't in it.
+    """
+    pattern = f"{STREAK_KEY_PREFIX}:{int(user_id)}:*"
+    cursor = 0
+    style_ids: list[str] = []
+    while True:
+        cursor, keys = await r.scan(cursor, match=pattern, count=1000)
+        for key in keys or []:
+            # Extract style_id from key: char_streak:user_id:style_id
+            parts = key.split(":", 2)
+            if len(parts) >= 3:
+                style_ids.append(parts[2])
+        if cursor == 0:
+            break
+    return style_ids
+
+
+async def _fold_legacy(r, user_id: int, style_ids: list[str], *, mark_migrated: bool) -> dict[str, str]:
+    """Copy legacy per-style keys into the user's hash, then delete them.
+
+    Fields already in the hash are newer and win (HSETNX). With mark_migrated the
+    version field is written too; only pass it after a complete legacy discovery.
+    Returns the legacy fields found.
+    """
+    found: dict[str, str] = {}
+    legacy_keys: list[str] = []
+    if style_ids:
+        for style_id in style_ids:
+            legacy_keys.append(_streak_key(user_id, style_id))
+            legacy_keys.append(_last_talk_key(user_id, style_id))
+        vals = await r.mget(legacy_keys)
+        for i, style_id in enumerate(style_ids):
+            streak_raw, lt_raw = vals[2 * i], vals[2 * i + 1]
+            if streak_raw is None:
+                continue
+            found[_streak_field(style_id)] = streak_raw
+            found[_last_talk_field(style_id)] = lt_raw or ""
+    if not found and not mark_migrated:
+        return found
+
+    key = _user_key(user_id)
+    pipe = r.pipeline(transaction=False)
+    for field, value in found.items():
+        pipe.hsetnx(key, field, value)
+    if mark_migrated:
+        pipe.hset(key, _VERSION_FIELD, "2")
+        legacy_keys.append(_index_key(user_id))
+    pipe.expire(key, STREAK_TTL_S)
+    if legacy_keys:
+        pipe.unlink(*legacy_keys)
+    await pipe.execute()
+    return found
+
+
+async def _migrate_legacy(r, user_id: int) -> dict[str, str]:
+    """Fold all of a user's legacy per-style keys into their streak hash.
+
+    Runs once per user: afterwards the version field short-circuits it. The
+    version field is only written after the SCAN finished without error.
+    """
+    style_ids = await _legacy_style_ids(r, user_id)
+    return await _fold_legacy(r, user_id, style_ids, mark_migrated=True)
+
+
+async def _read_style(r, user_id: int, style_id: str, today: str) -> tuple[int, str]:
+    """(streak, last_talk_day) for one character, or (0, "") if none is stored."""
+    streak_raw, lt_raw, version = await r.hmget(
+        _user_key(user_id), _streak_field(style_id), _last_talk_field(style_id), _VERSION_FIELD
+    )
+    if version is None and streak_raw is None:
+        # Style is known, so its legacy keys can be read directly (no SCAN).
+        legacy = await _fold_legacy(r, user_id, [str(style_id).lower()], mark_migrated=False)
+        streak_raw = legacy.get(_streak_field(style_id))
+        lt_raw = legacy.get(_last_talk_field(style_id))
+    last_talk = lt_raw or ""
+    if not streak_raw or (last_talk and last_talk < _expiry_cutoff(today)):
+        return (0, "")
+    return (int(streak_raw), last_talk)
+
+
+async def _read_all(r, user_id: int, today: str) -> dict[str, tuple[int, str]]:
+    """style_id -> (streak, last_talk_day) for every stored character streak."""
+    h = await r.hgetall(_user_key(user_id))
+    if _VERSION_FIELD not in h:
+        legacy = await _migrate_legacy(r, user_id)
+        h = {**legacy, **h}
+    cutoff = _expiry_cutoff(today)
+    out: dict[str, tuple[int, str]] = {}
+    for field, streak_raw in h.items():
+        if not field.endswith(":s"):
+            continue
+        style_id = field[:-2]
+        last_talk = h.get(f"{style_id}:d") or ""
+        if last_talk and last_talk < cutoff:
+            continue
+        out[style_id] = (int(streak_raw) if streak_raw else 0, last_talk)
+    return out
+
+
+@dataclass(frozen=True)
+class StreakResult:
+    """Outcome of recording a talk, so callers don't re-read the streak."""
+
+    streak: int
+    continued: bool  # True if the streak was maintained, False if broken or new
+    alive: bool
+    prev_last_talk: str = ""  # last talk day (YYYYMMDD) before this talk
+
+
+def _is_alive(last_talk: str, today: str) -> bool:
+    """True if last_talk was today or yesterday."""
+    if not last_talk:
+        return False
+    if last_talk == today:
+        return True
+    try:
+        return _days_between(last_talk, today) == 1
+    except Exception:
+        return False
+
+
+# Strong refs for fire-and-forget writes; the event loop only keeps weak ones.
+_BACKGROUND_TASKS: set[asyncio.Task] = set()
+
+
+def _spawn(coro) -> None:
+    task = asyncio.create_task(coro)
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+
+
+async def _update_streak_leaderboards(*, user_id: int, guild_id: int | None, value: int) -> None:
+    try:
+        from utils.leaderboard import update_all_periods, CATEGORY_CHARACTER_STREAK, GLOBAL_GUILD_ID
+        board_ids = [GLOBAL_GUILD_ID]
+        if guild_id is not None and int(guild_id) != GLOBAL_GUILD_ID:
+            board_ids.append(int(guild_id))
+        await asyncio.gather(*(
+            update_all_periods(
+                category=CATEGORY_CHARACTER_STREAK,
+                guild_id=gid,
+                user_id=user_id,
+                value=value,
+            )
+            for gid in board_ids
+        ))
+    except Exception:
+        log.exception("Failed to update character streak leaderboards")
+
+
 async def get_last_talk_day(*, user_id: int, style_id: str) -> str:
     """Return the last talk day for this character streak (YYYYMMDD) or empty string."""
     r = await get_redis_or_none()
     if r is None:
         return ""
     try:
-        last_talk_raw = await r.get(_last_talk_key(user_id, style_id))
-        if not last_talk_raw:
-            return ""
-        return last_talk_raw.decode("utf-8", errors="ignore") if isinstance(last_talk_raw, (bytes, bytearray)) else str(last_talk_raw or "")
+        _streak, last_talk = await _read_style(r, user_id, style_id, _utc_day())
+        return last_talk
     except Exception:
         return ""
 
@@ -66,23 +273,24 @@ async def record_character_talk(
         (new_streak, streak_continued) tuple
         streak_continued: True if streak was maintained, False if broken or new
     """
+    res = await record_character_talk_result(user_id=user_id, style_id=style_id, guild_id=guild_id)
+    return (res.streak, res.continued)
+
+
+async def record_character_talk_result(
+    *, user_id: int, style_id: str, guild_id: int | None = None
+) -> StreakResult:
+    """record_character_talk, also returning alive status and the previous last talk day."""
     r = await get_redis_or_none()
     if r is None:
-        return (0, False)
+        return StreakResult(0, False, False)
 
     try:
         today = _utc_day()
-        streak_key = _streak_key(user_id, style_id)
-        last_talk_key = _last_talk_key(user_id, style_id)
-        
-        # Get last talk date
-        last_talk_raw = await r.get(last_talk_key)
-        last_talk = last_talk_raw.decode("utf-8", errors="ignore") if isinstance(last_talk_raw, (bytes, bytearray)) else str(last_talk_raw or "")
-        
-        # Get current streak
-        streak_raw = await r.get(streak_key)
-        current_streak = int(streak_raw) if streak_raw else 0
-        
+
+        # Get last talk date + current streak in one round-trip
+        current_streak, last_talk = await _read_style(r, user_id, style_id, today)
+
         streak_continued = False
         new_streak = 1
         
@@ -93,9 +301,7 @@ async def record_character_talk(
         elif last_talk:
             # Check if yesterday (streak continues)
             try:
-                last_date = datetime.strptime(last_talk, "%Y%m%d").date()
-                today_date = datetime.strptime(today, "%Y%m%d").date()
-                days_diff = (today_date - last_date).days
+                days_diff = _days_between(last_talk, today)
                 
                 if days_diff == 1:
                     # Yesterday - streak continues!
@@ -115,29 +321,19 @@ async def record_character_talk(
             streak_continued = False
         
         # Update streak and last talk date
-        await r.set(streak_key, str(new_streak), ex=86400 * 90)  # 90 day TTL
-        await r.set(last_talk_key, today, ex=86400 * 90)
+        key = _user_key(user_id)
+        pipe = r.pipeline(transaction=False)
+        pipe.hset(key, mapping={_streak_field(style_id): str(new_streak), _last_talk_field(style_id): today})
+        pipe.expire(key, STREAK_TTL_S)
+        await pipe.execute()
         
-        # Update leaderboard (global + server when guild_id provided)
-        from utils.leaderboard import update_all_periods, CATEGORY_CHARACTER_STREAK, GLOBAL_GUILD_ID
-        await update_all_periods(
-            category=CATEGORY_CHARACTER_STREAK,
-            guild_id=GLOBAL_GUILD_ID,
-            user_id=user_id,
-            value=new_streak,
-        )
-        if guild_id is not None and int(guild_id) != GLOBAL_GUILD_ID:
-            await update_all_periods(
-                category=CATEGORY_CHARACTER_STREAK,
-                guild_id=int(guild_id),
-                user_id=user_id,
-                value=new_streak,
-            )
+        # Update leaderboard (global + server when guild_id provided) off the chat path.
+        _spawn(_update_streak_leaderboards(user_id=user_id, guild_id=guild_id, value=new_streak))
         
-        return (new_streak, streak_continued)
+        return StreakResult(new_streak, streak_continued, True, last_talk)
     except Exception:
         log.exception("Failed to record character talk streak")
-        return (0, False)
+        return StreakResult(0, False, False)
 
 
 async def get_character_streak(*, user_id: int, style_id: str) -> int:
@@ -147,13 +343,25 @@ async def get_character_streak(*, user_id: int, style_id: str) -> int:
         return 0
 
     try:
-        streak_key = _streak_key(user_id, style_id)
-        streak_raw = await r.get(streak_key)
-        return int(streak_raw) if streak_raw else 0
+        streak, _last_talk = await _read_style(r, user_id, style_id, _utc_day())
+        return streak
     except Exception:
         return 0
 
 
+async def get_character_streak_with_status(*, user_id: int, style_id: str) -> tuple[int, str, bool]:
+    """(streak, last_talk_day, alive) for one character from a single read."""
+    r = await get_redis_or_none()
+    if r is None:
+        return (0, "", False)
+    try:
+        today = _utc_day()
+        streak, last_talk = await _read_style(r, user_id, style_id, today)
+        return (streak, last_talk, _is_alive(last_talk, today))
+    except Exception:
+        return (0, "", False)
+
+
 async def get_all_character_streaks(*, user_id: int) -> dict[str, int]:
     """Get all character streaks for a user.
     
@@ -165,25 +373,8 @@ async def get_all_character_streaks(*, user_id: int) -> dict[str, int]:
         return {}
 
     try:
-        pattern = f"{STREAK_KEY_PREFIX}:{int(user_id)}:*"
-        cursor = 0
-        streaks: dict[str, int] = {}
-        
-        for _ in range(100):  # Limit scans
-            cursor, keys = await r.scan(cursor, match=pattern, count=100)
-            for key_raw in keys or []:
-                key = key_raw.decode("utf-8", errors="ignore") if isinstance(key_raw, (bytes, bytearray)) else str(key_raw)
-                # Extract style_id from key: char_streak:user_id:style_id
-                parts = key.split(":", 2)
-                if len(parts) >= 3:
-                    style_id = parts[2]
-                    streak_raw = await r.get(key)
-                    streak = int(streak_raw) if streak_raw else 0
-                    streaks[style_id] = streak
-            if cursor == 0:
-                break
-        
-        return streaks
+        rows = await _read_all(r, user_id, _utc_day())
+        return {style_id: streak for style_id, (streak, _last_talk) in rows.items()}
     except Exception:
         log.exception("Failed to get all character streaks")
         return {}
@@ -201,21 +392,9 @@ async def is_character_streak_alive(*, user_id: int, style_id: str) -> bool:
     if r is None:
         return False
     try:
-        last_talk_raw = await r.get(_last_talk_key(user_id, style_id))
-        if not last_talk_raw:
-            return False
-        last_talk = last_talk_raw.decode("utf-8", errors="ignore") if isinstance(last_talk_raw, (bytes, bytearray)) else str(last_talk_raw or "")
-        if not last_talk:
-            return False
         today = _utc_day()
-        if last_talk == today:
-            return True
-        try:
-            last_date = datetime.strptime(last_talk, "%Y%m%d").date()
-            today_date = datetime.strptime(today, "%Y%m%d").date()
-            return (today_date - last_date).days == 1
-        except Exception:
-            return False
+        _streak, last_talk = await _read_style(r, user_id, style_id, today)
+        return _is_alive(last_talk, today)
     except Exception:
         return False
 
@@ -229,15 +408,25 @@ async def delete_character_streak(*, user_id: int, style_id: str) -> int:
     if r is None:
         return 0
     try:
-        streak_key = _streak_key(user_id, style_id)
-        last_talk_key = _last_talk_key(user_id, style_id)
-
-        # Read the old value before deleting
-        streak_raw = await r.get(streak_key)
-        old_streak = int(streak_raw) if streak_raw else 0
-
-        await r.delete(streak_key)
-        await r.delete(last_talk_key)
+        key = _user_key(user_id)
+        fields = (_streak_field(style_id), _last_talk_field(style_id))
+
+        # Read the old value and delete in one round-trip
+        pipe = r.pipeline(transaction=False)
+        pipe.hmget(key, *fields, _VERSION_FIELD)
+        pipe.hdel(key, *fields)
+        (streak_raw, lt_raw, version), _deleted = await pipe.execute()
+        if version is None and streak_raw is None:
+            # Not migrated yet: the streak may still live in this style's legacy keys.
+            legacy_keys = (_streak_key(user_id, style_id), _last_talk_key(user_id, style_id))
+            pipe = r.pipeline(transaction=False)
+            pipe.mget(legacy_keys)
+            pipe.unlink(*legacy_keys)
+            (streak_raw, lt_raw), _unlinked = await pipe.execute()
+        last_talk = lt_raw or ""
+        old_streak = 0
+        if streak_raw and not (last_talk and last_talk < _expiry_cutoff(_utc_day())):
+            old_streak = int(streak_raw)
 
         if old_streak > 0:
             log.info(
@@ -262,43 +451,13 @@ async def get_active_character_streaks_with_status(*, user_id: int) -> dict[str,
         return {}
     try:
         today = _utc_day()
-        today_date = datetime.strptime(today, "%Y%m%d").date()
 
-        # Scan streak keys
-        pattern = f"{STREAK_KEY_PREFIX}:{int(user_id)}:*"
-        cursor = 0
         result: dict[str, tuple[int, str, bool]] = {}
-
-        for _ in range(100):
-            cursor, keys = await r.scan(cursor, match=pattern, count=100)
-            for key_raw in keys or []:
-                key = key_raw.decode("utf-8", errors="ignore") if isinstance(key_raw, (bytes, bytearray)) else str(key_raw)
-                parts = key.split(":", 2)
-                if len(parts) < 3:
-                    continue
-                style_id = parts[2]
-                streak_raw = await r.get(key)
-                streak = int(streak_raw) if streak_raw else 0
-                if streak <= 0:
-                    continue
-                # Get last talk date
-                lt_raw = await r.get(_last_talk_key(user_id, style_id))
-                last_talk = ""
-                if lt_raw:
-                    last_talk = lt_raw.decode("utf-8", errors="ignore") if isinstance(lt_raw, (bytes, bytearray)) else str(lt_raw or "")
-                alive = False
-                if last_talk:
-                    if last_talk == today:
-                        alive = True
-                    else:
-                        try:
-                            last_date = datetime.strptime(last_talk, "%Y%m%d").date()
-                            alive = (today_date - last_date).days == 1
-                        except Exception:
-                            pass
-                result[style_id] = (streak, last_talk, alive)
-            if cursor == 0:
-                break
+        for style_id, (streak, last_talk) in (await _read_all(r, user_id, today)).items():
+            if streak <= 0:
+                continue
+            alive = _is_alive(last_talk, today)
+            result[style_id] = (streak, last_talk, alive)
         return result
     except Exception:
         log.exception("Failed to get active character streaks with status")
@@ -12,12 +12,15 @@ Three escalation tiers:
 """
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+from collections import OrderedDict
 from typing import TYPE_CHECKING
 
 import discord
 
-from utils.character_registry import get_style
+from utils.character_registry import get_style, style_revision
 from utils.bonds_store import get_bond
 from utils.bonds import level_from_xp
 
@@ -47,8 +50,8 @@ _STAGE_PROMPTS = {
 }
 
 
-def _build_system_prompt(style: "StyleDef", stage: str, streak_days: int, bond_level: int) -> str:
-    """Build a minimal system prompt from the character's persona fields."""
+def _build_prompt_head(style: "StyleDef", stage: str) -> str:
+    """Persona + stage instructions; everything in the prompt that doesn't vary per user."""
     parts = [f"You are {style.display_name}."]
 
     if style.prompt:
@@ -68,13 +71,40 @@ def _build_system_prompt(style: "StyleDef", stage: str, streak_days: int, bond_l
         stage_prompt += f" Your fears include: {', '.join(style.fears[:2])}."
 
     parts.append(stage_prompt)
-    parts.append(
+    return " ".join(parts)
+
+
+def _prompt_tail(streak_days: int, bond_level: int) -> str:
+    return (
         f"You've known this person for {streak_days} days. "
         f"Your bond level is {bond_level}. "
         "Respond with ONLY your message, nothing else. Keep it under 200 characters."
     )
 
-    return " ".join(parts)
+
+def _build_system_prompt(style: "StyleDef", stage: str, streak_days: int, bond_level: int) -> str:
+    """Build a minimal system prompt from the character's persona fields."""
+    return f"{_build_prompt_head(style, stage)} {_prompt_tail(streak_days, bond_level)}"
+
+
+# (registry revision, style_id, stage) -> prompt head. Only the streak/bond tail
+# differs between users, so reminder loops reuse the persona part.
+_PROMPT_HEAD_CACHE: "OrderedDict[tuple[int, str, str], str]" = OrderedDict()
+_PROMPT_HEAD_CACHE_MAX = 1024
+
+
+def _system_prompt(style: "StyleDef", stage: str, streak_days: int, bond_level: int) -> str:
+    """_build_system_prompt with the head memoized; entries die with the registry revision."""
+    key = (style_revision(), style.style_id, stage)
+    head = _PROMPT_HEAD_CACHE.get(key)
+    if head is None:
+        head = _build_prompt_head(style, stage)
+        _PROMPT_HEAD_CACHE[key] = head
+        if len(_PROMPT_HEAD_CACHE) > _PROMPT_HEAD_CACHE_MAX:
+            _PROMPT_HEAD_CACHE.popitem(last=False)
+    else:
+        _PROMPT_HEAD_CACHE.move_to_end(key)
+    return f"{head} {_prompt_tail(streak_days, bond_level)}"
 
 
 def _color_from_style(style: "StyleDef") -> int:
@@ -115,6 +145,42 @@ async def _mark_dm_sent(user_id: int, style_id: str, stage: str) -> None:
         pass
 
 
+# (user_id, style_id) -> (expires_at, bond_level). The reminder, 8h and 1h DMs for a
+# user/character land hours apart but a single loop pass touches many users; a short
+# TTL keeps repeat lookups off the DB without showing a noticeably stale level.
+_BOND_LEVEL_CACHE: dict[tuple[int, str], tuple[float, int]] = {}
+_BOND_LEVEL_TTL_S = 300.0
+_BOND_LEVEL_CACHE_MAX = 4096
+
+
+async def _get_bond_level(user_id: int, style_id: str) -> int:
+    key = (int(user_id), str(style_id))
+    now = time.monotonic()
+    hit = _BOND_LEVEL_CACHE.get(key)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+
+    bond_level = 1
+    try:
+        bond = await get_bond(guild_id=0, user_id=user_id, style_id=style_id)
+        if bond:
+            bond_level = level_from_xp(int(getattr(bond, "xp", 0) or 0))
+    except Exception:
+        return bond_level  # don't cache failures
+
+    if len(_BOND_LEVEL_CACHE) >= _BOND_LEVEL_CACHE_MAX:
+        for k in [k for k, (exp, _) in _BOND_LEVEL_CACHE.items() if exp <= now]:
+            _BOND_LEVEL_CACHE.pop(k, None)
+        if len(_BOND_LEVEL_CACHE) >= _BOND_LEVEL_CACHE_MAX:
+            _BOND_LEVEL_CACHE.clear()
+    _BOND_LEVEL_CACHE[key] = (now + _BOND_LEVEL_TTL_S, bond_level)
+    return bond_level
+
+
+# Strong refs for fire-and-forget dedupe writes; the event loop only keeps weak ones.
+_BACKGROUND_TASKS: set[asyncio.Task] = set()
+
+
 async def send_character_streak_dm(
     bot: discord.Client,
     user_id: int,
@@ -133,16 +199,12 @@ async def send_character_streak_dm(
     style = get_style(style_id)
     if style is None:
         return False
+    # Embed fields read once up front; persona fields only feed the cached prompt head.
+    display_name, image_url, color = style.display_name, style.image_url, _color_from_style(style)
 
-    bond_level = 1
-    try:
-        bond = await get_bond(guild_id=0, user_id=user_id, style_id=style_id)
-        if bond:
-            bond_level = level_from_xp(int(getattr(bond, "xp", 0) or 0))
-    except Exception:
-        pass
+    bond_level = await _get_bond_level(user_id, style_id)
 
-    system = _build_system_prompt(style, stage, streak_days, bond_level)
+    system = _system_prompt(style, stage, streak_days, bond_level)
 
     hint: str | None = None
     try:
@@ -180,11 +242,11 @@ async def send_character_streak_dm(
 
     embed = discord.Embed(
         description=text,
-        color=_color_from_style(style),
+        color=color,
     )
-    embed.set_author(name=style.display_name)
-    if style.image_url:
-        embed.set_thumbnail(url=style.image_url)
+    embed.set_author(name=display_name)
+    if image_url:
+        embed.set_thumbnail(url=image_url)
     embed.set_footer(text=f"{streak_days}-day streak · Bond level {bond_level} · To stop reminders: /points reminders off")
     if hint:
         embed.add_field(
@@ -205,6 +267,8 @@ async def send_character_streak_dm(
         logger.debug("Character streak DM send failed for user %s", user_id, exc_info=True)
         return False
 
-    await _mark_dm_sent(user_id, style_id, stage)
+    task = asyncio.create_task(_mark_dm_sent(user_id, style_id, stage))
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
     logger.info("Character streak DM sent: user=%s char=%s stage=%s", user_id, style_id, stage)
     return True
@@ -1,9 +1,15 @@
 # utils/copyright_filter.py
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
+import json
 import logging
 import os
 import re
+import time
+from collections import OrderedDict
 from typing import Optional
 
 log = logging.getLogger("copyright_filter")
@@ -170,8 +176,55 @@ BLOCKED_FRANCHISES: set[str] = {
 }
 
 
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9 ]")
+_ASCII_NORMALIZE_TABLE = {
+    c: " " for c in range(128) if not (chr(c).isdigit() or "a" <= chr(c) <= "z" or c == 0x20)
+}
+
+
 def _normalize(s: str) -> str:
-    return re.sub(r"[^a-z0-9 ]", " ", (s or "").strip().lower())
+    s = (s or "").strip().lower()
+    if s.isascii():
+        return s.translate(_ASCII_NORMALIZE_TABLE)
+    return _NON_ALNUM_RE.sub(" ", s)
+
+
+# Like _normalize, but keeps the unit separator so several fields can be
+# normalized in one pass and split back apart.
+_FIELD_SEP = "\x1f"
+_NON_ALNUM_SEP_RE = re.compile(r"[^a-z0-9 \x1f]")
+_ASCII_NORMALIZE_SEP_TABLE = {c: v for c, v in _ASCII_NORMALIZE_TABLE.items() if c != 0x1F}
+
+
+def _normalize_fields(*fields: str) -> list[str]:
+    joined = _FIELD_SEP.join(f or "" for f in fields)
+    if joined.count(_FIELD_SEP) != len(fields) - 1:
+        # A field carries the separator itself; normalize them one by one.
+        return [_normalize(f) for f in fields]
+    joined = joined.lower()
+    if joined.isascii():
+        joined = joined.translate(_ASCII_NORMALIZE_SEP_TABLE)
+    else:
+        joined = _NON_ALNUM_SEP_RE.sub(" ", joined)
+    return joined.split(_FIELD_SEP)
+
+
+def _literal_matcher(patterns, *, whole_word: bool = False) -> re.Pattern:
+    """One alternation over literal patterns, longest first, scanned in a single pass."""
+    alts = sorted({p for p in patterns if p}, key=len, reverse=True)
+    body = "|".join(re.escape(p) for p in alts)
+    return re.compile(rf"\b(?:{body})\b" if whole_word else body)
+
+
+# Built once at import: normalized form -> original display string.
+_NAMES_BY_NORM: dict[str, str] = {_normalize(b): b for b in BLOCKED_NAMES}
+_FRANCHISES_BY_NORM: dict[str, str] = {_normalize(f): f for f in BLOCKED_FRANCHISES}
+
+# Whole-word matching applies to every name; substring matching only to
+# names longer than 3 characters.
+_NAMES_WORD_RE = _literal_matcher(_NAMES_BY_NORM, whole_word=True)
+_NAMES_SUBSTR_RE = _literal_matcher(b for b in _NAMES_BY_NORM if len(b) > 3)
+_FRANCHISES_RE = _literal_matcher(_FRANCHISES_BY_NORM)
 
 
 def check_copyright_blocklist(
@@ -181,36 +234,43 @@ def check_copyright_blocklist(
     prompt: str,
 ) -> Optional[str]:
     """Returns a rejection reason if any field matches the blocklist, else None."""
-    name_norm = _normalize(display_name)
-    cid_norm = _normalize(character_id)
-    desc_norm = _normalize(description)
-    prompt_norm = _normalize(prompt)
-
-    identity_fields = (name_norm, cid_norm)
-    all_fields = (name_norm, cid_norm, desc_norm, prompt_norm)
-
-    for blocked in BLOCKED_NAMES:
-        b = _normalize(blocked)
-        for field in identity_fields:
-            if b == field or b in field.split():
-                return (
-                    f"The name **{blocked}** is associated with a copyrighted character or public figure. "
-                    "Custom characters must be entirely original."
-                )
-            if len(b) > 3 and b in field:
-                return (
-                    f"The name contains **{blocked}**, which is associated with a copyrighted character "
-                    "or public figure. Custom characters must be entirely original."
-                )
-
-    for franchise in BLOCKED_FRANCHISES:
-        f = _normalize(franchise)
-        for field in all_fields:
-            if f in field:
-                return (
-                    f"References to **{franchise}** are not allowed. "
-                    "Custom characters must not be based on any copyrighted franchise or trademarked property."
-                )
+    name_norm, cid_norm, desc_norm, prompt_norm = _normalize_fields(
+        display_name, character_id, description, prompt,
+    )
+
+    # Skip blank fields and scan each distinct value once (display name and
+    # id often normalize to the same string).
+    identity_fields = tuple(dict.fromkeys(f for f in (name_norm, cid_norm) if f.strip()))
+    all_fields = tuple(dict.fromkeys(f for f in (name_norm, cid_norm, desc_norm, prompt_norm) if f.strip()))
+    if not all_fields:
+        return None
+
+    for field in identity_fields:
+        m = _NAMES_WORD_RE.search(field)
+        if m:
+            blocked = _NAMES_BY_NORM[m.group(0)]
+            return (
+                f"The name **{blocked}** is associated with a copyrighted character or public figure. "
+                "Custom characters must be entirely original."
+            )
+
+    for field in identity_fields:
+        m = _NAMES_SUBSTR_RE.search(field)
+        if m:
+            blocked = _NAMES_BY_NORM[m.group(0)]
+            return (
+                f"The name contains **{blocked}**, which is associated with a copyrighted character "
+                "or public figure. Custom characters must be entirely original."
+            )
+
+    for field in all_fields:
+        m = _FRANCHISES_RE.search(field)
+        if m:
+            franchise = _FRANCHISES_BY_NORM[m.group(0)]
+            return (
+                f"References to **{franchise}** are not allowed. "
+                "Custom characters must not be based on any copyrighted franchise or trademarked property."
+            )
 
     return None
 
@@ -238,6 +298,116 @@ Be strict. When in doubt, flag it.\
 """
 
 
+@functools.lru_cache(maxsize=4)
+def _payload_prefix(model: str) -> str:
+    # Everything up to the user message is constant per model; encode it once.
+    system_msg = json.dumps({"role": "system", "content": _AI_SYSTEM_PROMPT}, separators=(",", ":"))
+    return f'{{"model":{json.dumps(model)},"messages":[{system_msg},{{"role":"user","content":'
+
+
+def _screen_payload(model: str, user_content: str) -> bytes:
+    body = _payload_prefix(model) + json.dumps(user_content) + '}],"max_tokens":120,"temperature":0.0}'
+    return body.encode("utf-8")
+
+
+# temperature=0 makes the verdict a function of the input, so resubmissions of
+# the same character reuse it instead of paying for another completion.
+_AI_CACHE: "OrderedDict[str, tuple[float, tuple[bool, str]]]" = OrderedDict()
+_AI_CACHE_MAX = 4096
+_AI_CACHE_TTL_S = 7 * 86400
+
+
+def _ai_cache_key(display_name: str, description: str, prompt: str) -> str:
+    # Case/whitespace folding only: _normalize would blank out non-Latin names.
+    def fold(s: str) -> str:
+        return " ".join((s or "").lower().split())
+
+    raw = f"{fold(display_name)}|{fold(description[:800])}|{fold(prompt[:1500])}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _ai_cache_get(key: str) -> tuple[bool, str] | None:
+    hit = _AI_CACHE.get(key)
+    if hit is None:
+        return None
+    ts, result = hit
+    if time.monotonic() - ts >= _AI_CACHE_TTL_S:
+        _AI_CACHE.pop(key, None)
+        return None
+    _AI_CACHE.move_to_end(key)
+    return result
+
+
+def _ai_cache_put(key: str, result: tuple[bool, str]) -> None:
+    _AI_CACHE[key] = (time.monotonic(), result)
+    _AI_CACHE.move_to_end(key)
+    if len(_AI_CACHE) > _AI_CACHE_MAX:
+        _AI_CACHE.popitem(last=False)
+
+
+# Shared client so screens reuse the keep-alive connection to the API.
+_client = None
+_client_lock = asyncio.Lock()
+
+
+async def _get_client():
+    global _client
+    if _client is not None:
+        return _client
+
+    async with _client_lock:
+        if _client is not None:
+            return _client
+
+        import httpx
+
+        limits = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0)
+        _client = httpx.AsyncClient(limits=limits)
+        return _client
+
+
+async def aclose_screen_client() -> None:
+    """Optional: close the shared screening client on shutdown."""
+    global _client
+    async with _client_lock:
+        if _client is not None:
+            try:
+                await _client.aclose()
+            except Exception:
+                pass
+            _client = None
+
+
+_AI_INFLIGHT: dict[str, asyncio.Future] = {}
+
+
+async def _screen_via_api(display_name: str, description: str, prompt: str) -> tuple[bool, str]:
+    from config import OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL_FREE, OPENAI_TIMEOUT_S
+
+    import httpx
+
+    user_content = (
+        f"Character Name: {display_name}\n"
+        f"Description: {description[:800]}\n"
+        f"Personality Prompt: {prompt[:1500]}"
+    )
+
+    client = await _get_client()
+    resp = await client.post(
+        f"{OPENAI_BASE_URL}/chat/completions",
+        headers={"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"},
+        content=_screen_payload(OPENAI_MODEL_FREE, user_content),
+        timeout=httpx.Timeout(float(OPENAI_TIMEOUT_S)),
+    )
+    resp.raise_for_status()
+    text = resp.json()["choices"][0]["message"]["content"].strip()
+
+    if text.upper().startswith("FAIL"):
+        reason = text.split(":", 1)[1].strip() if ":" in text else "Matched a protected character or person."
+        return True, reason
+    return False, ""
+
+
 async def ai_copyright_screen(
     display_name: str,
     description: str,
@@ -248,41 +418,50 @@ async def ai_copyright_screen(
         return False, ""
 
     try:
-        from config import OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL_FREE, OPENAI_TIMEOUT_S
+        from config import OPENAI_API_KEY
 
         if not OPENAI_API_KEY:
             return False, ""
 
-        import httpx
+        cache_key = _ai_cache_key(display_name, description, prompt)
+        cached = _ai_cache_get(cache_key)
+        if cached is not None:
+            return cached
 
-        user_content = (
-            f"Character Name: {display_name}\n"
-            f"Description: {description[:800]}\n"
-            f"Personality Prompt: {prompt[:1500]}"
-        )
-
-        async with httpx.AsyncClient(timeout=float(OPENAI_TIMEOUT_S)) as client:
-            resp = await client.post(
-                f"{OPENAI_BASE_URL}/chat/completions",
-                headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
-                json={
-                    "model": OPENAI_MODEL_FREE,
-                    "messages": [
-                        {"role": "system", "content": _AI_SYSTEM_PROMPT},
-                        {"role": "user", "content": user_content},
-                    ],
-                    "max_tokens": 120,
-                    "temperature": 0.0,
-                },
-            )
-            resp.raise_for_status()
-            text = resp.json()["choices"][0]["message"]["content"].strip()
+        from utils.redis_kv import kv_get_json, kv_set_json
 
-        if text.upper().startswith("FAIL"):
-            reason = text.split(":", 1)[1].strip() if ":" in text else "Matched a protected character or person."
-            return True, reason
+        try:
+            stored = await kv_get_json(f"copyright_screen:{cache_key}")
+        except Exception:
+            stored = None
+        if isinstance(stored, list) and len(stored) == 2:
+            result = (bool(stored[0]), str(stored[1] or ""))
+            _ai_cache_put(cache_key, result)
+            return result
 
-        return False, ""
+        # Identical submissions racing each other (double-clicks, retries)
+        # share one in-flight API call.
+        pending = _AI_INFLIGHT.get(cache_key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        _AI_INFLIGHT[cache_key] = fut
+        try:
+            result = await _screen_via_api(display_name, description, prompt)
+            fut.set_result(result)
+        except BaseException:
+            fut.set_result((False, ""))
+            raise
+        finally:
+            _AI_INFLIGHT.pop(cache_key, None)
+
+        _ai_cache_put(cache_key, result)
+        try:
+            await kv_set_json(f"copyright_screen:{cache_key}", list(result), ex=_AI_CACHE_TTL_S)
+        except Exception:
+            pass
+        return result
 
     except Exception:
         log.warning("AI copyright screening failed; falling through to manual review", exc_info=True)
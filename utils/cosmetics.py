@@ -33,15 +33,17 @@ COSMETIC_SHARD_PRICE = int(os.getenv("COSMETIC_SHARD_PRICE", "50") or "50")
 NUM_TO_COSMETIC_ID: dict[int, str] = {num: cid for num, cid, _ in COSMETIC_CATALOG}
 
 # All valid cosmetic IDs (for validation)
-COSMETIC_IDS: set[str] = set(NUM_TO_COSMETIC_ID.values())
+COSMETIC_IDS: frozenset[str] = frozenset(NUM_TO_COSMETIC_ID.values())
+
+_ID_TO_NAME: dict[str, str] = {cid: name for _num, cid, name in COSMETIC_CATALOG}
+
+_BASE = (COSMETICS_BASE or "").rstrip("/")
+_COSMETIC_URLS: dict[str, str] = {cid: f"{_BASE}/{cid}.png" for cid in COSMETIC_IDS} if _BASE else {}
 
 
 def cosmetic_image_url(cosmetic_id: str) -> str | None:
     """Return the image URL for a cosmetic (same path as assets: .../cosmetics/{id}.png)."""
-    if not cosmetic_id or cosmetic_id not in COSMETIC_IDS:
-        return None
-    base = (COSMETICS_BASE or "").rstrip("/")
-    return f"{base}/{cosmetic_id}.png" if base else None
+    return _COSMETIC_URLS.get(cosmetic_id) if cosmetic_id else None
 
 
 def default_cosmetic_image_url(cosmetic_id: str) -> str | None:
@@ -51,7 +53,4 @@ def default_cosmetic_image_url(cosmetic_id: str) -> str | None:
 
 def cosmetic_display_name(cosmetic_id: str) -> str:
     """Return display name for a cosmetic id."""
-    for _num, cid, name in COSMETIC_CATALOG:
-        if cid == cosmetic_id:
-            return name
-    return (cosmetic_id or "?").replace("_", " ").title()
+    return _ID_TO_NAME.get(cosmetic_id) or (cosmetic_id or "?").replace("_", " ").title()
@@ -17,7 +17,7 @@ async def get_owned(user_id: int) -> set[str]:
     """Return set of cosmetic_ids the user has purchased."""
     uid = int(user_id)
     raw = await smembers_str(_owned_key(uid))
-    return {c for c in raw if c and c in COSMETIC_IDS}
+    return raw & COSMETIC_IDS
 
 
 async def add_owned(user_id: int, cosmetic_id: str) -> bool:
@@ -7,8 +7,11 @@ cap per guild. This is the "never lose money" backstop: even if all other
 budget layers are misconfigured, no single guild can cost more than the cap.
 
 Storage:
-  - Redis key: "cost:guild:{guild_id}:{YYYYMMDD}" (value in milli-cents for precision)
+  - Redis hash: "cost:day:{YYYYMMDD}", fields "g:{guild_id}" / "u:{user_id}"
+    (values in milli-cents for precision)
   - TTL: 2 days (auto-cleanup)
+  - Writes are buffered in-process and flushed in one pipeline every ~200 ms
+    (or every 100 events); reads add the not-yet-flushed amount.
 
 Cost rates are approximate and configurable via env vars. Update them when
 OpenAI changes pricing.
@@ -16,11 +19,16 @@ OpenAI changes pricing.
 
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
 import time
 
+import config
+
 from utils.backpressure import get_redis_or_none
-from utils.redis_kv import incr
+
+log = logging.getLogger("cost_tracker")
 
 
 # ---------------------------------------------------------------------------
@@ -42,13 +50,46 @@ COST_PER_OUTPUT_TOKEN_PRO = _env_float("AI_COST_PER_OUTPUT_TOKEN_PRO", 0.0000016
 COST_PER_INPUT_TOKEN_FREE = _env_float("AI_COST_PER_INPUT_TOKEN_FREE", 0.0000001)
 COST_PER_OUTPUT_TOKEN_FREE = _env_float("AI_COST_PER_OUTPUT_TOKEN_FREE", 0.0000004)
 
+_TIER_RATES: dict[str, tuple[float, float]] = {
+    "pro": (COST_PER_INPUT_TOKEN_PRO, COST_PER_OUTPUT_TOKEN_PRO),
+    "free": (COST_PER_INPUT_TOKEN_FREE, COST_PER_OUTPUT_TOKEN_FREE),
+}
+
+# Caps come from env via config at startup; read them once.
+_GUILD_CAP_CENTS = float(getattr(config, "AI_COST_CAP_GUILD_DAILY_CENTS", 10))
+_USER_CAP_CENTS = float(getattr(config, "AI_COST_CAP_USER_DAILY_CENTS", 1))
+
 _TTL = 2 * 24 * 3600  # 2 days
 
 
+# [next UTC midnight epoch, "YYYYMMDD"]; the day string only changes at midnight.
+_day_cache: list = [0.0, ""]
+
+
 def _today_utc() -> str:
-    return time.strftime("%Y%m%d", time.gmtime())
+    now = time.time()
+    if now < _day_cache[0]:
+        return _day_cache[1]
+    day = time.strftime("%Y%m%d", time.gmtime(now))
+    _day_cache[0] = (int(now) // 86400 + 1) * 86400
+    _day_cache[1] = day
+    return day
+
+
+def _cost_day_key(day: str) -> str:
+    return f"cost:day:{day}"
+
 
+def _guild_field(guild_id: int) -> str:
+    return f"g:{int(guild_id)}"
 
+
+def _user_field(user_id: int) -> str:
+    return f"u:{int(user_id)}"
+
+
+# Pre-hash per-key counters; still read (and reset) so a deploy mid-day
+# doesn't hand out a fresh budget. They expire on their own within 2 days.
 def _cost_key(guild_id: int, day: str) -> str:
     return f"cost:guild:{int(guild_id)}:{day}"
 
@@ -57,6 +98,116 @@ def _cost_key_user(user_id: int, day: str) -> str:
     return f"cost:user:{int(user_id)}:{day}"
 
 
+# ---------------------------------------------------------------------------
+# Write buffer
+# ---------------------------------------------------------------------------
+
+_FLUSH_INTERVAL_S = 0.2
+_FLUSH_MAX_EVENTS = 100
+_FLUSH_RETRY_S = 5.0
+
+# (day, field) -> pending milli-cents. Only touched between awaits, so the
+# swap in _flush_costs needs no lock.
+_cost_buffer: dict[tuple[str, str], int] = {}
+_buffered_events = 0
+_flush_task: asyncio.Task | None = None
+_BACKGROUND_TASKS: set[asyncio.Task] = set()
+
+
+async def _flush_costs() -> bool:
+    """Write buffered costs to Redis. Returns False if the write failed.
+
+    On failure the pending amounts are merged back into the buffer so they are
+    retried rather than dropped.
+    """
+    global _cost_buffer, _buffered_events
+    pending, _cost_buffer = _cost_buffer, {}
+    _buffered_events = 0
+    if not pending:
+        return True
+
+    r = await get_redis_or_none()
+    if r is None:
+        return True
+
+    try:
+        pipe = r.pipeline(transaction=False)
+        days = set()
+        for (day, field), delta in pending.items():
+            pipe.hincrby(_cost_day_key(day), field, delta)
+            days.add(day)
+        for day in days:
+            pipe.expire(_cost_day_key(day), _TTL)
+        await pipe.execute()
+        return True
+    except Exception:
+        log.warning("cost flush failed; retrying %d counters", len(pending), exc_info=True)
+        for k, delta in pending.items():
+            _cost_buffer[k] = _cost_buffer.get(k, 0) + delta
+        _buffered_events += len(pending)
+        return False
+
+
+def _after_flush(ok: bool) -> None:
+    # Costs recorded while the flush awaited Redis (or restored after a failure)
+    # must not wait for the next record_cost call.
+    if _cost_buffer and _flush_task is None:
+        _schedule_flush(delay=None if ok else _FLUSH_RETRY_S)
+
+
+async def _flush_later(delay: float | None = None) -> None:
+    global _flush_task
+    ok = True
+    try:
+        if delay is None:
+            delay = _FLUSH_INTERVAL_S if _buffered_events < _FLUSH_MAX_EVENTS else 0.0
+        if delay > 0:
+            await asyncio.sleep(delay)
+        ok = await _flush_costs()
+    finally:
+        _flush_task = None
+    _after_flush(ok)
+
+
+async def _flush_now() -> None:
+    _after_flush(await _flush_costs())
+
+
+def _schedule_flush(*, delay: float | None = None) -> None:
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_later(delay))
+    elif _buffered_events >= _FLUSH_MAX_EVENTS:
+        # Don't wait out the interval; flush what we have right away.
+        task = asyncio.create_task(_flush_now())
+        _BACKGROUND_TASKS.add(task)
+        task.add_done_callback(_BACKGROUND_TASKS.discard)
+
+
+async def flush_cost_buffer() -> None:
+    """Write any buffered costs now (call on shutdown)."""
+    await _flush_costs()
+
+
+def _pending_milli_cents(day: str, field: str) -> int:
+    return _cost_buffer.get((day, field), 0)
+
+
+async def _read_cost_cents(day: str, field: str, legacy_key: str) -> float:
+    r = await get_redis_or_none()
+    if r is None:
+        return 0.0
+    try:
+        pipe = r.pipeline(transaction=False)
+        pipe.hget(_cost_day_key(day), field)
+        pipe.get(legacy_key)
+        val, legacy = await pipe.execute()
+        milli_cents = int(val or 0) + int(legacy or 0) + _pending_milli_cents(day, field)
+        return milli_cents / 1000.0
+    except Exception:
+        return 0.0
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -66,13 +217,10 @@ def estimate_cost_cents(*, tier: str, input_tokens: int, output_tokens: int) ->
 
     Returns a float (e.g. 0.032 = 0.032 cents).
     """
-    tier_l = (tier or "").strip().lower()
-    if tier_l == "pro":
-        rate_in = COST_PER_INPUT_TOKEN_PRO
-        rate_out = COST_PER_OUTPUT_TOKEN_PRO
-    else:
-        rate_in = COST_PER_INPUT_TOKEN_FREE
-        rate_out = COST_PER_OUTPUT_TOKEN_FREE
+    rates = _TIER_RATES.get(tier)
+    if rates is None:
+        rates = _TIER_RATES.get((tier or "").strip().lower(), _TIER_RATES["free"])
+    rate_in, rate_out = rates
 
     cost_dollars = (max(0, input_tokens) * rate_in) + (max(0, output_tokens) * rate_out)
     return cost_dollars * 100  # convert to cents
@@ -88,24 +236,29 @@ async def record_cost(
 ) -> None:
     """Record the estimated cost of an AI call for this guild and user (today).
 
-    Cost is stored in milli-cents (1/1000 of a cent) for precision.
+    Cost is stored in milli-cents (1/1000 of a cent) for precision. The write
+    is buffered and flushed to Redis shortly after.
     """
+    global _buffered_events
     cost_cents = estimate_cost_cents(
         tier=tier, input_tokens=input_tokens, output_tokens=output_tokens,
     )
     if cost_cents <= 0:
         return
 
-    milli_cents = int(cost_cents * 1000)
+    # round(): int() truncates float noise like 9.9999 down to 9 milli-cents.
+    milli_cents = int(round(cost_cents * 1000))
     if milli_cents <= 0:
         return
 
     day = _today_utc()
-    key = _cost_key(guild_id, day)
-    await incr(key, milli_cents, ex=_TTL)
+    gkey = (day, _guild_field(guild_id))
+    _cost_buffer[gkey] = _cost_buffer.get(gkey, 0) + milli_cents
     if user_id:
-        user_key = _cost_key_user(int(user_id), day)
-        await incr(user_key, milli_cents, ex=_TTL)
+        ukey = (day, _user_field(int(user_id)))
+        _cost_buffer[ukey] = _cost_buffer.get(ukey, 0) + milli_cents
+    _buffered_events += 1
+    _schedule_flush()
 
 
 async def reset_guild_cost_today(guild_id: int) -> bool:
@@ -115,11 +268,17 @@ async def reset_guild_cost_today(guild_id: int) -> bool:
     Does not change the cap (use env AI_COST_CAP_*_DAILY_CENTS to change caps).
     Returns True if Redis was available and the key was deleted.
     """
-    from utils.redis_kv import kv_del
     day = _today_utc()
-    key = _cost_key(int(guild_id), day)
-    n = await kv_del(key)
-    return n > 0
+    field = _guild_field(int(guild_id))
+    _cost_buffer.pop((day, field), None)
+    r = await get_redis_or_none()
+    if r is None:
+        return False
+    pipe = r.pipeline(transaction=False)
+    pipe.hdel(_cost_day_key(day), field)
+    pipe.delete(_cost_key(int(guild_id), day))
+    removed, legacy_removed = await pipe.execute()
+    return int(removed or 0) + int(legacy_removed or 0) > 0
 
 
 async def get_today_cost_cents(guild_id: int) -> float:
@@ -127,41 +286,14 @@ async def get_today_cost_cents(guild_id: int) -> float:
 
     Returns 0.0 if Redis is unavailable (degrade safely).
     """
-    r = await get_redis_or_none()
-    if r is None:
-        return 0.0
-
     day = _today_utc()
-    key = _cost_key(guild_id, day)
-    try:
-        val = await r.get(key)
-        if val is None:
-            return 0.0
-        if isinstance(val, (bytes, bytearray)):
-            val = val.decode("utf-8", errors="ignore")
-        milli_cents = int(val)
-        return milli_cents / 1000.0
-    except Exception:
-        return 0.0
+    return await _read_cost_cents(day, _guild_field(guild_id), _cost_key(guild_id, day))
 
 
 async def get_today_cost_cents_user(user_id: int) -> float:
     """Estimated AI cost for this user today, in cents. Returns 0 if Redis unavailable."""
-    r = await get_redis_or_none()
-    if r is None:
-        return 0.0
     day = _today_utc()
-    key = _cost_key_user(int(user_id), day)
-    try:
-        val = await r.get(key)
-        if val is None:
-            return 0.0
-        if isinstance(val, (bytes, bytearray)):
-            val = val.decode("utf-8", errors="ignore")
-        milli_cents = int(val)
-        return milli_cents / 1000.0
-    except Exception:
-        return 0.0
+    return await _read_cost_cents(day, _user_field(user_id), _cost_key_user(int(user_id), day))
 
 
 async def is_within_budget_user(user_id: int, cap_cents: float | None = None) -> tuple[bool, float, float]:
@@ -171,8 +303,7 @@ async def is_within_budget_user(user_id: int, cap_cents: float | None = None) ->
     cap_cents defaults to config.AI_COST_CAP_USER_DAILY_CENTS (default 1 cent).
     Fails closed: if Redis is unavailable, returns (False, 0, cap) so the user is blocked.
     """
-    import config as _config
-    cap = float(cap_cents if cap_cents is not None else getattr(_config, "AI_COST_CAP_USER_DAILY_CENTS", 1))
+    cap = float(cap_cents) if cap_cents is not None else _USER_CAP_CENTS
     if cap <= 0:
         return True, 0.0, 0.0
     r = await get_redis_or_none()
@@ -189,9 +320,7 @@ async def is_within_budget(guild_id: int, tier: str = "") -> tuple[bool, float,
     Returns (allowed, current_cents, cap_cents).
     If Redis is unavailable, returns (True, 0, cap) to degrade safely.
     """
-    import config
-
-    cap = float(getattr(config, "AI_COST_CAP_GUILD_DAILY_CENTS", 10))
+    cap = _GUILD_CAP_CENTS
 
     # Cap of 0 means disabled (no limit)
     if cap <= 0:
@@ -2,21 +2,26 @@
 
 from __future__ import annotations
 
+import functools
+import inspect
 import json
 import logging
-from dataclasses import dataclass
-from typing import Any
+from collections import Counter
+from dataclasses import asdict, dataclass, is_dataclass
+from typing import Any, Callable
 
 from utils.analytics import utc_day_str
-from utils.db import get_sessionmaker
+from utils.db import get_engine, get_sessionmaker
 from utils.metrics import estimate_ai_cost_usd_from_tokens
+from utils.redis_kv import kv_get_json, kv_set_json
 
 logger = logging.getLogger("bot.dashboard")
 
 try:
-    from sqlalchemy import select, func, and_  # type: ignore
+    from sqlalchemy import select, func, and_, or_, case, cast, literal_column  # type: ignore
+    from sqlalchemy.dialects.postgresql import JSONB  # type: ignore
 except Exception:
-    select = func = and_ = None  # type: ignore
+    select = func = and_ = or_ = case = cast = literal_column = JSONB = None  # type: ignore
 
 
 @dataclass
@@ -53,6 +58,72 @@ class ChurnStats:
     trials_ended_recently: int
 
 
+_DASH_CACHE_TTL_S = 60
+
+
+def _is_postgres() -> bool:
+    try:
+        return "postgres" in str(getattr(get_engine().dialect, "name", "") or "").lower()
+    except Exception:
+        return False
+
+
+def _dash_dump(result: Any) -> Any:
+    if is_dataclass(result):
+        return asdict(result)
+    if isinstance(result, list):
+        return [_dash_dump(x) for x in result]
+    return result
+
+
+def _cached_json(
+    name: str,
+    load: Callable[[Any], Any],
+    *,
+    fallback: Callable[[], Any],
+    ttl: int = _DASH_CACHE_TTL_S,
+):
+    """Cache a keyword-only dashboard aggregate in Redis for `ttl` seconds.
+
+    Key is dash:<name>:<arg=value...> with defaults applied; `load` rebuilds
+    the return value from its JSON form. Redis errors fall through to the query.
+    If SQLAlchemy is missing or the query raises, `fallback()` is returned and
+    nothing is cached, so a transient DB error doesn't pin zeros for `ttl`.
+    """
+
+    def deco(fn):
+        sig = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(**kwargs):
+            bound = sig.bind(**kwargs)
+            bound.apply_defaults()
+            key = f"dash:{name}:" + ":".join(f"{k}={v}" for k, v in sorted(bound.arguments.items()))
+            try:
+                cached = await kv_get_json(key)
+                if cached is not None:
+                    return load(cached)
+            except Exception:
+                pass
+
+            if select is None or func is None:
+                return fallback()
+            try:
+                result = await fn(**kwargs)
+            except Exception as e:
+                logger.exception("%s failed: %s", fn.__name__, e)
+                return fallback()
+            try:
+                await kv_set_json(key, _dash_dump(result), ex=int(ttl))
+            except Exception:
+                pass
+            return result
+
+        return wrapper
+
+    return deco
+
+
 def _add_days(day_utc: str, delta: int) -> str:
     """Add delta days to YYYYMMDD. Naive but sufficient for retention."""
     from datetime import datetime, timezone, timedelta
@@ -65,174 +136,205 @@ def _add_days(day_utc: str, delta: int) -> str:
         return ""
 
 
+@_cached_json("retention", lambda v: [RetentionStats(**x) for x in v], fallback=list)
 async def get_retention_stats(*, guild_id: int | None = None, cohort_days_back: int = 14) -> list[RetentionStats]:
     """D1/D7/D30 retention for cohorts. Requires UserActivityDay table."""
-    if select is None or func is None:
-        return []
+    from utils.models import UserFirstSeen, UserActivityDay
 
-    try:
-        from utils.models import UserFirstSeen, UserActivityDay
+    Session = get_sessionmaker()
+    results: list[RetentionStats] = []
+    now_ts = int(__import__("time").time())
+    today = utc_day_str(now_ts)
 
-        Session = get_sessionmaker()
-        results: list[RetentionStats] = []
-        now_ts = int(__import__("time").time())
-        today = utc_day_str(now_ts)
+    cohorts: list[tuple[str, str, str, str]] = []
+    for i in range(cohort_days_back):
+        cohort_day = utc_day_str(now_ts - 86400 * (i + 7))
+        d1_day = _add_days(cohort_day, 1)
+        d7_day = _add_days(cohort_day, 7)
+        d30_day = _add_days(cohort_day, 30)
+        if not d1_day or not d7_day or not d30_day:
+            continue
+        if d30_day > today:
+            continue
+        cohorts.append((cohort_day, d1_day, d7_day, d30_day))
+
+    if not cohorts:
+        return []
 
-        for i in range(cohort_days_back):
-            cohort_day = utc_day_str(now_ts - 86400 * (i + 7))
-            d1_day = _add_days(cohort_day, 1)
-            d7_day = _add_days(cohort_day, 7)
-            d30_day = _add_days(cohort_day, 30)
-            if not d1_day or not d7_day or not d30_day:
-                continue
-            if d30_day > today:
-                continue
+    # Two queries total: every cohort's members, then activity on every
+    # D1/D7/D30 day; retention is set intersection in-process.
+    activity_days = sorted({d for _, d1, d7, d30 in cohorts for d in (d1, d7, d30)})
+    async with Session() as session:
+        q = select(UserFirstSeen.first_day_utc, UserFirstSeen.user_id, UserFirstSeen.guild_id).where(
+            UserFirstSeen.first_day_utc.in_([c[0] for c in cohorts])
+        )
+        if guild_id is not None:
+            q = q.where(UserFirstSeen.guild_id == guild_id)
+        cohort_members: dict[str, set[tuple[int, int]]] = {}
+        for day, uid, gid in (await session.execute(q)).all():
+            cohort_members.setdefault(day, set()).add((uid, gid))
 
-            async with Session() as session:
-                q = select(UserFirstSeen.user_id, UserFirstSeen.guild_id).where(
-                    UserFirstSeen.first_day_utc == cohort_day
-                )
-                if guild_id is not None:
-                    q = q.where(UserFirstSeen.guild_id == guild_id)
-                rows = (await session.execute(q)).all()
-                cohort = [(r[0], r[1]) for r in rows]
-                cohort_size = len(cohort)
-
-                if cohort_size == 0:
-                    continue
-
-                cohort_set = set((uid, gid) for uid, gid in cohort)
-                d1_active: set[tuple[int, int]] = set()
-                d7_active: set[tuple[int, int]] = set()
-                d30_active: set[tuple[int, int]] = set()
-
-                for day, s in [(d1_day, d1_active), (d7_day, d7_active), (d30_day, d30_active)]:
-                    act_rows = (
-                        await session.execute(
-                            select(UserActivityDay.user_id, UserActivityDay.guild_id).where(
-                                UserActivityDay.day_utc == day
-                            )
-                        )
-                    )
-                    for uid, gid in act_rows.all():
-                        if (uid, gid) in cohort_set:
-                            s.add((uid, gid))
-
-                d1_retained = len(d1_active)
-                d7_retained = len(d7_active)
-                d30_retained = len(d30_active)
-
-                d1_pct = (d1_retained / cohort_size * 100) if cohort_size else 0
-                d7_pct = (d7_retained / cohort_size * 100) if cohort_size else 0
-                d30_pct = (d30_retained / cohort_size * 100) if cohort_size else 0
-
-                results.append(
-                    RetentionStats(
-                        cohort_day=cohort_day,
-                        cohort_size=cohort_size,
-                        d1_retained=d1_retained,
-                        d7_retained=d7_retained,
-                        d30_retained=d30_retained,
-                        d1_pct=d1_pct,
-                        d7_pct=d7_pct,
-                        d30_pct=d30_pct,
-                    )
-                )
+        if not cohort_members:
+            return []
 
-        return results[:7]
-    except Exception as e:
-        logger.exception("get_retention_stats failed: %s", e)
-        return []
+        aq = select(UserActivityDay.day_utc, UserActivityDay.user_id, UserActivityDay.guild_id).where(
+            UserActivityDay.day_utc.in_(activity_days)
+        )
+        if guild_id is not None:
+            aq = aq.where(UserActivityDay.guild_id == guild_id)
+        # Stream activity and keep only cohort members, so memory tracks
+        # cohort size rather than the number of active users.
+        members = set().union(*cohort_members.values())
+        active_by_day: dict[str, set[tuple[int, int]]] = {}
+        async for day, uid, gid in await session.stream(aq):
+            if (uid, gid) in members:
+                active_by_day.setdefault(day, set()).add((uid, gid))
+
+    empty: set[tuple[int, int]] = set()
+    for cohort_day, d1_day, d7_day, d30_day in cohorts:
+        cohort_set = cohort_members.get(cohort_day)
+        if not cohort_set:
+            continue
+        cohort_size = len(cohort_set)
+
+        d1_retained = len(cohort_set & active_by_day.get(d1_day, empty))
+        d7_retained = len(cohort_set & active_by_day.get(d7_day, empty))
+        d30_retained = len(cohort_set & active_by_day.get(d30_day, empty))
+
+        d1_pct = (d1_retained / cohort_size * 100) if cohort_size else 0
+        d7_pct = (d7_retained / cohort_size * 100) if cohort_size else 0
+        d30_pct = (d30_retained / cohort_size * 100) if cohort_size else 0
+
+        results.append(
+            RetentionStats(
+                cohort_day=cohort_day,
+                cohort_size=cohort_size,
+                d1_retained=d1_retained,
+                d7_retained=d7_retained,
+                d30_retained=d30_retained,
+                d1_pct=d1_pct,
+                d7_pct=d7_pct,
+                d30_pct=d30_pct,
+            )
+        )
 
+    return results[:7]
 
+
+@_cached_json("economy", lambda v: EconomyStats(**v), fallback=lambda: EconomyStats(0, {}, {}, 0))
 async def get_economy_stats(*, days: int = 7) -> EconomyStats:
     """Points spent by reason and shop item. Uses PointsLedger."""
-    if select is None:
-        return EconomyStats(0, {}, {}, 0)
-
-    try:
-        from utils.models import PointsLedger
-
-        Session = get_sessionmaker()
-        cutoff = __import__("datetime").datetime.now(__import__("datetime").timezone.utc)
-        cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
-        cutoff = cutoff - __import__("datetime").timedelta(days=days)
-
+    from utils.models import PointsLedger
+
+    Session = get_sessionmaker()
+    cutoff = __import__("datetime").datetime.now(__import__("datetime").timezone.utc)
+    cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+    cutoff = cutoff - __import__("datetime").timedelta(days=days)
+
+    spent = func.sum(-PointsLedger.delta)
+    window = and_(PointsLedger.delta < 0, PointsLedger.created_at >= cutoff)
+    mentions_item = or_(PointsLedger.meta_json.like('%"item"%'), PointsLedger.meta_json.like('%"name"%'))
+
+    item_rows = None
+    async with Session() as session:
+        reason_rows = (
+            await session.execute(
+                select(PointsLedger.reason, spent).where(window).group_by(PointsLedger.reason)
+            )
+        ).all()
+        if _is_postgres():
+            # Let Postgres pull the item out of the JSON; the ledger only
+            # writes json.dumps(dict) but the column is TEXT, so a bad row
+            # drops us to the Python path below. Runs last in the session
+            # since a cast error aborts the transaction.
+            meta = cast(func.nullif(PointsLedger.meta_json, ""), JSONB)
+            item = func.coalesce(
+                func.nullif(meta["item"].astext, ""), func.nullif(meta["name"].astext, "")
+            ).label("item")
+            try:
+                item_rows = (
+                    await session.execute(
+                        select(item, spent)
+                        .where(window)
+                        .where(mentions_item)
+                        .group_by(literal_column("item"))
+                    )
+                ).all()
+            except Exception:
+                logger.warning("economy item extraction in SQL failed; parsing meta_json instead", exc_info=True)
+
+    total = 0
+    by_reason: Counter[str] = Counter()
+    by_item: Counter[str] = Counter()
+
+    for reason, amount in reason_rows:
+        d = int(amount or 0)
+        total += d
+        by_reason[(reason or "unknown").strip() or "unknown"] += d
+
+    if item_rows is not None:
+        for item_name, amount in item_rows:
+            if item_name:
+                by_item[str(item_name)] += int(amount or 0)
+    else:
+        # Group by the raw text and parse each distinct value once.
         async with Session() as session:
-            rows = (
+            meta_rows = (
                 await session.execute(
-                    select(PointsLedger.delta, PointsLedger.reason, PointsLedger.meta_json).where(
-                        and_(PointsLedger.delta < 0, PointsLedger.created_at >= cutoff)
-                    )
+                    select(PointsLedger.meta_json, spent)
+                    .where(window)
+                    .where(mentions_item)
+                    .group_by(PointsLedger.meta_json)
                 )
             ).all()
-
-        total = 0
-        by_reason: dict[str, int] = {}
-        by_item: dict[str, int] = {}
-        spenders: set[int] = set()
-
-        for delta, reason, meta_json in rows:
-            d = abs(int(delta or 0))
-            total += d
-            r = (reason or "unknown").strip() or "unknown"
-            by_reason[r] = by_reason.get(r, 0) + d
-
+        for meta_json, amount in meta_rows:
+            d = int(amount or 0)
             try:
                 meta = json.loads(meta_json or "{}") if meta_json else {}
                 item = meta.get("item") or meta.get("name")
                 if item:
-                    by_item[str(item)] = by_item.get(str(item), 0) + d
+                    by_item[str(item)] += d
             except Exception:
                 pass
 
-        return EconomyStats(
-            total_points_spent=total,
-            by_reason=by_reason,
-            by_item=by_item,
-            spenders_count=0,
-        )
-    except Exception as e:
-        logger.exception("get_economy_stats failed: %s", e)
-        return EconomyStats(0, {}, {}, 0)
+    return EconomyStats(
+        total_points_spent=total,
+        by_reason=dict(by_reason),
+        by_item=dict(by_item),
+        spenders_count=0,
+    )
 
 
+@_cached_json("ai_cost", lambda v: AICostStats(**v), fallback=lambda: AICostStats([], {}, 0, 0.0))
 async def get_ai_cost_stats(*, days: int = 7, guild_id: int | None = None) -> AICostStats:
     """AI token usage and estimated cost from AnalyticsDailyMetric."""
-    if select is None or func is None:
-        return AICostStats([], {}, 0, 0.0)
+    from utils.models import AnalyticsDailyMetric
 
-    try:
-        from utils.models import AnalyticsDailyMetric
+    Session = get_sessionmaker()
+    now_ts = int(__import__("time").time())
+    day_list = [utc_day_str(now_ts - 86400 * i) for i in range(days)]
 
-        Session = get_sessionmaker()
-        now_ts = int(__import__("time").time())
-        day_list = [utc_day_str(now_ts - 86400 * i) for i in range(days)]
-
-        async with Session() as session:
-            q = (
-                select(AnalyticsDailyMetric.day_utc, func.sum(AnalyticsDailyMetric.value))
-                .where(AnalyticsDailyMetric.metric == "daily_ai_token_budget")
-                .where(AnalyticsDailyMetric.day_utc.in_(day_list))
-            )
-            if guild_id is not None:
-                q = q.where(AnalyticsDailyMetric.guild_id == guild_id)
-            q = q.group_by(AnalyticsDailyMetric.day_utc)
-            rows = (await session.execute(q)).all()
+    async with Session() as session:
+        q = (
+            select(AnalyticsDailyMetric.day_utc, func.sum(AnalyticsDailyMetric.value))
+            .where(AnalyticsDailyMetric.metric == "daily_ai_token_budget")
+            .where(AnalyticsDailyMetric.day_utc.in_(day_list))
+        )
+        if guild_id is not None:
+            q = q.where(AnalyticsDailyMetric.guild_id == guild_id)
+        q = q.group_by(AnalyticsDailyMetric.day_utc)
+        rows = (await session.execute(q)).all()
 
-        tokens_by_day = {str(d): int(v or 0) for d, v in rows}
-        total_tokens = sum(tokens_by_day.values())
-        estimated_usd = estimate_ai_cost_usd_from_tokens(total_tokens)
+    tokens_by_day = {str(d): int(v or 0) for d, v in rows}
+    total_tokens = sum(tokens_by_day.values())
+    estimated_usd = estimate_ai_cost_usd_from_tokens(total_tokens)
 
-        return AICostStats(
-            days=day_list,
-            tokens_by_day=tokens_by_day,
-            total_tokens=total_tokens,
-            estimated_usd=estimated_usd,
-        )
-    except Exception as e:
-        logger.exception("get_ai_cost_stats failed: %s", e)
-        return AICostStats([], {}, 0, 0.0)
+    return AICostStats(
+        days=day_list,
+        tokens_by_day=tokens_by_day,
+        total_tokens=total_tokens,
+        estimated_usd=estimated_usd,
+    )
 
 
 @dataclass
@@ -539,61 +641,54 @@ async def get_spending_dashboard(*, series_days: int = 90) -> dict[str, Any]:
     }
 
 
+@_cached_json(
+    "churn",
+    lambda v: ChurnStats(
+        guilds_declining=[tuple(g) for g in v["guilds_declining"]],
+        trials_ended_recently=v["trials_ended_recently"],
+    ),
+    fallback=lambda: ChurnStats([], 0),
+)
 async def get_churn_stats(*, guild_ids: list[int] | None = None) -> ChurnStats:
     """Guilds with declining activity, trials ended."""
-    if select is None or func is None:
-        return ChurnStats([], 0)
-
-    try:
-        from utils.models import AnalyticsDailyMetric, PremiumEntitlement
-
-        Session = get_sessionmaker()
-        now_ts = int(__import__("time").time())
-        last7 = [utc_day_str(now_ts - 86400 * i) for i in range(7)]
-        prev7 = [utc_day_str(now_ts - 86400 * (i + 7)) for i in range(7)]
+    from utils.models import AnalyticsDailyMetric, PremiumEntitlement
+
+    Session = get_sessionmaker()
+    now_ts = int(__import__("time").time())
+    last7 = [utc_day_str(now_ts - 86400 * i) for i in range(7)]
+    prev7 = [utc_day_str(now_ts - 86400 * (i + 7)) for i in range(7)]
+
+    guilds_declining: list[tuple[int, int, int]] = []
+
+    async with Session() as session:
+        # One grouped query covers every guild; the old per-guild loop
+        # needed a 100-guild cap to bound its round-trips.
+        value = AnalyticsDailyMetric.value
+        q = (
+            select(
+                AnalyticsDailyMetric.guild_id,
+                func.sum(case((AnalyticsDailyMetric.day_utc.in_(last7), value), else_=0)),
+                func.sum(case((AnalyticsDailyMetric.day_utc.in_(prev7), value), else_=0)),
+            )
+            .where(AnalyticsDailyMetric.metric == "daily_ai_calls")
+            .where(AnalyticsDailyMetric.day_utc.in_(last7 + prev7))
+            .group_by(AnalyticsDailyMetric.guild_id)
+        )
+        if guild_ids:
+            q = q.where(AnalyticsDailyMetric.guild_id.in_(guild_ids))
 
-        guilds_declining: list[tuple[int, int, int]] = []
+        for gid, last7_sum, prev7_sum in (await session.execute(q)).all():
+            last7_sum, prev7_sum = int(last7_sum or 0), int(prev7_sum or 0)
+            if prev7_sum > 0 and last7_sum < prev7_sum * 0.5:
+                guilds_declining.append((gid, last7_sum, prev7_sum))
 
-        async with Session() as session:
-            all_guilds = guild_ids
-            if not all_guilds:
-                r = await session.execute(
-                    select(AnalyticsDailyMetric.guild_id)
-                    .where(AnalyticsDailyMetric.metric == "daily_ai_calls")
-                    .distinct()
-                )
-                all_guilds = list({row[0] for row in r.all()})
+        guilds_declining.sort(key=lambda x: x[2] - x[1], reverse=True)
 
-            for gid in (all_guilds or [])[:100]:
-                last7_sum = (
-                    await session.execute(
-                        select(func.sum(AnalyticsDailyMetric.value))
-                        .where(AnalyticsDailyMetric.guild_id == gid)
-                        .where(AnalyticsDailyMetric.metric == "daily_ai_calls")
-                        .where(AnalyticsDailyMetric.day_utc.in_(last7))
-                    )
-                ).scalar() or 0
-                prev7_sum = (
-                    await session.execute(
-                        select(func.sum(AnalyticsDailyMetric.value))
-                        .where(AnalyticsDailyMetric.guild_id == gid)
-                        .where(AnalyticsDailyMetric.metric == "daily_ai_calls")
-                        .where(AnalyticsDailyMetric.day_utc.in_(prev7))
-                    )
-                ).scalar() or 0
-                if prev7_sum > 0 and int(last7_sum) < int(prev7_sum) * 0.5:
-                    guilds_declining.append((gid, int(last7_sum), int(prev7_sum)))
-
-            guilds_declining.sort(key=lambda x: x[2] - x[1], reverse=True)
+        trials_ended = 0
+        ents = (await session.execute(select(PremiumEntitlement).where(PremiumEntitlement.tier == "free"))).scalars().all()
+        for ent in ents:
+            src = str(getattr(ent, "source", "") or "")
+            if "trial_used" in src.lower() or "trial:" in src.lower():
+                trials_ended += 1
 
-            trials_ended = 0
-            ents = (await session.execute(select(PremiumEntitlement).where(PremiumEntitlement.tier == "free"))).scalars().all()
-            for ent in ents:
-                src = str(getattr(ent, "source", "") or "")
-                if "trial_used" in src.lower() or "trial:" in src.lower():
-                    trials_ended += 1
-
-        return ChurnStats(guilds_declining=guilds_declining[:10], trials_ended_recently=trials_ended)
-    except Exception as e:
-        logger.exception("get_churn_stats failed: %s", e)
-        return ChurnStats([], 0)
+    return ChurnStats(guilds_declining=guilds_declining[:10], trials_ended_recently=trials_ended)
@@ -9,10 +9,17 @@ If you still need Postgres/SQLite, add `sqlalchemy[asyncio]` and an async driver
 `asyncpg` (Postgres) or `aiosqlite` (SQLite) to requirements.txt.
 """
 
+import asyncio
 import os
 import logging
+import random
 from typing import Optional, Any
 
+try:
+    from sqlalchemy import text  # type: ignore
+except Exception:  # SQLAlchemy is optional; _require_sqlalchemy() raises the real error.
+    text = None  # type: ignore
+
 log = logging.getLogger("db")
 
 _engine: Any = None
@@ -59,21 +66,63 @@ def _require_sqlalchemy() -> Any:
         ) from e
 
 
+def _env_int(name: str, default: int, *, min_value: int = 0) -> int:
+    try:
+        v = int(str(os.getenv(name, str(default))).strip())
+    except Exception:
+        v = default
+    return max(min_value, v)
+
+
+def _pool_kwargs(url: str) -> dict:
+    """Connection pool settings for non-SQLite engines.
+
+    Defaults keep pool_size + max_overflow at 30 so a single bot process stays well
+    under managed-Postgres connection ceilings; override with DB_POOL_SIZE /
+    DB_MAX_OVERFLOW / DB_POOL_TIMEOUT / DB_POOL_RECYCLE. asyncpg connections also
+    get a 60s statement_timeout and 30s idle_in_transaction_session_timeout.
+    """
+    from sqlalchemy.pool import AsyncAdaptedQueuePool  # type: ignore
+
+    kwargs: dict = {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": _env_int("DB_POOL_SIZE", 20, min_value=1),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30, min_value=1),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800, min_value=60),
+        "pool_pre_ping": True,
+    }
+    if "+asyncpg" in url:
+        # asyncpg prepares every statement and caches it per connection, so the
+        # repeated query shapes are parsed/planned once per pooled connection.
+        # Set DB_STATEMENT_CACHE_SIZE=0 behind a transaction-mode pgbouncer.
+        connect_args: dict = {
+            "statement_cache_size": _env_int("DB_STATEMENT_CACHE_SIZE", 100),
+        }
+        # Bound runaway queries so they can't pin a pool slot: the server cancels
+        # past statement_timeout, the client gives up shortly after. Override with
+        # DB_STATEMENT_TIMEOUT_MS / DB_IDLE_TX_TIMEOUT_MS (0 disables either).
+        statement_ms = _env_int("DB_STATEMENT_TIMEOUT_MS", 60000)
+        idle_tx_ms = _env_int("DB_IDLE_TX_TIMEOUT_MS", 30000)
+        server_settings: dict = {}
+        if statement_ms:
+            server_settings["statement_timeout"] = str(statement_ms)
+            connect_args["command_timeout"] = statement_ms / 1000 + 5
+        if idle_tx_ms:
+            server_settings["idle_in_transaction_session_timeout"] = str(idle_tx_ms)
+        if server_settings:
+            connect_args["server_settings"] = server_settings
+        kwargs["connect_args"] = connect_args
+    return kwargs
+
+
 def get_engine():
     global _engine
     if _engine is None:
         create_async_engine, _, _ = _require_sqlalchemy()
         url = _database_url()
         is_sqlite = url.startswith("sqlite")
-        pool_kwargs: dict = {}
-        if not is_sqlite:
-            pool_kwargs = {
-                "pool_size": 10,
-                "max_overflow": 20,
-                "pool_timeout": 30,
-                "pool_recycle": 1800,
-                "pool_pre_ping": True,
-            }
+        pool_kwargs: dict = {} if is_sqlite else _pool_kwargs(url)
         _engine = create_async_engine(url, future=True, echo=False, **pool_kwargs)
     return _engine
 
@@ -102,64 +151,78 @@ def get_sessionmaker():
 # ---------------------------------------------------------------------------
 
 
+def _add_columns_sql(table: str, columns: tuple[tuple[str, str], ...]) -> str:
+    """One ALTER TABLE with an ADD COLUMN IF NOT EXISTS clause per column."""
+    clauses = ", ".join(f"ADD COLUMN IF NOT EXISTS {name} {ddl}" for name, ddl in columns)
+    return f"ALTER TABLE {table} {clauses}"
+
+
+_POINTS_WALLET_COLUMNS: tuple[tuple[str, str], ...] = (
+    # Streak-restore feature
+    ("streak_saved", "INTEGER DEFAULT 0"),
+    ("streak_restore_deadline_day_utc", "VARCHAR(16) DEFAULT ''"),
+    # Engagement streak rewards (0013)
+    ("streak_7_bonus_given", "BOOLEAN DEFAULT false"),
+    ("streak_last_30_bonus_at", "INTEGER DEFAULT 0"),
+    ("streak_10_character_claimed", "BOOLEAN DEFAULT false"),
+    ("streak_15_character_claimed", "BOOLEAN DEFAULT false"),
+    ("streak_25_character_claimed", "BOOLEAN DEFAULT false"),
+    ("streak_75_notification_sent", "BOOLEAN DEFAULT false"),
+    ("random_bonus_consecutive_days", "INTEGER DEFAULT 0"),
+    ("random_bonus_last_reward_day_utc", "VARCHAR(8) DEFAULT ''"),
+    # Engagement badges and weekly activity (0014)
+    ("streak_badge_30", "BOOLEAN DEFAULT false"),
+    ("streak_badge_60", "BOOLEAN DEFAULT false"),
+    ("streak_badge_90", "BOOLEAN DEFAULT false"),
+    ("weekly_activity_bonus_week_utc", "VARCHAR(8) DEFAULT ''"),
+)
+
+_STRIPE_PREMIUM_COLUMNS: tuple[tuple[str, str], ...] = (
+    ("stripe_subscription_id", "VARCHAR(128)"),
+    ("stripe_customer_id", "VARCHAR(128)"),
+    ("subscription_period_end", "TIMESTAMPTZ"),
+    ("activated_by_user_id", "BIGINT"),
+)
+
+# Single round-trip: premium_entitlements columns, the stripe_customers table and
+# its indexes. Index creation is best-effort (nested block swallows its errors).
+_STRIPE_SCHEMA_SQL = f"""
+DO $$
+BEGIN
+    {_add_columns_sql("premium_entitlements", _STRIPE_PREMIUM_COLUMNS)};
+    CREATE TABLE IF NOT EXISTS stripe_customers (
+        id SERIAL PRIMARY KEY,
+        discord_user_id BIGINT NOT NULL,
+        stripe_customer_id VARCHAR(128) NOT NULL,
+        created_at TIMESTAMPTZ DEFAULT NOW()
+    );
+    BEGIN
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_stripe_customers_discord ON stripe_customers (discord_user_id);
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_stripe_customers_stripe ON stripe_customers (stripe_customer_id);
+    EXCEPTION WHEN OTHERS THEN
+        NULL;
+    END;
+END
+$$
+"""
+
+
 async def _ensure_points_wallet_columns(conn) -> None:
     """Ensure new columns exist on points_wallet even if migrations weren't applied.
 
     create_all(checkfirst=True) does NOT add missing columns, so we do a lightweight
     ALTER TABLE ADD COLUMN IF NOT EXISTS for backwards-compatible schema evolution.
     Must stay in sync with alembic/versions 0013_engagement_streak_rewards and
-    0014_engagement_badges_weekly (and any future points_wallet migrations).
+    0014_engagement_badges_weekly (and any future points_wallet migrations);
+    add new columns to _POINTS_WALLET_COLUMNS.
     """
     try:
-        from sqlalchemy import text  # type: ignore
         dialect = getattr(conn, "dialect", None)
         name = getattr(dialect, "name", "")
         if name != "postgresql":
             return
 
-        # Add columns used by streak-restore feature
-        await conn.execute(text("ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS streak_saved INTEGER DEFAULT 0"))
-        await conn.execute(
-            text("ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS streak_restore_deadline_day_utc VARCHAR(16) DEFAULT ''")
-        )
-        # Engagement streak rewards (0013)
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS streak_7_bonus_given BOOLEAN DEFAULT false"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS streak_last_30_bonus_at INTEGER DEFAULT 0"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS streak_10_character_claimed BOOLEAN DEFAULT false"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS streak_15_character_claimed BOOLEAN DEFAULT false"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS streak_25_character_claimed BOOLEAN DEFAULT false"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS streak_75_notification_sent BOOLEAN DEFAULT false"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS random_bonus_consecutive_days INTEGER DEFAULT 0"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS random_bonus_last_reward_day_utc VARCHAR(8) DEFAULT ''"
-        ))
-        # Engagement badges and weekly activity (0014)
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS streak_badge_30 BOOLEAN DEFAULT false"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS streak_badge_60 BOOLEAN DEFAULT false"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS streak_badge_90 BOOLEAN DEFAULT false"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE points_wallet ADD COLUMN IF NOT EXISTS weekly_activity_bonus_week_utc VARCHAR(8) DEFAULT ''"
-        ))
+        await conn.execute(text(_add_columns_sql("points_wallet", _POINTS_WALLET_COLUMNS)))
     except Exception:
         # Don't crash-loop on permissions or non-Postgres setups.
         log.exception("points_wallet column ensure failed")
@@ -168,7 +231,6 @@ async def _ensure_points_wallet_columns(conn) -> None:
 async def _ensure_character_user_state_columns(conn) -> None:
     """Best-effort schema drift fix: add columns introduced after initial deploy."""
     try:
-        from sqlalchemy import text  # type: ignore
         await conn.execute(text("""
             ALTER TABLE character_user_state
             ADD COLUMN IF NOT EXISTS inventory_upgrades INTEGER DEFAULT 0
@@ -185,46 +247,12 @@ async def _ensure_stripe_columns(conn) -> None:
     Alembic migration 0010 is applied.
     """
     try:
-        from sqlalchemy import text  # type: ignore
         dialect = getattr(conn, "dialect", None)
         name = getattr(dialect, "name", "")
         if name != "postgresql":
             return
 
-        # Add Stripe columns to premium_entitlements
-        await conn.execute(text(
-            "ALTER TABLE premium_entitlements ADD COLUMN IF NOT EXISTS stripe_subscription_id VARCHAR(128)"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE premium_entitlements ADD COLUMN IF NOT EXISTS stripe_customer_id VARCHAR(128)"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE premium_entitlements ADD COLUMN IF NOT EXISTS subscription_period_end TIMESTAMPTZ"
-        ))
-        await conn.execute(text(
-            "ALTER TABLE premium_entitlements ADD COLUMN IF NOT EXISTS activated_by_user_id BIGINT"
-        ))
-
-        # Create stripe_customers table if it doesn't exist
-        await conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS stripe_customers (
-                id SERIAL PRIMARY KEY,
-                discord_user_id BIGINT NOT NULL,
-                stripe_customer_id VARCHAR(128) NOT NULL,
-                created_at TIMESTAMPTZ DEFAULT NOW()
-            )
-        """))
-        # Best-effort indexes (ignore if they already exist)
-        try:
-            await conn.execute(text(
-                "CREATE UNIQUE INDEX IF NOT EXISTS ix_stripe_customers_discord ON stripe_customers (discord_user_id)"
-            ))
-            await conn.execute(text(
-                "CREATE UNIQUE INDEX IF NOT EXISTS ix_stripe_customers_stripe ON stripe_customers (stripe_customer_id)"
-            ))
-        except Exception:
-            pass
-
+        await conn.execute(text(_STRIPE_SCHEMA_SQL))
         log.info("Stripe columns/tables ensured")
     except Exception:
         log.exception("Stripe column ensure failed (non-fatal)")
@@ -233,8 +261,6 @@ async def _ensure_stripe_columns(conn) -> None:
 async def _ensure_global_quest_columns(conn) -> None:
     """ADD COLUMN activated_at when migrations were not run (create_all does not alter)."""
     try:
-        from sqlalchemy import text  # type: ignore
-
         dialect = getattr(conn, "dialect", None)
         name = getattr(dialect, "name", "")
         if name == "postgresql":
@@ -316,6 +342,39 @@ async def _ensure_badge_definition_schema(conn) -> None:
 
 _DB_RETRY_ATTEMPTS = 5
 _DB_RETRY_BASE_DELAY = 2.0
+_DB_RETRY_MAX_DELAY = 8.0
+_DB_RETRY_FAST_BASE_DELAY = 0.5
+_DB_RETRY_FAST_MAX_DELAY = 2.0
+
+# "Server not up yet" failures: the DB usually finishes booting within a few
+# seconds, so retry these quickly instead of walking the full backoff.
+_DB_FAST_RETRY_ERRORS = frozenset({
+    "CannotConnectNowError",
+    "ConnectionDoesNotExistError",
+    "ConnectionRefusedError",
+    "ConnectionResetError",
+})
+
+
+def _is_fast_retry_error(exc: BaseException) -> bool:
+    """Walk the SQLAlchemy wrapper / __cause__ chain looking for a startup-type error."""
+    seen: set[int] = set()
+    cur: BaseException | None = exc
+    while cur is not None and id(cur) not in seen:
+        seen.add(id(cur))
+        if type(cur).__name__ in _DB_FAST_RETRY_ERRORS:
+            return True
+        cur = getattr(cur, "orig", None) or cur.__cause__ or cur.__context__
+    return False
+
+
+def _retry_delay(attempt: int, exc: BaseException) -> float:
+    """Capped exponential backoff with equal jitter (delay scaled by 0.5–1.0)."""
+    if _is_fast_retry_error(exc):
+        delay = min(_DB_RETRY_FAST_BASE_DELAY * (2 ** (attempt - 1)), _DB_RETRY_FAST_MAX_DELAY)
+    else:
+        delay = min(_DB_RETRY_BASE_DELAY * (2 ** (attempt - 1)), _DB_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
 
 
 async def init_db() -> None:
@@ -326,8 +385,9 @@ async def init_db() -> None:
 
     Fast path (no Alembic required): create missing tables on startup.
 
-    Retries up to 5 times with exponential backoff for transient connectivity
-    failures (common on Railway cold starts when the DB boots after the app).
+    Retries up to 5 times with jittered, capped exponential backoff for transient
+    connectivity failures (common on Railway cold starts when the DB boots after
+    the app); "not accepting connections yet" errors retry on a shorter schedule.
     """
     try:
         from utils.models import Base  # type: ignore
@@ -346,34 +406,61 @@ async def init_db() -> None:
         except Exception as exc:
             last_exc = exc
             if attempt < _DB_RETRY_ATTEMPTS:
-                delay = _DB_RETRY_BASE_DELAY * (2 ** (attempt - 1))
+                delay = _retry_delay(attempt, exc)
                 log.warning(
                     "DB init attempt %d/%d failed (%s); retrying in %.1fs…",
                     attempt, _DB_RETRY_ATTEMPTS, exc, delay,
                 )
-                import asyncio
                 await asyncio.sleep(delay)
             else:
                 log.exception("DB init/preflight failed after %d attempts", _DB_RETRY_ATTEMPTS)
                 raise last_exc
 
 
+_COLUMN_ENSURES = (
+    _ensure_points_wallet_columns,
+    _ensure_character_user_state_columns,
+    _ensure_stripe_columns,
+)
+
+
+async def _ensure_columns(engine) -> None:
+    """Run the ADD COLUMN helpers after the table-create transaction has committed.
+
+    On Postgres each helper gets its own connection/transaction and they run
+    concurrently: the tables are independent, and a failed ALTER (e.g. missing
+    privileges) no longer aborts the shared init transaction. Other dialects run
+    them sequentially on one connection.
+    """
+    if engine.dialect.name != "postgresql":
+        async with engine.begin() as conn:
+            for ensure in _COLUMN_ENSURES:
+                await ensure(conn)
+        return
+
+    async def _run(ensure) -> None:
+        async with engine.begin() as conn:
+            await ensure(conn)
+
+    await asyncio.gather(*(_run(ensure) for ensure in _COLUMN_ENSURES))
+
+
 async def _init_db_inner(engine, Base, env: str, auto_create: bool) -> None:
     """Core init_db logic, separated so the retry wrapper stays clean."""
+    await _init_db_tables(engine, Base, env, auto_create)
+    await _ensure_columns(engine)
+
+
+async def _init_db_tables(engine, Base, env: str, auto_create: bool) -> None:
     async with engine.begin() as conn:
         if env == "dev" or auto_create:
             await conn.run_sync(Base.metadata.create_all)
-            await _ensure_points_wallet_columns(conn)
-            await _ensure_character_user_state_columns(conn)
-            await _ensure_stripe_columns(conn)
             await _ensure_global_quest_schema(conn)
             await _ensure_topic_engagement_schema(conn)
             await _ensure_connection_traits_schema(conn)
             await _ensure_badge_definition_schema(conn)
             log.info("DB init OK (tables ensured; env=%s auto_create=%s)", env, auto_create)
         else:
-            from sqlalchemy import text  # type: ignore
-
             await conn.execute(text("SELECT 1"))
 
             try:
@@ -391,14 +478,11 @@ async def _init_db_inner(engine, Base, env: str, auto_create: bool) -> None:
                 await conn.run_sync(lambda sync_conn: AnalyticsDailyMetric.__table__.create(sync_conn, checkfirst=True))
                 await conn.run_sync(lambda sync_conn: UserFirstSeen.__table__.create(sync_conn, checkfirst=True))
                 await conn.run_sync(lambda sync_conn: PointsWallet.__table__.create(sync_conn, checkfirst=True))
-                await _ensure_points_wallet_columns(conn)
-                await _ensure_character_user_state_columns(conn)
                 await conn.run_sync(lambda sync_conn: PointsLedger.__table__.create(sync_conn, checkfirst=True))
                 await conn.run_sync(lambda sync_conn: QuestProgress.__table__.create(sync_conn, checkfirst=True))
                 await conn.run_sync(lambda sync_conn: QuestClaim.__table__.create(sync_conn, checkfirst=True))
                 await conn.run_sync(lambda sync_conn: CharacterRecommendation.__table__.create(sync_conn, checkfirst=True))
                 await conn.run_sync(lambda sync_conn: CharacterRollHistory.__table__.create(sync_conn, checkfirst=True))
-                await _ensure_stripe_columns(conn)
                 log.info("DB preflight OK (env=%s). Analytics + points tables ensured.", env)
             except Exception:
                 log.exception("DB analytics table ensure failed")
@@ -2,9 +2,11 @@ from __future__ import annotations
 
 import random
 import re
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Optional
 
-from utils.character_emotion_manifest import CHARACTER_IMAGES, _DEFAULT_CDN_BASE
+from utils.character_emotion_manifest import CHARACTER_IMAGES, CharacterImageSet, _DEFAULT_CDN_BASE
 from utils.emotion_predictor import predict_emotion
 
 # Regex to find an [EMOTION:xxx] tag anywhere in text (case-insensitive).
@@ -22,6 +24,10 @@ def parse_emotion_tag(text: str) -> tuple[str, str | None]:
     Returns ``(cleaned_text, emotion_key)`` where *emotion_key* is
     lowercased and validated, or ``None`` if no valid tag was found.
     """
+    # Most replies carry no tag; the tag must start with "[e"/"[E", so a plain
+    # substring check skips the regex without changing results.
+    if not text or ("[E" not in text and "[e" not in text):
+        return text, None
     m = _EMOTION_TAG_RE.search(text)
     if not m:
         return text, None
@@ -33,6 +39,34 @@ def parse_emotion_tag(text: str) -> tuple[str, str | None]:
     return cleaned, None
 
 
+@lru_cache(maxsize=2048)
+def _norm_cid(character_id: str | None) -> str:
+    return (character_id or "").strip().lower()
+
+
+@dataclass(frozen=True)
+class _ImgInfo:
+    images: CharacterImageSet | None
+    has_emotions: bool
+    has_bonds: bool
+    emotions: dict[str, str]  # manifest emotions, {} if none
+    bonds: list[str]  # manifest bond images, [] if none
+
+
+@lru_cache(maxsize=2048)
+def _images_info(cid: str) -> _ImgInfo:
+    """Manifest entry for a normalized id plus precomputed flags (manifest is static)."""
+    images = CHARACTER_IMAGES.get(cid)
+    return _ImgInfo(
+        images=images,
+        has_emotions=bool(images and images.emotions and any((v or "").strip() for v in images.emotions.values())),
+        has_bonds=bool(images and images.bond_images),
+        emotions=(images.emotions if images else {}) or {},
+        bonds=(images.bond_images if images else []) or [],
+    )
+
+
+@lru_cache(maxsize=4096)
 def _as_url(path_or_url: str) -> str:
     """Convert a manifest path into a full URL.
 
@@ -86,19 +120,16 @@ def character_has_emotion_images(character_id: str, *, style_obj=None) -> bool:
     """
     if _style_emotions(style_obj):
         return True
-    cid = (character_id or "").strip().lower()
+    cid = _norm_cid(character_id)
     if not cid:
         return False
-    images = CHARACTER_IMAGES.get(cid)
-    return bool(images and images.emotions and any((v or "").strip() for v in images.emotions.values()))
+    return _images_info(cid).has_emotions
 
 
 def character_has_bond_images(character_id: str, *, style_obj=None) -> bool:
     if _style_bond_images(style_obj):
         return True
-    cid = (character_id or "").strip().lower()
-    images = CHARACTER_IMAGES.get(cid)
-    return bool(images and images.bond_images)
+    return _images_info(_norm_cid(character_id)).has_bonds
 
 
 def bond_image_url_for_level(character_id: str, bond_level: int, *, style_obj=None) -> str | None:
@@ -125,10 +156,10 @@ def bond_image_url_for_level(character_id: str, bond_level: int, *, style_obj=No
             return _as_url(bond_list[idx])
         return None
 
-    cid = (character_id or "").strip().lower()
-    images = CHARACTER_IMAGES.get(cid)
-    if not images or not images.bond_images:
+    info = _images_info(_norm_cid(character_id))
+    if not info.has_bonds:
         return None
+    images = info.images
     try:
         lvl = int(bond_level)
     except Exception:
@@ -156,15 +187,15 @@ def character_emotion_image_url(
     - Otherwise predicts an emotion and returns the configured emotion filename.
     - If missing config, returns "" (caller should fall back to character's normal image).
     """
-    cid = (character_id or "").strip().lower()
+    cid = _norm_cid(character_id)
 
     # Prefer per-style custom images if present.
     custom_emotions = _style_emotions(style_obj) or {}
     custom_bonds = _style_bond_images(style_obj) or []
 
-    images = CHARACTER_IMAGES.get(cid)
-    manifest_emotions = (images.emotions if images else {}) or {}
-    manifest_bonds = (images.bond_images if images else []) or []
+    info = _images_info(cid)
+    manifest_emotions = info.emotions
+    manifest_bonds = info.bonds
 
     # If neither custom nor manifest is configured, bail out.
     if not custom_emotions and not manifest_emotions and not custom_bonds and not manifest_bonds:
@@ -188,23 +219,26 @@ def character_emotion_image_url(
     return _resolve_emotion_filename(emotions, emotion)
 
 
+_ALIASES: dict[str, tuple[str, ...]] = {
+    "angry": ("mad",),
+    "mad": ("angry",),
+    "happy": ("excited",),
+    "excited": ("happy",),
+}
+
+# emotion -> keys to try in order: itself, its aliases, then neutral.
+_FALLBACK_CHAIN: dict[str, tuple[str, ...]] = {
+    e: (e,) + _ALIASES.get(e, ()) + ("neutral",) for e in VALID_EMOTIONS
+}
+
+
 def _resolve_emotion_filename(emotions: dict[str, str], emotion: str) -> str:
     """Look up an emotion image path with alias fallback, then convert to URL."""
-    aliases = {
-        "angry": ["mad"],
-        "mad": ["angry"],
-        "happy": ["excited"],
-        "excited": ["happy"],
-    }
-    filename = emotions.get(emotion, "")
-    if not filename:
-        for alt in aliases.get(emotion, []):
-            filename = emotions.get(alt, "")
-            if filename:
-                break
-    if not filename:
-        filename = emotions.get("neutral", "")
-    return _as_url(filename)
+    for key in _FALLBACK_CHAIN.get(emotion) or (emotion, "neutral"):
+        filename = emotions.get(key, "")
+        if filename:
+            return _as_url(filename)
+    return ""
 
 
 def emotion_image_url_for_key(
@@ -218,10 +252,8 @@ def emotion_image_url_for_key(
     Used when the LLM itself has tagged the emotion via ``[EMOTION:xxx]``.
     Falls back through aliases then to neutral, same as the prediction path.
     """
-    cid = (character_id or "").strip().lower()
     custom_emotions = _style_emotions(style_obj) or {}
-    images = CHARACTER_IMAGES.get(cid)
-    manifest_emotions = (images.emotions if images else {}) or {}
+    manifest_emotions = _images_info(_norm_cid(character_id)).emotions
     if not custom_emotions and not manifest_emotions:
         return ""
     emotions = custom_emotions or manifest_emotions
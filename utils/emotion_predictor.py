@@ -11,6 +11,7 @@ Only a very small handful of patterns are kept as real regex for things like
 "???" punctuation emphasis.
 """
 
+from functools import lru_cache
 from typing import Dict, List, Tuple
 import re
 
@@ -72,6 +73,45 @@ def _compile():
 
 _COMPILED = _compile()
 
+# Per emotion: one alternation over all literal keywords (matched against the
+# lowercased text) plus any real-regex patterns. One C-level scan per emotion
+# instead of a Python-level `in` per keyword. A single alternation across all
+# emotions wouldn't do: finditer skips overlapping hits ("hate" in "whatever").
+def _compile_matchers() -> Dict[str, Tuple[re.Pattern[str] | None, List[re.Pattern[str]]]]:
+    matchers: Dict[str, Tuple[re.Pattern[str] | None, List[re.Pattern[str]]]] = {}
+    for emotion, items in _COMPILED.items():
+        literals = sorted({item for is_regex, item in items if not is_regex and item}, key=len, reverse=True)
+        literal_re = re.compile("|".join(re.escape(x) for x in literals)) if literals else None
+        regexes = [item for is_regex, item in items if is_regex]
+        matchers[emotion] = (literal_re, regexes)
+    return matchers
+
+
+_MATCHERS = _compile_matchers()
+
+# Priority order: strong emotions first. Flattened once so the hot path is a
+# single tuple walk with no dict lookups.
+_FLAT: Tuple[Tuple[str, re.Pattern[str] | None, Tuple[re.Pattern[str], ...]], ...] = tuple(
+    (emotion, _MATCHERS[emotion][0], tuple(_MATCHERS[emotion][1]))
+    for emotion in ("angry", "scared", "sad", "happy", "confused")
+    if emotion in _MATCHERS
+)
+
+
+@lru_cache(maxsize=512)
+def _topic_index(topics: Tuple[str, ...]) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    """[(topic, words longest-first)], keyed on the topic strings themselves so an
+    edited table can never hit a stale entry."""
+    entries = []
+    for topic in topics:
+        words = topic.lower().split()
+        if words:
+            # Longest word first: it's the least likely to appear, so most
+            # multi-word topics bail out on the first check.
+            entries.append((topic, tuple(sorted(words, key=len, reverse=True))))
+    return tuple(entries)
+
+
 def detect_topics(
     user_text: str,
     topic_reactions: dict[str, str] | None,
@@ -85,16 +125,17 @@ def detect_topics(
         return []
     lower = user_text.lower()
     hits: list[tuple[str, str]] = []
-    for topic, reaction in topic_reactions.items():
-        words = topic.lower().split()
-        if not words:
-            continue
-        if len(words) == 1:
-            if words[0] in lower:
-                hits.append((topic, reaction))
+    # Each distinct word is searched for at most once per message.
+    present: dict[str, bool] = {}
+    for topic, words in _topic_index(tuple(topic_reactions)):
+        for w in words:
+            found = present.get(w)
+            if found is None:
+                found = present[w] = w in lower
+            if not found:
+                break
         else:
-            if all(w in lower for w in words):
-                hits.append((topic, reaction))
+            hits.append((topic, topic_reactions[topic]))
     return hits
 
 
@@ -111,16 +152,11 @@ def predict_emotion(style_id: str, text: str | None = None, *, user_prompt: str
         return "neutral"
     t = text.lower()
 
-    # Priority order: strong emotions first.
-    for emotion in ("angry", "scared", "sad", "happy", "confused"):
-        for is_regex, item in _COMPILED.get(emotion, []):
-            if is_regex:
-                assert isinstance(item, re.Pattern)
-                if item.search(text):
-                    return emotion
-            else:
-                assert isinstance(item, str)
-                if item and item in t:
-                    return emotion
+    for emotion, literal_re, regexes in _FLAT:
+        if literal_re is not None and literal_re.search(t):
+            return emotion
+        for rx in regexes:
+            if rx.search(text):
+                return emotion
 
     return "neutral"
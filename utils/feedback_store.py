@@ -2,18 +2,44 @@ from __future__ import annotations
 
 import json
 from dataclasses import dataclass
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
+from functools import lru_cache
 
 from utils.backpressure import get_redis_or_none
-from utils.redis_kv import incr
+
+# Keep counters slightly longer than a week so rolling windows still work.
+_COUNT_TTL_S = 8 * 24 * 3600
+_EVENTS_TTL_S = 90 * 24 * 3600  # keep 90 days
+
+# KEYS: guild counter, user counter, events list
+# ARGV: counter ttl, event json, events ttl
+# Day counters only need their TTL set on the first write of the day; the
+# event list keeps a sliding TTL so an active guild's history doesn't expire.
+_LUA_INSERT_FEEDBACK = """
+if redis.call('INCR', KEYS[1]) == 1 then
+  redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+if redis.call('INCR', KEYS[2]) == 1 then
+  redis.call('EXPIRE', KEYS[2], ARGV[1])
+end
+redis.call('LPUSH', KEYS[3], ARGV[2])
+redis.call('LTRIM', KEYS[3], 0, 199)
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+return 1
+"""
 
 
 def _now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
 
+@lru_cache(maxsize=512)
+def _day_key_from_epoch_day(epoch_day: int) -> str:
+    return datetime.fromtimestamp(epoch_day * 86400, tz=timezone.utc).strftime("%Y%m%d")
+
+
 def _day_key(dt: datetime) -> str:
-    return dt.astimezone(timezone.utc).strftime("%Y%m%d")
+    return _day_key_from_epoch_day(int(dt.timestamp()) // 86400)
 
 
 def _guild_count_key(guild_id: int, day: str) -> str:
@@ -33,8 +59,14 @@ def _user_count_key(guild_id: int, user_id: int, day: str) -> str:
     return f"feedback:count:guild:{int(guild_id)}:user:{int(user_id)}:{day}"
 
 
+# json.dumps builds a new JSONEncoder per call when given non-default
+# options; keep one configured encoder around instead.
+_ENCODE = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+_DECODE = json.JSONDecoder().decode
+
+
 def _j(obj) -> str:
-    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+    return _ENCODE(obj)
 
 
 def _unj(s: str | bytes | None, default=None):
@@ -43,12 +75,12 @@ def _unj(s: str | bytes | None, default=None):
     if isinstance(s, (bytes, bytearray)):
         s = s.decode("utf-8", errors="ignore")
     try:
-        return json.loads(s)
+        return _DECODE(s)
     except Exception:
         return default
 
 
-@dataclass
+@dataclass(slots=True)
 class FeedbackItem:
     created_at: datetime
     guild_id: int
@@ -66,18 +98,11 @@ async def insert_feedback(
     message: str,
     attachments: list[dict] | None = None,
 ) -> None:
-    now = _now_utc()
-    day = _day_key(now)
-    # Count (guild + user)
-    # Keep counters slightly longer than a week so rolling windows still work.
-    ttl = 8 * 24 * 3600
-    await incr(_guild_count_key(guild_id, day), 1, ex=ttl)
-    await incr(_user_count_key(guild_id, user_id, day), 1, ex=ttl)
-
-    # Store event (trim to last ~200 per guild)
     r = await get_redis_or_none()
     if r is None:
         return
+    now = _now_utc()
+    day = _day_key(now)
     event = {
         "created_at": now.timestamp(),
         "guild_id": int(guild_id),
@@ -86,68 +111,57 @@ async def insert_feedback(
         "message": (message or "")[:2000],
         "attachments": attachments or [],
     }
-    key = _guild_events_key(guild_id)
-    pipe = r.pipeline()
-    pipe.lpush(key, _j(event))
-    pipe.ltrim(key, 0, 199)
-    pipe.expire(key, 90 * 24 * 3600)  # keep 90 days
-    await pipe.execute()
+    # Count (guild + user) and store the event (trim to last ~200 per guild)
+    # in one round trip.
+    await r.eval(
+        _LUA_INSERT_FEEDBACK,
+        3,
+        _guild_count_key(guild_id, day),
+        _user_count_key(guild_id, user_id, day),
+        _guild_events_key(guild_id),
+        _COUNT_TTL_S,
+        _j(event),
+        _EVENTS_TTL_S,
+    )
+
+
+# Sums the given day counters server-side so callers get one integer back.
+_LUA_SUM_COUNTERS = """
+local total = 0
+for _, k in ipairs(KEYS) do
+  local v = tonumber(redis.call('GET', k))
+  if v then total = total + v end
+end
+return total
+"""
+
+
+def _days_since(since_utc: datetime | None) -> list[str]:
+    start = int((since_utc or _now_utc()).timestamp()) // 86400
+    end = int(_now_utc().timestamp()) // 86400
+    return [_day_key_from_epoch_day(d) for d in range(start, end + 1)]
+
+
+async def _sum_counters(r, keys: list[str]) -> int:
+    if not keys:
+        return 0
+    return int(await r.eval(_LUA_SUM_COUNTERS, len(keys), *keys) or 0)
 
 
 async def count_feedback_guild_since(*, guild_id: int, since_utc: datetime) -> int:
-    since_utc = (since_utc or _now_utc()).astimezone(timezone.utc)
-    now = _now_utc()
-    days = []
-    cur = since_utc.replace(hour=0, minute=0, second=0, microsecond=0)
-    end = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    while cur <= end:
-        days.append(_day_key(cur))
-        cur += timedelta(days=1)
     r = await get_redis_or_none()
     if r is None:
         return 0
-    vals = await r.mget([_guild_count_key(guild_id, d) for d in days])
-    total = 0
-    for v in vals or []:
-        if v is None:
-            continue
-        if isinstance(v, (bytes, bytearray)):
-            v = v.decode("utf-8", errors="ignore")
-        try:
-            total += int(v)
-        except Exception:
-            pass
-    return total
+    return await _sum_counters(r, [_guild_count_key(guild_id, d) for d in _days_since(since_utc)])
 
 
 async def count_feedback_user_since(*, guild_id: int, user_id: int, since_utc: datetime) -> int:
     """Count feedback submissions by a specific user in a guild since a UTC datetime."""
 
-    since_utc = (since_utc or _now_utc()).astimezone(timezone.utc)
-    now = _now_utc()
-
-    days: list[str] = []
-    cur = since_utc.replace(hour=0, minute=0, second=0, microsecond=0)
-    end = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    while cur <= end:
-        days.append(_day_key(cur))
-        cur += timedelta(days=1)
-
     r = await get_redis_or_none()
     if r is None:
         return 0
-    vals = await r.mget([_user_count_key(guild_id, user_id, d) for d in days])
-    total = 0
-    for v in vals or []:
-        if v is None:
-            continue
-        if isinstance(v, (bytes, bytearray)):
-            v = v.decode("utf-8", errors="ignore")
-        try:
-            total += int(v)
-        except Exception:
-            pass
-    return total
+    return await _sum_counters(r, [_user_count_key(guild_id, user_id, d) for d in _days_since(since_utc)])
 
 
 # Backwards-compatible aliases expected by older command modules
@@ -166,15 +180,18 @@ async def list_recent_feedback(*, guild_id: int, limit: int = 20) -> list[Feedba
     out: list[FeedbackItem] = []
     for item in raw or []:
         d = _unj(item, default={}) or {}
-        ts = float(d.get("created_at") or 0)
+        if not isinstance(d, dict):
+            d = {}
+        get = d.get
+        ts = float(get("created_at") or 0)
         out.append(
             FeedbackItem(
                 created_at=datetime.fromtimestamp(ts, tz=timezone.utc) if ts else _now_utc(),
-                guild_id=int(d.get("guild_id") or guild_id),
-                channel_id=int(d.get("channel_id") or 0),
-                user_id=int(d.get("user_id") or 0),
-                message=str(d.get("message") or ""),
-                attachments=list(d.get("attachments") or []),
+                guild_id=int(get("guild_id") or guild_id),
+                channel_id=int(get("channel_id") or 0),
+                user_id=int(get("user_id") or 0),
+                message=str(get("message") or ""),
+                attachments=list(get("attachments") or []),
             )
         )
     return out
@@ -14,6 +14,7 @@ Storage:
 
 from __future__ import annotations
 
+import asyncio
 import json
 import time
 from typing import Any, Dict
@@ -25,6 +26,11 @@ from utils.backpressure import get_redis_or_none
 REDIS_INCIDENTS_LIST = "incidents:global"          # LPUSH JSON; capped
 REDIS_INCIDENTS_SEQ = "incidents:global:seq"       # INCR to signal new incident
 
+# json.dumps(..., ensure_ascii=False) builds a fresh encoder per call; incidents
+# can arrive in bursts, so keep one configured encoder/decoder.
+_ENCODE = json.JSONEncoder(ensure_ascii=False).encode
+_DECODE = json.JSONDecoder().decode
+
 
 def _now() -> int:
     return int(time.time())
@@ -40,26 +46,17 @@ async def record_incident(
 ) -> None:
     """Record an incident (never raises)."""
     try:
-        payload: Dict[str, Any] = {
-            "t": _now(),
-            "kind": (kind or "incident")[:64],
-            "reason": (reason or "")[:400],
-        }
-        if guild_id is not None:
-            payload["guild_id"] = int(guild_id)
-        if user_id is not None:
-            payload["user_id"] = int(user_id)
-        if fields:
-            # keep it compact
-            payload["fields"] = {str(k)[:40]: str(v)[:200] for k, v in fields.items()}
+        # Truncate once; the same values go to the audit log and the Redis payload.
+        kind_t = (kind or "incident")[:64]
+        reason_t = (reason or "")[:400]
 
-        # 1) Durable-ish audit log on disk
+        # 1) Durable-ish audit log on disk (keeps the untruncated fields)
         audit_log(
             "incident",
             guild_id=guild_id,
             user_id=user_id,
-            result=str(kind)[:64],
-            reason=str(reason)[:400],
+            result=kind_t,
+            reason=reason_t,
             fields=(fields or None),
         )
 
@@ -68,27 +65,66 @@ async def record_incident(
         if r is None:
             return
 
-        try:
-            raw = json.dumps(payload, ensure_ascii=False)
-        except Exception:
-            raw = json.dumps({"t": _now(), "kind": "incident", "reason": "(serialization failed)"})
+        payload: Dict[str, Any] = {
+            "t": _now(),
+            "kind": kind_t,
+            "reason": reason_t,
+        }
+        if guild_id is not None:
+            payload["guild_id"] = int(guild_id)
+        if user_id is not None:
+            payload["user_id"] = int(user_id)
+        if fields:
+            # keep it compact
+            payload["fields"] = {str(k)[:40]: str(v)[:200] for k, v in fields.items()}
 
         try:
-            await r.lpush(REDIS_INCIDENTS_LIST, raw)
-            await r.ltrim(REDIS_INCIDENTS_LIST, 0, 199)  # keep last ~200
-            await r.expire(REDIS_INCIDENTS_LIST, 86400 * 60)
+            raw = _ENCODE(payload)
         except Exception:
-            pass
+            raw = json.dumps({"t": _now(), "kind": "incident", "reason": "(serialization failed)"})
 
+        # One round trip; a failing command doesn't stop the others in the batch.
         try:
-            await r.incr(REDIS_INCIDENTS_SEQ)
-            await r.expire(REDIS_INCIDENTS_SEQ, 86400 * 90)
+            pipe = r.pipeline(transaction=False)
+            pipe.lpush(REDIS_INCIDENTS_LIST, raw)
+            pipe.ltrim(REDIS_INCIDENTS_LIST, 0, 199)  # keep last ~200
+            pipe.expire(REDIS_INCIDENTS_LIST, 86400 * 60)
+            pipe.incr(REDIS_INCIDENTS_SEQ)
+            pipe.expire(REDIS_INCIDENTS_SEQ, 86400 * 90)
+            await pipe.execute()
         except Exception:
             pass
     except Exception:
         return
 
 
+# Strong refs for fire-and-forget records; the event loop only keeps weak ones.
+_BACKGROUND_TASKS: set[asyncio.Task] = set()
+
+
+def record_incident_nowait(
+    *,
+    kind: str,
+    reason: str,
+    fields: Dict[str, Any] | None = None,
+    guild_id: int | None = None,
+    user_id: int | None = None,
+) -> None:
+    """Schedule record_incident in the background and return immediately.
+
+    For error paths that shouldn't wait on the audit write + Redis round trip.
+    No-op when called outside a running event loop.
+    """
+    try:
+        task = asyncio.get_running_loop().create_task(
+            record_incident(kind=kind, reason=reason, fields=fields, guild_id=guild_id, user_id=user_id)
+        )
+    except RuntimeError:
+        return
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+
+
 async def list_recent_incidents(limit: int = 25) -> list[dict[str, Any]]:
     """Fetch recent incidents from Redis (best-effort)."""
     r = await get_redis_or_none()
@@ -99,7 +135,7 @@ async def list_recent_incidents(limit: int = 25) -> list[dict[str, Any]]:
         out: list[dict[str, Any]] = []
         for item in raw or []:
             try:
-                out.append(json.loads(item))
+                out.append(_DECODE(item))
             except Exception:
                 continue
         return out
@@ -9,11 +9,10 @@ from __future__ import annotations
 
 import logging
 import time
-from datetime import datetime, timezone, timedelta
+from collections import OrderedDict
 from typing import Optional, Dict, List, Tuple
 
 from utils.backpressure import get_redis_or_none
-from utils.analytics import utc_day_str
 
 log = logging.getLogger("bot.leaderboard")
 
@@ -40,24 +39,13 @@ PERIOD_MONTHLY = "monthly"
 OPT_OUT_KEY = "leaderboard:opt_out"
 
 
-def _now() -> int:
-    return int(time.time())
-
-
-def _utc_day() -> str:
-    return utc_day_str()
-
-
-def _utc_week() -> str:
-    """Returns YYYYMMDD for Monday of current week."""
-    now = datetime.now(timezone.utc)
-    monday = now - timedelta(days=now.weekday())
-    return monday.strftime("%Y%m%d")
+def _period_registry_key(period: str) -> str:
+    """SET of score keys written for a resettable period (read by reset_period)."""
+    return f"leaderboard:keys:{period}"
 
 
-def _utc_month() -> str:
-    """Returns YYYYMM for current month."""
-    return datetime.now(timezone.utc).strftime("%Y%m")
+def _now() -> int:
+    return int(time.time())
 
 
 def _leaderboard_key(category: str, guild_id: int, period: str) -> str:
@@ -76,22 +64,56 @@ def _member_key(guild_id: int, user_id: int) -> str:
 
 def _parse_member(member: str) -> Tuple[int, int]:
     """Parse member key back to (guild_id, user_id)."""
-    if ":" in member:
-        parts = member.split(":", 1)
-        return (int(parts[0]), int(parts[1]))
-    # Global leaderboard
-    return (GLOBAL_GUILD_ID, int(member))
+    i = member.find(":")
+    if i < 0:
+        # Global leaderboard
+        return (GLOBAL_GUILD_ID, int(member))
+    return (int(member[:i]), int(member[i + 1:]))
+
+
+# Short-lived per-process cache for opt-out lookups. Every score write and rank
+# lookup checks opt-out, so this saves a SISMEMBER on nearly every call.
+# set_opt_out updates this process immediately; other processes see the change
+# once their entry expires.
+_OPT_OUT_CACHE_TTL_S = 30.0
+_OPT_OUT_CACHE_MAX = 10_000
+_OPT_OUT_CACHE: "OrderedDict[int, tuple[float, bool]]" = OrderedDict()
+
+
+def _opt_out_cache_get(user_id: int) -> Optional[bool]:
+    hit = _OPT_OUT_CACHE.get(user_id)
+    if hit is None:
+        return None
+    ts, opted = hit
+    if time.monotonic() - ts >= _OPT_OUT_CACHE_TTL_S:
+        _OPT_OUT_CACHE.pop(user_id, None)
+        return None
+    _OPT_OUT_CACHE.move_to_end(user_id)
+    return opted
+
+
+def _opt_out_cache_put(user_id: int, opted: bool) -> None:
+    _OPT_OUT_CACHE[user_id] = (time.monotonic(), opted)
+    _OPT_OUT_CACHE.move_to_end(user_id)
+    while len(_OPT_OUT_CACHE) > _OPT_OUT_CACHE_MAX:
+        _OPT_OUT_CACHE.popitem(last=False)
 
 
 async def is_opted_out(user_id: int) -> bool:
     """Check if user has opted out of leaderboards."""
+    uid = int(user_id)
+    cached = _opt_out_cache_get(uid)
+    if cached is not None:
+        return cached
     r = await get_redis_or_none()
     if r is None:
         return False
     try:
-        return bool(await r.sismember(OPT_OUT_KEY, str(int(user_id))))
+        opted = bool(await r.sismember(OPT_OUT_KEY, str(uid)))
     except Exception:
         return False
+    _opt_out_cache_put(uid, opted)
+    return opted
 
 
 async def set_opt_out(user_id: int, opt_out: bool) -> bool:
@@ -104,31 +126,75 @@ async def set_opt_out(user_id: int, opt_out: bool) -> bool:
             await r.sadd(OPT_OUT_KEY, str(int(user_id)))
         else:
             await r.srem(OPT_OUT_KEY, str(int(user_id)))
+        _opt_out_cache_put(int(user_id), bool(opt_out))
         return True
     except Exception:
         return False
 
 
-async def update_leaderboard(
+# Use ZADD (set) for "current value" categories; ZINCRBY (increment) for cumulative counts
+_SET_CATEGORIES = frozenset({
+    CATEGORY_POINTS,      # current balance
+    CATEGORY_BOND,        # total bond XP across characters
+    CATEGORY_CHARACTERS,  # current character count
+    CATEGORY_STREAK,      # current daily streak
+    CATEGORY_CHARACTER_STREAK,  # current character streak
+})
+
+# TTL per period; alltime has no expiration
+_PERIOD_TTL_S = {
+    PERIOD_DAILY: 86400 * 2,  # 2 days
+    PERIOD_WEEKLY: 86400 * 8,  # 8 days
+    PERIOD_MONTHLY: 86400 * 32,  # 32 days
+}
+
+_ALL_PERIODS = (PERIOD_ALLTIME, PERIOD_DAILY, PERIOD_WEEKLY, PERIOD_MONTHLY)
+
+# Period keys this process has set a TTL on recently (key -> monotonic time), so
+# each write doesn't resend EXPIRE. Refreshed hourly so keys recreated by another
+# process's reset pick a TTL back up; EXPIRE ... NX would need Redis 7.
+_TTL_SET_REFRESH_S = 3600.0
+_TTL_SET_MAX = 50_000
+_TTL_SET: "OrderedDict[str, float]" = OrderedDict()
+
+
+def _needs_ttl(key: str) -> bool:
+    now = time.monotonic()
+    ts = _TTL_SET.get(key)
+    if ts is not None and now - ts < _TTL_SET_REFRESH_S:
+        return False
+    _TTL_SET[key] = now
+    _TTL_SET.move_to_end(key)
+    while len(_TTL_SET) > _TTL_SET_MAX:
+        _TTL_SET.popitem(last=False)
+    return True
+
+
+def _queue_update(pipe, *, category: str, guild_id: int, member: str, value: float, period: str) -> None:
+    """Queue the score write (and period TTL) for one leaderboard on a pipeline."""
+    key = _leaderboard_key(category, guild_id, period)
+    if category in _SET_CATEGORIES:
+        pipe.zadd(key, {member: value})
+    else:
+        # Increment: rolls, talk, activity (counts)
+        pipe.zincrby(key, value, member)
+    ttl = _PERIOD_TTL_S.get(period)
+    if ttl:
+        # The reset loop clears period keys well before the TTL runs out; the TTL
+        # only guards against a missed reset.
+        if _needs_ttl(key):
+            pipe.expire(key, ttl)
+        pipe.sadd(_period_registry_key(period), key)
+
+
+async def _write_periods(
     *,
     category: str,
     guild_id: int,
     user_id: int,
     value: float,
-    period: str = PERIOD_ALLTIME,
+    periods: Tuple[str, ...],
 ) -> bool:
-    """Update leaderboard score for a user.
-    
-    Args:
-        category: Leaderboard category (points, rolls, talk, etc.)
-        guild_id: Guild ID (0 for global)
-        user_id: User ID
-        value: Score to add/set
-        period: Time period (alltime, daily, weekly, monthly)
-    
-    Returns:
-        True if successful, False otherwise
-    """
     # Skip if user opted out
     if await is_opted_out(user_id):
         return False
@@ -138,58 +204,93 @@ async def update_leaderboard(
         return False
 
     try:
-        key = _leaderboard_key(category, guild_id, period)
         member = _member_key(guild_id, user_id)
-        
-        # Use ZADD (set) for "current value" categories; ZINCRBY (increment) for cumulative counts
-        set_categories = (
-            CATEGORY_POINTS,      # current balance
-            CATEGORY_BOND,        # total bond XP across characters
-            CATEGORY_CHARACTERS,  # current character count
-            CATEGORY_STREAK,      # current daily streak
-            CATEGORY_CHARACTER_STREAK,  # current character streak
-        )
-        if category in set_categories:
-            await r.zadd(key, {member: value})
-        else:
-            # Increment: rolls, talk, activity (counts)
-            await r.zincrby(key, value, member)
-        
-        # Set TTL based on period
-        if period == PERIOD_DAILY:
-            await r.expire(key, 86400 * 2)  # 2 days
-        elif period == PERIOD_WEEKLY:
-            await r.expire(key, 86400 * 8)  # 8 days
-        elif period == PERIOD_MONTHLY:
-            await r.expire(key, 86400 * 32)  # 32 days
-        # alltime has no expiration
-        
+        pipe = r.pipeline(transaction=False)
+        for period in periods:
+            _queue_update(pipe, category=category, guild_id=guild_id, member=member, value=value, period=period)
+        await pipe.execute()
         return True
     except Exception:
         log.exception("Failed to update leaderboard %s", category)
         return False
 
 
-async def update_all_periods(
+async def update_leaderboard(
     *,
     category: str,
     guild_id: int,
     user_id: int,
     value: float,
-) -> None:
-    """Update all time periods for a category."""
-    await update_leaderboard(category=category, guild_id=guild_id, user_id=user_id, value=value, period=PERIOD_ALLTIME)
+    period: str = PERIOD_ALLTIME,
+) -> bool:
+    """Update leaderboard score for a user.
     
-    # Also update current period
-    day = _utc_day()
-    week = _utc_week()
-    month = _utc_month()
+    Args:
+        category: Leaderboard category (points, rolls, talk, etc.)
+        guild_id: Guild ID (0 for global)
+        user_id: User ID
+        value: Score to add/set
+        period: Time period (alltime, daily, weekly, monthly)
     
-    # Daily: only if it's a new day (track separately)
-    # For now, we'll update all periods
-    await update_leaderboard(category=category, guild_id=guild_id, user_id=user_id, value=value, period=PERIOD_DAILY)
-    await update_leaderboard(category=category, guild_id=guild_id, user_id=user_id, value=value, period=PERIOD_WEEKLY)
-    await update_leaderboard(category=category, guild_id=guild_id, user_id=user_id, value=value, period=PERIOD_MONTHLY)
+    Returns:
+        True if successful, False otherwise
+    """
+    return await _write_periods(
+        category=category, guild_id=guild_id, user_id=user_id, value=value, periods=(period,)
+    )
+
+
+async def update_all_periods(
+    *,
+    category: str,
+    guild_id: int,
+    user_id: int,
+    value: float,
+) -> None:
+    """Update all time periods for a category.
+
+    One opt-out check plus a single pipeline for the alltime/daily/weekly/monthly
+    writes and their TTLs.
+    """
+    await _write_periods(
+        category=category, guild_id=guild_id, user_id=user_id, value=value, periods=_ALL_PERIODS
+    )
+
+
+# KEYS: leaderboard zset, opt-out set
+# ARGV: offset, limit
+# Returns a flat [member, score, ...] page of visible (not opted-out) members.
+# Offset counts visible members, so pages stay full and don't overlap when some
+# users opted out. Members are "gid:uid" or "uid"; the opt-out set holds uids.
+_LUA_VISIBLE_PAGE = """
+local skip = tonumber(ARGV[1])
+local want = tonumber(ARGV[2])
+if redis.call('SCARD', KEYS[2]) == 0 then
+  return redis.call('ZREVRANGE', KEYS[1], skip, skip + want - 1, 'WITHSCORES')
+end
+local out = {}
+local start = 0
+local batch = 200
+while want > 0 do
+  local res = redis.call('ZREVRANGE', KEYS[1], start, start + batch - 1, 'WITHSCORES')
+  if #res == 0 then break end
+  for i = 1, #res, 2 do
+    local uid = string.match(res[i], '([^:]*)$')
+    if redis.call('SISMEMBER', KEYS[2], uid) == 0 then
+      if skip > 0 then
+        skip = skip - 1
+      else
+        out[#out + 1] = res[i]
+        out[#out + 1] = res[i + 1]
+        want = want - 1
+        if want == 0 then break end
+      end
+    end
+  end
+  start = start + batch
+end
+return out
+"""
 
 
 async def get_leaderboard(
@@ -207,7 +308,7 @@ async def get_leaderboard(
         guild_id: Guild ID (0 for global)
         period: Time period
         limit: Number of results
-        offset: Offset for pagination
+        offset: Offset for pagination (counts visible, non-opted-out rows)
     
     Returns:
         List of (guild_id, user_id, score) tuples, sorted descending
@@ -216,24 +317,23 @@ async def get_leaderboard(
     if r is None:
         return []
 
+    if limit <= 0:
+        return []
+
     try:
         key = _leaderboard_key(category, guild_id, period)
-        # Get top N with scores (descending)
-        results = await r.zrevrange(key, offset, offset + limit - 1, withscores=True)
+        # Top N with scores (descending), opted-out users filtered in Redis
+        flat = await r.eval(_LUA_VISIBLE_PAGE, 2, key, OPT_OUT_KEY, max(0, int(offset)), int(limit))
         
         out: List[Tuple[int, int, float]] = []
-        for member_raw, score in results or []:
+        for i in range(0, len(flat or []) - 1, 2):
+            member_raw, score = flat[i], flat[i + 1]
             if isinstance(member_raw, (bytes, bytearray)):
                 member = member_raw.decode("utf-8", errors="ignore")
             else:
                 member = str(member_raw)
             
             gid, uid = _parse_member(member)
-            
-            # Skip opted-out users
-            if await is_opted_out(uid):
-                continue
-            
             out.append((gid, uid, float(score)))
         
         return out
@@ -273,14 +373,12 @@ async def get_user_rank(
         key = _leaderboard_key(category, guild_id, period)
         member = _member_key(guild_id, user_id)
         
-        # Get rank (0-indexed, descending)
-        rank = await r.zrevrank(key, member)
-        if rank is None:
-            return None
-        
-        # Get score
-        score = await r.zscore(key, member)
-        if score is None:
+        # Rank (0-indexed, descending) and score in one round trip
+        pipe = r.pipeline(transaction=False)
+        pipe.zrevrank(key, member)
+        pipe.zscore(key, member)
+        rank, score = await pipe.execute()
+        if rank is None or score is None:
             return None
         
         return (int(rank), float(score))
@@ -303,29 +401,50 @@ async def get_user_score(
     return rank_data[1]
 
 
+async def _scan_unlink(r, pattern: str) -> int:
+    deleted = 0
+    cursor = 0
+    # Walk the whole keyspace; UNLINK frees memory off the main Redis thread.
+    while True:
+        cursor, keys = await r.scan(cursor, match=pattern, count=1000)
+        if keys:
+            await r.unlink(*keys)
+            deleted += len(keys)
+        if cursor == 0:
+            break
+    return deleted
+
+
 async def reset_period(period: str) -> None:
     """Reset a time period (for daily/weekly/monthly resets).
     
-    This should be called periodically to clear old period data.
+    This should be called periodically to clear old period data. Keys come from
+    the per-period registry maintained by score writes; the first reset after the
+    registry was introduced also sweeps the keyspace once for older keys.
     """
     r = await get_redis_or_none()
     if r is None:
         return
 
     try:
-        # Find all keys for this period
-        pattern = f"leaderboard:*:*:{period}"
-        cursor = 0
+        registry = _period_registry_key(period)
+        keys = list(await r.smembers(registry) or [])
         deleted = 0
-        
-        for _ in range(100):  # Limit scans
-            cursor, keys = await r.scan(cursor, match=pattern, count=100)
-            if keys:
-                await r.delete(*keys)
-                deleted += len(keys)
-            if cursor == 0:
-                break
-        
+        for i in range(0, len(keys), 1000):
+            batch = keys[i:i + 1000]
+            pipe = r.pipeline(transaction=False)
+            pipe.unlink(*batch)
+            # SREM only what we read, so keys registered mid-reset stay registered.
+            pipe.srem(registry, *batch)
+            await pipe.execute()
+            deleted += len(batch)
+
+        seeded = f"{registry}:seeded"
+        if not await r.exists(seeded):
+            deleted += await _scan_unlink(r, f"leaderboard:*:*:{period}")
+            await r.set(seeded, "1")
+
+        _TTL_SET.clear()
         log.info("Reset %d leaderboard keys for period %s", deleted, period)
     except Exception:
         log.exception("Failed to reset period %s", period)
@@ -348,6 +467,8 @@ async def reset_all_leaderboard_data() -> int:
                 deleted += len(keys)
             if cursor == 0:
                 break
+        _OPT_OUT_CACHE.clear()
+        _TTL_SET.clear()
         log.info("Reset all leaderboard data: %d keys deleted", deleted)
     except Exception:
         log.exception("Failed to reset all leaderboard data")
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
-import re
+import string
+from functools import lru_cache
 from io import BytesIO
 from typing import Optional
 from urllib.parse import urlparse
@@ -25,14 +27,39 @@ except Exception:  # pragma: no cover
     Image = None  # type: ignore
 
 
-_SAFE_RE = re.compile(r"[^a-zA-Z0-9._/-]+")
+# Path-safe characters: [a-zA-Z0-9._/-]. Everything else (including all
+# non-ASCII) is dropped via encode+translate rather than a regex substitution.
+_SAFE_CHARS = frozenset(string.ascii_letters + string.digits + "._/-")
+_UNSAFE_ASCII = bytes(b for b in range(128) if chr(b) not in _SAFE_CHARS)
 
 
+def _strip_unsafe(s: str) -> str:
+    return s.encode("ascii", "ignore").translate(None, _UNSAFE_ASCII).decode("ascii")
+
+
+# The env-derived settings below are read once per process and cached; env vars
+# don't change at runtime. Tests that patch them should call reset_asset_config().
+def reset_asset_config() -> None:
+    """Drop cached asset settings so the next call re-reads the environment."""
+    for fn in (
+        _assets_root,
+        asset_storage_mode,
+        _asset_bucket,
+        _asset_public_base_url,
+        _asset_presign_expires_s,
+        _asset_key_prefix,
+        _max_asset_bytes,
+    ):
+        fn.cache_clear()
+
+
+@lru_cache(maxsize=1)
 def _assets_root() -> str:
     # Railway volume-friendly default
     return os.getenv("ASSETS_DIR", "data/assets")
 
 
+@lru_cache(maxsize=1)
 def asset_storage_mode() -> str:
     """Storage mode for images saved via upload.
 
@@ -42,11 +69,13 @@ def asset_storage_mode() -> str:
     return (os.getenv("ASSET_STORAGE_MODE", "local") or "local").strip().lower()
 
 
+@lru_cache(maxsize=1)
 def _asset_bucket() -> str:
     # Allow separate bucket; fall back to the voice bucket if shared.
     return (os.getenv("ASSET_S3_BUCKET") or os.getenv("S3_BUCKET") or "").strip()
 
 
+@lru_cache(maxsize=1)
 def _asset_public_base_url() -> str:
     return (os.getenv("ASSET_PUBLIC_BASE_URL") or "").strip().rstrip("/")
 
@@ -55,6 +84,40 @@ def _asset_public_base_url() -> str:
 _FETCH_IMAGE_MAX_BYTES = 5 * 1024 * 1024
 _FETCH_IMAGE_TIMEOUT_S = 12.0
 
+# Shared client so embed image fetches reuse pooled keep-alive connections.
+_http_client: httpx.AsyncClient | None = None
+_http_client_lock = asyncio.Lock()
+
+
+async def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is not None:
+        return _http_client
+
+    async with _http_client_lock:
+        if _http_client is not None:
+            return _http_client
+
+        limits = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30.0)
+        _http_client = httpx.AsyncClient(
+            limits=limits,
+            follow_redirects=True,
+            timeout=_FETCH_IMAGE_TIMEOUT_S,
+        )
+        return _http_client
+
+
+async def aclose_media_client() -> None:
+    """Optional: close the shared image-fetch client on shutdown."""
+    global _http_client
+    async with _http_client_lock:
+        if _http_client is not None:
+            try:
+                await _http_client.aclose()
+            except Exception:
+                pass
+            _http_client = None
+
 
 async def fetch_embed_image_as_file(url: str | None, *, filename: str = "image.png") -> discord.File | None:
     """Fetch image from URL and return a discord.File for use as attachment. Returns None on failure.
@@ -68,17 +131,27 @@ async def fetch_embed_image_as_file(url: str | None, *, filename: str = "image.p
     if not s.startswith("https://"):
         return None
     try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=_FETCH_IMAGE_TIMEOUT_S) as client:
-            resp = await client.get(s)
+        client = await _get_http_client()
+        # Stream so oversized bodies are abandoned at the cap instead of fully buffered.
+        async with client.stream("GET", s) as resp:
             resp.raise_for_status()
-            data = resp.content
-            if not data or len(data) > _FETCH_IMAGE_MAX_BYTES:
-                logger.warning("fetch_embed_image_as_file: bad size (%s bytes) for %s", len(data) if data else 0, s[:80])
+            declared = resp.headers.get("content-length", "")
+            if declared.isdigit() and int(declared) > _FETCH_IMAGE_MAX_BYTES:
+                logger.warning("fetch_embed_image_as_file: bad size (%s bytes) for %s", declared, s[:80])
                 return None
-            base = (filename or "image").strip()
-            if not base.endswith((".png", ".jpg", ".jpeg", ".gif", ".webp")):
-                base = base + ".png"
-            return discord.File(BytesIO(data), filename=base)
+            buf = bytearray()
+            async for chunk in resp.aiter_bytes(65536):
+                buf.extend(chunk)
+                if len(buf) > _FETCH_IMAGE_MAX_BYTES:
+                    logger.warning("fetch_embed_image_as_file: bad size (>%s bytes) for %s", _FETCH_IMAGE_MAX_BYTES, s[:80])
+                    return None
+        if not buf:
+            logger.warning("fetch_embed_image_as_file: bad size (0 bytes) for %s", s[:80])
+            return None
+        base = (filename or "image").strip()
+        if not base.endswith((".png", ".jpg", ".jpeg", ".gif", ".webp")):
+            base = base + ".png"
+        return discord.File(BytesIO(bytes(buf)), filename=base)
     except Exception:
         logger.warning("fetch_embed_image_as_file failed for url=%s", s[:80], exc_info=True)
         return None
@@ -118,6 +191,7 @@ def resolve_embed_image_url(url: str | None) -> str | None:
     return None
 
 
+@lru_cache(maxsize=1)
 def _asset_presign_expires_s() -> int | None:
     raw = (os.getenv("ASSET_PRESIGN_EXPIRES_S") or "").strip()
     if raw.isdigit():
@@ -128,10 +202,12 @@ def _asset_presign_expires_s() -> int | None:
     return None
 
 
+@lru_cache(maxsize=1)
 def _asset_key_prefix() -> str:
     return (os.getenv("ASSET_S3_PREFIX", "assets") or "assets").strip().strip("/")
 
 
+@lru_cache(maxsize=1)
 def _max_asset_bytes() -> int:
     """Maximum allowed bytes for uploaded assets.
 
@@ -159,7 +235,7 @@ def ensure_assets_dirs() -> None:
 
 def _clean_rel(rel_path: str) -> str:
     rel = (rel_path or "").strip().lstrip("/")
-    rel = _SAFE_RE.sub("", rel)
+    rel = _strip_unsafe(rel)
     # Prevent path traversal
     rel = rel.replace("..", "")
     return rel
@@ -170,6 +246,22 @@ def asset_abspath(rel_path: str) -> str:
     return os.path.join(_assets_root(), rel)
 
 
+def _write_sync(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+async def write_asset_bytes(rel_path: str, data: bytes) -> str:
+    """Write bytes to ASSETS_DIR/rel_path in a worker thread (volume writes can be slow).
+
+    Creates the assets root and parent directories as needed. Returns the absolute path.
+    """
+    out_abs = asset_abspath(rel_path)
+    await asyncio.to_thread(_write_sync, out_abs, data)
+    return out_abs
+
+
 def get_discord_file_for_asset(rel_path: str) -> Optional[discord.File]:
     """Return a discord.File for an existing asset path, else None."""
     abs_path = asset_abspath(rel_path)
@@ -199,6 +291,33 @@ def _infer_ext(filename: str, content_type: str | None) -> str:
     return ".png"
 
 
+def _upscale_sync(data: bytes, ext: str, target: int, limit: int) -> bytes:
+    """Upscale so the longest side reaches target px; returns the original bytes on failure."""
+    try:
+        im = Image.open(BytesIO(data))
+        w, h = im.size
+        if w > 0 and h > 0 and max(w, h) < target:
+            scale = target / float(max(w, h))
+            new_w = max(1, int(round(w * scale)))
+            new_h = max(1, int(round(h * scale)))
+            im = im.resize((new_w, new_h), resample=Image.LANCZOS)
+            out = BytesIO()
+            fmt = "PNG" if ext == ".png" else "JPEG" if ext in {".jpg", ".jpeg"} else "WEBP" if ext == ".webp" else "PNG"
+            save_kwargs = {}
+            if fmt == "JPEG":
+                save_kwargs["quality"] = 92
+                save_kwargs["optimize"] = True
+            im.save(out, format=fmt, **save_kwargs)
+            data2 = out.getvalue()
+            # Only keep upscaled if it stays within limit.
+            if data2 and len(data2) <= limit:
+                return data2
+    except Exception:
+        # non-fatal: just keep original
+        pass
+    return data
+
+
 async def save_attachment_image(
     *,
     attachment: discord.Attachment,
@@ -229,7 +348,7 @@ async def save_attachment_image(
 
     ext = _infer_ext(attachment.filename or "", attachment.content_type)
     rel_dir_clean = _clean_rel(rel_dir)
-    base_clean = _SAFE_RE.sub("", (basename or "").strip().lower())
+    base_clean = _strip_unsafe((basename or "").strip().lower())
     if not base_clean:
         base_clean = "image"
 
@@ -246,29 +365,8 @@ async def save_attachment_image(
 
         # Optional upscaling for tiny images (NOT for GIFs).
         if upscale_min_px and ext != ".gif" and Image is not None:
-            try:
-                im = Image.open(BytesIO(data))
-                w, h = im.size
-                target = int(upscale_min_px)
-                if w > 0 and h > 0 and max(w, h) < target:
-                    scale = target / float(max(w, h))
-                    new_w = max(1, int(round(w * scale)))
-                    new_h = max(1, int(round(h * scale)))
-                    im = im.resize((new_w, new_h), resample=Image.LANCZOS)
-                    out = BytesIO()
-                    fmt = "PNG" if ext == ".png" else "JPEG" if ext in {".jpg", ".jpeg"} else "WEBP" if ext == ".webp" else "PNG"
-                    save_kwargs = {}
-                    if fmt == "JPEG":
-                        save_kwargs["quality"] = 92
-                        save_kwargs["optimize"] = True
-                    im.save(out, format=fmt, **save_kwargs)
-                    data2 = out.getvalue()
-                    # Only keep upscaled if it stays within limit.
-                    if data2 and len(data2) <= limit:
-                        data = data2
-            except Exception:
-                # non-fatal: just keep original
-                pass
+            # Decode/resize/encode is CPU-bound; keep it off the event loop.
+            data = await asyncio.to_thread(_upscale_sync, data, ext, int(upscale_min_px), limit)
         # If configured, upload to S3/R2 and return a public/presigned URL.
         if asset_storage_mode() == "s3":
             prefix = _asset_key_prefix()
@@ -317,11 +415,7 @@ async def save_attachment_image(
                 )
 
         # Default: save locally under ASSETS_DIR.
-        ensure_assets_dirs()
-        out_abs = asset_abspath(out_rel)
-        os.makedirs(os.path.dirname(out_abs), exist_ok=True)
-        with open(out_abs, "wb") as f:
-            f.write(data)
+        await write_asset_bytes(out_rel, data)
         return True, "Saved.", out_rel
     except Exception:
         return False, "Failed to save uploaded image.", None
@@ -112,6 +112,8 @@ try:
 
         __table_args__ = (
             Index("ix_custom_unique", "user_id", "style_id", unique=True),
+            # list_custom_style_profiles: user_id ORDER BY created_at DESC LIMIT N
+            Index("ix_custom_user_created", "user_id", created_at.desc()),
         )
 
 
@@ -11,6 +11,7 @@ Storage:
 - Redis JSON blobs (simple + durable across deploys).
   - Set: packs:global -> pack_ids
   - String: pack:{pack_id} -> JSON dict
+  - Set: pack:by_char:{style_id} -> pack_ids that (may) contain the character
 """
 
 import json
@@ -24,6 +25,9 @@ from utils.storage import list_add, list_remove, list_members
 PACK_INDEX_KEY = "packs:global"
 GUILD_ENABLED_KEY = "enabled_packs"
 FEATURED_PACKS_KEY = "packs:featured"
+PACK_BY_CHAR_PREFIX = "pack:by_char"
+# Set once every stored pack has been indexed (style ids never start with "_").
+PACK_BY_CHAR_BUILT_KEY = "pack:by_char:_built"
 
 
 def _upvotes_key(pack_id: str) -> str:
@@ -48,6 +52,24 @@ def _pack_key(pack_id: str) -> str:
     return f"pack:{pack_id}"
 
 
+def _by_char_key(style_id: str) -> str:
+    return f"{PACK_BY_CHAR_PREFIX}:{style_id}"
+
+
+def _pack_style_ids(payload: dict[str, Any]) -> list[str]:
+    chars = payload.get("characters") or []
+    if not isinstance(chars, list):
+        return []
+    out: list[str] = []
+    for c in chars:
+        if not isinstance(c, dict):
+            continue
+        sid = normalize_style_id(str(c.get("id") or c.get("style_id") or ""))
+        if sid:
+            out.append(sid)
+    return out
+
+
 async def list_custom_packs(
     *,
     limit: int | None = None,
@@ -124,13 +146,82 @@ async def upsert_custom_pack(payload: dict[str, Any]) -> bool:
     if r is None:
         return False
     try:
-        await r.set(_pack_key(pid), json.dumps(payload, separators=(",", ":")))
-        await r.sadd(PACK_INDEX_KEY, pid)
+        pipe = r.pipeline(transaction=False)
+        pipe.set(_pack_key(pid), json.dumps(payload, separators=(",", ":")))
+        pipe.sadd(PACK_INDEX_KEY, pid)
+        for sid in _pack_style_ids(payload):
+            pipe.sadd(_by_char_key(sid), pid)
+        await pipe.execute()
         return True
     except Exception:
         return False
 
 
+async def index_pack_characters(payloads: list[dict[str, Any]], *, complete: bool = False) -> None:
+    """Backfill pack:by_char entries for packs stored before the index existed.
+
+    complete=True asks to mark the index as covering every stored pack. The marker
+    is only set when payloads include every pack id in PACK_INDEX_KEY, so a
+    truncated or partially failed listing (list_custom_packs / get_custom_pack
+    swallow errors) leaves it unset and cold lookups keep scanning.
+    """
+    r = await get_redis_or_none()
+    if r is None:
+        return
+    try:
+        indexed: set[str] = set()
+        pipe = r.pipeline(transaction=False)
+        for payload in payloads or []:
+            pid = normalize_pack_id(str(payload.get("pack_id") or ""))
+            if not pid:
+                continue
+            indexed.add(pid)
+            for sid in _pack_style_ids(payload):
+                pipe.sadd(_by_char_key(sid), pid)
+        await pipe.execute()
+        if complete:
+            stored = {normalize_pack_id(str(raw)) for raw in (await r.smembers(PACK_INDEX_KEY) or [])}
+            stored.discard("")
+            if stored <= indexed:
+                await r.set(PACK_BY_CHAR_BUILT_KEY, "1")
+    except Exception:
+        pass
+
+
+async def is_char_index_built() -> bool:
+    r = await get_redis_or_none()
+    if r is None:
+        return False
+    try:
+        return bool(await r.exists(PACK_BY_CHAR_BUILT_KEY))
+    except Exception:
+        return False
+
+
+async def find_pack_with_style(style_id: str) -> dict[str, Any] | None:
+    """Return a stored pack containing style_id, via the pack:by_char index.
+
+    Index entries are never pruned on edit/delete, so each candidate pack is
+    re-checked. None means "not indexed" (callers may fall back to a full scan).
+    """
+    sid = normalize_style_id(style_id)
+    if not sid:
+        return None
+    r = await get_redis_or_none()
+    if r is None:
+        return None
+    try:
+        ids = await r.smembers(_by_char_key(sid))
+        for raw in sorted(ids or []):
+            pid = raw.decode("utf-8", "ignore") if isinstance(raw, (bytes, bytearray)) else str(raw)
+            p = await get_custom_pack(pid)
+            if p and sid in _pack_style_ids(p):
+                return p
+        return None
+    except Exception:
+        return None
+
+
 async def delete_custom_pack(pack_id: str) -> bool:
     pid = normalize_pack_id(pack_id)
     if not pid:
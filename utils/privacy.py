@@ -199,6 +199,12 @@ async def delete_user_data(user_id: int) -> dict:
 
         await session.commit()
 
+    try:
+        from utils.character_store import invalidate_state_cache
+        invalidate_state_cache(uid)
+    except Exception:
+        pass
+
     # Best-effort Redis cleanup
     redis_deleted = await _clear_redis_keys(uid)
     summary["redis_keys_deleted"] = redis_deleted